@@ -0,0 +1,620 @@
+# ⏱️ Benchmarks
+# Micro-benchmarks for the patch classification hot path
+#
+# Usage:
+#   python -m ml.benchmarks preprocess --patches 512 --device cpu
+#   python -m ml.benchmarks prefetch --patches 512
+#   python -m ml.benchmarks dense --image slide.tif
+#   python -m ml.benchmarks backends --model-path models/best_resnet50_model.pth
+#   python -m ml.benchmarks quantize --images slide1.tif slide2.tif
+#   python -m ml.benchmarks profiles --patches 512
+#   python -m ml.benchmarks ensemble --members 3
+#   python -m ml.benchmarks cascade --image slide.tif --band 0.1 0.9
+#   python -m ml.benchmarks tta --tta dihedral
+#   python -m ml.benchmarks heatmap --patches 100000
+#   python -m ml.benchmarks lesions --size 2048 --thresholds 0.3 0.5 0.7
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from typing import Callable, Dict, Optional
+
+from .classifier import (
+    EnsembleClassifier, PatchClassifier, PrefetchingInferenceRunner, ResNet50Classifier,
+    augment_views, preprocess_patches, preprocess_patch_batch
+)
+from .dense_inference import DenseInferenceEngine
+from .cascade import CascadeClassifier
+from .export_model import export_model
+from .inference_backends import ONNXRUNTIME_AVAILABLE
+from .quantization import sample_tiler_patches, split_holdout
+from .execution_profiles import PROFILES, bf16_supported, probe_profiles
+from .tiling import GigapixelTiler
+from .aggregation import HeatmapGenerator, LesionDetector
+from .lesion_index import LesionThresholdIndex
+
+
+def time_call(fn: Callable, repeats: int = 3, device: Optional[torch.device] = None) -> float:
+    """Best wall-clock time of fn() over repeats (after one warm-up call)"""
+    fn()
+    best = float('inf')
+    for _ in range(repeats):
+        if device is not None and device.type == 'cuda':
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        fn()
+        if device is not None and device.type == 'cuda':
+            torch.cuda.synchronize()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_classifier(model_path: Optional[str], device: str) -> PatchClassifier:
+    """PatchClassifier from model_path, or with random weights for timing only"""
+    if model_path:
+        return PatchClassifier(model_path=model_path, device=device)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'random_resnet50.pth')
+        torch.save(ResNet50Classifier(num_classes=1).state_dict(), path)
+        return PatchClassifier(model_path=path, device=device)
+
+
+def random_patches(count: int, patch_size: int, seed: int = 0) -> np.ndarray:
+    """uint8 (N, P, P, 3) patches with tissue-like colour statistics"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(120, 230, size=(count, 1, 1, 3))
+    noise = rng.integers(-40, 40, size=(count, patch_size, patch_size, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def print_rows(title: str, rows: Dict[str, float], count: int):
+    """Print total time and per-patch cost for each timed stage"""
+    print(f"\n{title}")
+    print(f"   {'stage':<28} {'total (ms)':>12} {'per patch (µs)':>16}")
+    for name, seconds in rows.items():
+        print(f"   {name:<28} {seconds * 1e3:12.2f} {seconds / count * 1e6:16.1f}")
+
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def benchmark_preprocess(args) -> Dict[str, float]:
+    """Per-patch PIL transform vs fused batch preprocessing, next to model time"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    patches = random_patches(args.patches, args.patch_size)
+    batches = [patches[i:i + args.batch_size] for i in range(0, len(patches), args.batch_size)]
+
+    def pil_path():
+        return [preprocess_patches(list(b), classifier.transform).to(device) for b in batches]
+
+    def fused_path(backend):
+        return lambda: [
+            preprocess_patch_batch(
+                b, classifier.input_size, classifier.mean, classifier.std, device,
+                resize_backend=backend
+            )
+            for b in batches
+        ]
+
+    # Identical inputs are a precondition for comparing timings
+    reference = pil_path()
+    max_diff = max(
+        float((a - b).abs().max())
+        for backend in ('pil', 'tensor')
+        for a, b in zip(reference, fused_path(backend)())
+    )
+
+    inputs = reference
+
+    def model_only():
+        with torch.no_grad():
+            for tensor in inputs:
+                classifier.model(tensor)
+
+    rows = {
+        'preprocess (PIL, per patch)': time_call(pil_path, args.repeats, device),
+        'fused batch (PIL resize)': time_call(fused_path('pil'), args.repeats, device),
+        'fused batch (tensor resize)': time_call(fused_path('tensor'), args.repeats, device),
+        'model forward': time_call(model_only, args.repeats, device)
+    }
+
+    print_rows(
+        f"🧪 Preprocessing: {args.patches} patches of {args.patch_size}px, "
+        f"batch {args.batch_size}, device {device}",
+        rows, args.patches
+    )
+    print(f"   Max input difference (fused vs PIL): {max_diff:.2e}")
+    return rows
+
+
+def benchmark_prefetch(args) -> Dict[str, float]:
+    """Serial preprocess-then-forward loop vs the double-buffered runner"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    patches = random_patches(args.patches, args.patch_size)
+    batches = [patches[i:i + args.batch_size] for i in range(0, len(patches), args.batch_size)]
+
+    def serial():
+        return [classifier.predict_tensor(classifier.preprocess_batch(b)) for b in batches]
+
+    def prefetch():
+        runner = PrefetchingInferenceRunner(classifier, depth=args.depth)
+        return [predictions for predictions, _ in runner.run((b, None) for b in batches)]
+
+    same = all(
+        a['tumor_probability'] == b['tumor_probability']
+        for x, y in zip(serial(), prefetch()) for a, b in zip(x, y)
+    )
+
+    rows = {
+        'preprocess only': time_call(
+            lambda: [classifier.preprocess_batch(b) for b in batches], args.repeats, device
+        ),
+        'serial loop': time_call(serial, args.repeats, device),
+        'prefetching runner': time_call(prefetch, args.repeats, device)
+    }
+
+    print_rows(
+        f"🔁 Prefetching: {args.patches} patches of {args.patch_size}px, "
+        f"batch {args.batch_size}, depth {args.depth}, device {device}, "
+        f"{torch.get_num_threads()} torch threads",
+        rows, args.patches
+    )
+    print(f"   Speedup: {rows['serial loop'] / rows['prefetching runner']:.2f}x, "
+          f"identical predictions: {same}")
+    return rows
+
+
+def benchmark_dense(args) -> Dict[str, float]:
+    """Per-patch classification of the dense grid vs shared region feature maps"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    tiler = GigapixelTiler(
+        patch_size=args.patch_size, scales=[1.0], output_size=classifier.input_size[0]
+    )
+    engine = DenseInferenceEngine(
+        classifier, tiler, region_cells=args.region_cells, halo_cells=args.halo_cells
+    )
+    plan = engine.create_dense_plan(args.image)
+    
+    def per_patch():
+        return [
+            classifier.predict_batch(patches, batch_size=args.batch_size)
+            for patches, _ in tiler.iter_plan_batches(args.image, plan, args.batch_size)
+        ]
+    
+    def dense():
+        return list(engine.iter_predictions(args.image, plan))
+    
+    rows = {
+        'per-patch grid': time_call(per_patch, args.repeats, device),
+        'dense regions': time_call(dense, args.repeats, device)
+    }
+    windows = engine.stats['windows']
+    
+    print_rows(
+        f"🧱 Dense inference: {windows} windows every {engine.stride}px, "
+        f"{args.region_cells}-cell regions (+{args.halo_cells} halo), device {device}",
+        rows, max(windows, 1)
+    )
+    print(f"   Speedup: {rows['per-patch grid'] / rows['dense regions']:.2f}x")
+    
+    validation = engine.validate(args.image, max_windows=args.patches, batch_size=args.batch_size)
+    if validation['windows']:
+        print(f"   Dense vs per-patch on {validation['windows']} windows: "
+              f"max |Δp| {validation['max_abs_diff']:.4f}, mean |Δp| {validation['mean_abs_diff']:.4f}, "
+              f"r={validation['correlation']:.4f}, class agreement {validation['class_agreement'] * 100:.1f}%")
+    return rows
+
+
+def benchmark_backends(args) -> Dict[str, float]:
+    """Eager PyTorch vs TorchScript vs ONNX Runtime: single-patch latency and batch throughput"""
+    formats = ['torchscript'] + (['onnx'] if ONNXRUNTIME_AVAILABLE else [])
+    patches = random_patches(args.patches, args.patch_size)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model_path
+        if model_path is None:
+            model_path = os.path.join(tmp, 'random_resnet50.pth')
+            torch.save(ResNet50Classifier(num_classes=1).state_dict(), model_path)
+        artifacts = export_model(model_path, formats=formats, output_dir=tmp)
+        
+        classifiers = {'eager': PatchClassifier(model_path=model_path, device=args.device)}
+        for fmt, path in artifacts.items():
+            classifiers[fmt] = PatchClassifier(
+                model_path=model_path, device=args.device, backend=fmt, backend_path=path
+            )
+        
+        device = classifiers['eager'].device
+        inputs = classifiers['eager'].preprocess_batch(patches)
+        batches = list(torch.split(inputs, args.batch_size))
+        single = inputs[:1]
+        reference = [p['tumor_probability'] for b in batches
+                     for p in classifiers['eager'].predict_tensor(b)]
+        
+        rows = {}
+        print(f"\n🚀 Backends: {args.patches} patches, batch {args.batch_size}, device {device}, "
+              f"{torch.get_num_threads()} torch threads")
+        print(f"   {'backend':<12} {'latency (ms)':>13} {'patches/s':>11} {'max |Δp|':>10}")
+        for name, classifier in classifiers.items():
+            latency = time_call(lambda: classifier.predict_tensor(single), args.repeats, device)
+            total = time_call(
+                lambda: [classifier.predict_tensor(b) for b in batches], args.repeats, device
+            )
+            probabilities = [p['tumor_probability'] for b in batches
+                             for p in classifier.predict_tensor(b)]
+            max_diff = float(np.max(np.abs(np.array(probabilities) - np.array(reference))))
+            rows[name] = total
+            print(f"   {name:<12} {latency * 1e3:13.2f} {args.patches / total:11.1f} {max_diff:10.2e}")
+    
+    return rows
+
+
+def benchmark_quantize(args) -> Dict[str, float]:
+    """fp32 vs INT8 (dynamic head, static backbone): throughput and probability drift on held-out patches"""
+    total = args.calibration_patches + args.patches
+    if args.images:
+        tiler = GigapixelTiler(patch_size=args.patch_size, scales=[1.0])
+        patches = sample_tiler_patches(tiler, args.images, total)
+        source = f"{len(args.images)} slide(s)"
+    else:
+        patches = random_patches(total, args.patch_size)
+        source = "synthetic patches (pass --images for real calibration data)"
+    calibration, holdout = split_holdout(patches, args.patches / total)
+    batches = [holdout[i:i + args.batch_size] for i in range(0, len(holdout), args.batch_size)]
+    
+    print(f"\n🔢 Quantization: {len(calibration)} calibration / {len(holdout)} held-out patches "
+          f"from {source}, batch {args.batch_size}, {torch.get_num_threads()} torch threads")
+    
+    rows = {}
+    reference = None
+    for mode in ['fp32'] + args.modes:
+        classifier = load_classifier(args.model_path, 'cpu')
+        if mode != 'fp32':
+            classifier.quantize(mode, calibration_patches=calibration, batch_size=args.batch_size)
+        
+        # Preprocessing is shared by all modes: time the model only
+        inputs = [classifier.preprocess_batch(b) for b in batches]
+        rows[mode] = time_call(lambda: [classifier.predict_tensor(t) for t in inputs], args.repeats)
+        probabilities = np.array([p['tumor_probability'] for t in inputs
+                                  for p in classifier.predict_tensor(t)])
+        if reference is None:
+            reference = probabilities
+        
+        diff = np.abs(probabilities - reference)
+        agreement = np.mean((probabilities > classifier.threshold) == (reference > classifier.threshold))
+        print(f"   {mode:<8} {len(holdout) / rows[mode]:9.1f} patches/s  "
+              f"speedup {rows['fp32'] / rows[mode]:5.2f}x  max |Δp| {diff.max():.4f}  "
+              f"mean |Δp| {diff.mean():.4f}  class agreement {agreement * 100:.1f}%")
+    
+    return rows
+
+
+def benchmark_profiles(args) -> Dict[str, float]:
+    """Default vs channels_last vs channels_last + bf16 autocast on real batches"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    patches = random_patches(args.patches, args.patch_size)
+    inputs = list(torch.split(classifier.preprocess_batch(patches), args.batch_size))
+    
+    best, _ = probe_profiles(classifier.model, tuple(inputs[0].shape), device)
+    
+    rows = {}
+    reference = None
+    print(f"\n🏎️  Execution profiles: {args.patches} patches, batch {args.batch_size}, "
+          f"device {device}, bf16 kernels: {bf16_supported(device)}")
+    for name in PROFILES:
+        if name.endswith('bf16') and not bf16_supported(device):
+            continue
+        classifier.set_profile(name)
+        
+        rows[name] = time_call(lambda: [classifier.predict_tensor(t) for t in inputs], args.repeats, device)
+        probabilities = np.array([p['tumor_probability'] for t in inputs
+                                  for p in classifier.predict_tensor(t)])
+        reference = probabilities if reference is None else reference
+        print(f"   {name:<20} {args.patches / rows[name]:9.1f} patches/s  "
+              f"speedup {rows['default'] / rows[name]:5.2f}x  "
+              f"max |Δp| {np.abs(probabilities - reference).max():.4f}")
+    print(f"   Startup probe picks: {best}")
+    return rows
+
+
+def benchmark_ensemble(args) -> Dict[str, float]:
+    """Per-patch ensemble loop vs batched members vs vmapped (fused) members"""
+    patches = list(random_patches(args.patches, args.patch_size))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.members):
+            if args.model_path:
+                paths.append(args.model_path)
+                continue
+            torch.manual_seed(i)
+            paths.append(os.path.join(tmp, f'member_{i}.pth'))
+            torch.save(ResNet50Classifier(num_classes=1).state_dict(), paths[-1])
+        
+        ensembles = {
+            fusion: EnsembleClassifier(paths, device=args.device, fusion=fusion)
+            for fusion in ('loop', 'vmap')
+        }
+    
+    device = ensembles['loop'].device
+    rows = {
+        'per patch (predict)': time_call(
+            lambda: [ensembles['loop'].predict(p) for p in patches], args.repeats, device
+        ),
+        'batched loop': time_call(
+            lambda: ensembles['loop'].predict_batch(patches, args.batch_size), args.repeats, device
+        ),
+        'batched vmap': time_call(
+            lambda: ensembles['vmap'].predict_batch(patches, args.batch_size), args.repeats, device
+        )
+    }
+    
+    max_diff = np.abs(
+        ensembles['loop'].predict_batch(patches, args.batch_size)['mean']
+        - ensembles['vmap'].predict_batch(patches, args.batch_size)['mean']
+    ).max()
+    
+    print_rows(
+        f"👥 Ensemble: {args.members} members, {args.patches} patches, "
+        f"batch {args.batch_size}, device {device}",
+        rows, args.patches
+    )
+    print(f"   Max mean-probability difference (vmap vs loop): {max_diff:.2e}")
+    return rows
+
+
+def benchmark_cascade(args) -> Dict[str, float]:
+    """Full model on every patch vs screening + escalation of the uncertainty band"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    cascade = CascadeClassifier(classifier, band=tuple(args.band), screening_size=args.screening_size)
+    
+    if args.image:
+        tiler = GigapixelTiler(patch_size=args.patch_size, scales=[1.0])
+        plan = tiler.create_tiling_plan(args.image)
+        batches = [patches for patches, _ in tiler.iter_plan_batches(args.image, plan, args.batch_size)]
+    else:
+        patches = random_patches(args.patches, args.patch_size)
+        batches = [patches[i:i + args.batch_size] for i in range(0, len(patches), args.batch_size)]
+    inputs = [classifier.preprocess_batch(b) for b in batches]
+    count = sum(len(b) for b in batches)
+    
+    full = [p for t in inputs for p in classifier.predict_tensor(t)]
+    cascade.reset_stats()
+    staged = [p for t in inputs for p in cascade.predict_tensor(t)]
+    fraction = cascade.escalation_fraction
+    
+    rows = {
+        'full model': time_call(lambda: [classifier.predict_tensor(t) for t in inputs], args.repeats, device),
+        'cascade': time_call(lambda: [cascade.predict_tensor(t) for t in inputs], args.repeats, device)
+    }
+    
+    full_p = np.array([p['tumor_probability'] for p in full])
+    cascade_p = np.array([p['tumor_probability'] for p in staged])
+    screened = np.array([p['decided_by'] == 'screening' for p in staged])
+    agreement = np.mean((full_p > classifier.threshold) == (cascade_p > classifier.threshold))
+    
+    print_rows(
+        f"🪜 Cascade: {count} patches, band {tuple(args.band)}, screening at "
+        f"{args.screening_size}px, device {device}",
+        rows, max(count, 1)
+    )
+    print(f"   Escalated: {fraction * 100:.1f}%, speedup {rows['full model'] / rows['cascade']:.2f}x, "
+          f"class agreement with full model {agreement * 100:.1f}%")
+    if screened.any():
+        print(f"   Screened patches: max |Δp| vs full model {np.abs(full_p - cascade_p)[screened].max():.4f}")
+    return rows
+
+
+def benchmark_tta(args) -> Dict[str, float]:
+    """Test-time augmentation: one call per view vs all views stacked into one batch"""
+    classifier = load_classifier(args.model_path, args.device)
+    device = classifier.device
+    patches = random_patches(args.patches, args.patch_size)
+    inputs = list(torch.split(classifier.preprocess_batch(patches), args.batch_size))
+    
+    def per_view():
+        # Same views, one forward pass each
+        for t in inputs:
+            for view in torch.split(augment_views(t, args.tta), len(t)):
+                classifier.predict_tensor(view)
+    
+    rows = {
+        'no TTA': time_call(lambda: [classifier.predict_tensor(t) for t in inputs], args.repeats, device),
+        'TTA, view per call': time_call(per_view, args.repeats, device),
+        'TTA, stacked views': time_call(
+            lambda: [classifier.predict_tensor(t, tta=args.tta) for t in inputs], args.repeats, device
+        )
+    }
+    
+    variances = np.array([p['tta_variance'] for t in inputs for p in classifier.predict_tensor(t, tta=args.tta)])
+    print_rows(
+        f"🔄 TTA ({args.tta}): {args.patches} patches, batch {args.batch_size}, device {device}",
+        rows, args.patches
+    )
+    print(f"   Stacked speedup vs per-view: {rows['TTA, view per call'] / rows['TTA, stacked views']:.2f}x, "
+          f"mean view variance {variances.mean():.2e}")
+    return rows
+
+
+def benchmark_heatmap(args) -> Dict[str, float]:
+    """Per-patch HeatmapGenerator.add_patch_prediction loop vs bulk add_patch_predictions"""
+    stride = int(args.patch_size * (1 - args.overlap))
+    side = int(np.ceil(np.sqrt(args.patches)))
+    image_size = (stride * (side - 1) + args.patch_size,) * 2
+    
+    rng = np.random.default_rng(0)
+    ys, xs = np.divmod(np.arange(args.patches), side)
+    x, y = xs * stride, ys * stride
+    probabilities = rng.random(args.patches).astype(np.float32)
+    confidences = probabilities.astype(np.float64) * 100
+    
+    def generator():
+        return HeatmapGenerator(image_size, args.patch_size, args.method, stride=stride)
+    
+    def per_patch():
+        gen = generator()
+        for i in range(args.patches):
+            gen.add_patch_prediction(int(x[i]), int(y[i]), float(probabilities[i]), float(confidences[i]))
+        return gen
+    
+    def bulk():
+        gen = generator()
+        gen.add_patch_predictions(x, y, probabilities, confidences)
+        return gen
+    
+    rows = {
+        'per-patch loop': time_call(per_patch, args.repeats),
+        'bulk (vectorized)': time_call(bulk, args.repeats)
+    }
+    reference, vectorized = per_patch(), bulk()
+    grid_size = (reference.grid_width, reference.grid_height)
+    max_diff = np.abs(
+        reference.generate_heatmap(False, False, output_size=grid_size)
+        - vectorized.generate_heatmap(False, False, output_size=grid_size)
+    ).max()
+    
+    print_rows(
+        f"🗺️  Heatmap accumulation ({args.method}): {args.patches} patches, "
+        f"{image_size[0]}x{image_size[1]} slide, {reference.grid_width}x{reference.grid_height} "
+        f"grid of {reference.cell_size}px cells",
+        rows, args.patches
+    )
+    print(f"   Speedup {rows['per-patch loop'] / rows['bulk (vectorized)']:.1f}x, "
+          f"max |Δ| of the heatmaps {max_diff:.2e}")
+    return rows
+
+
+def benchmark_lesions(args) -> Dict[str, float]:
+    """detect_lesions per threshold vs one LesionThresholdIndex answering every threshold"""
+    from scipy.ndimage import gaussian_filter
+    
+    rng = np.random.default_rng(0)
+    heatmap = gaussian_filter(rng.random((args.size, args.size)).astype(np.float32), args.sigma)
+    heatmap = (heatmap - heatmap.min()) / (heatmap.max() - heatmap.min())
+    thresholds = args.thresholds
+    
+    start = time.perf_counter()
+    index = LesionThresholdIndex(heatmap)
+    build = time.perf_counter() - start
+    
+    rows = {'index build': build}
+    max_diff = 0.0
+    for threshold in thresholds:
+        detector = LesionDetector(threshold, args.min_size)
+        rows[f'detect_lesions t={threshold}'] = time_call(lambda: detector.detect_lesions(heatmap), args.repeats)
+        rows[f'index query t={threshold}'] = time_call(
+            lambda: index.detect_lesions(threshold, args.min_size), args.repeats
+        )
+        
+        reference = sorted(detector.detect_lesions(heatmap), key=lambda lesion: lesion['id'])
+        queried = sorted(index.detect_lesions(threshold, args.min_size), key=lambda lesion: lesion['id'])
+        if [(l['id'], l['bbox'], l['area']) for l in reference] != [(l['id'], l['bbox'], l['area']) for l in queried]:
+            raise AssertionError(f"Index lesions differ from detect_lesions at threshold {threshold}")
+        max_diff = max([max_diff] + [abs(a['avg_confidence'] - b['avg_confidence'])
+                                     for a, b in zip(reference, queried)])
+    
+    print(f"\n🎚️  Lesion detection over thresholds: {args.size}x{args.size} heatmap "
+          f"(sigma {args.sigma}), {index.num_nodes} tree nodes")
+    print(f"   {'stage':<28} {'time (ms)':>12}")
+    for name, seconds in rows.items():
+        print(f"   {name:<28} {seconds * 1e3:12.2f}")
+    
+    detect = sum(v for k, v in rows.items() if k.startswith('detect_lesions'))
+    query = sum(v for k, v in rows.items() if k.startswith('index query'))
+    print(f"   Query speedup {detect / query:.1f}x (index pays off after "
+          f"{build / max(detect / len(thresholds) - query / len(thresholds), 1e-9):.1f} slider moves), "
+          f"max |Δ| of avg_confidence {max_diff:.2e}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Patch classification micro-benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    def add_common(sub):
+        sub.add_argument('--model-path', default=None, help='Model weights (random if omitted)')
+        sub.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+        sub.add_argument('--patches', type=int, default=256)
+        sub.add_argument('--patch-size', type=int, default=224)
+        sub.add_argument('--batch-size', type=int, default=32)
+        sub.add_argument('--repeats', type=int, default=3)
+
+    preprocess = subparsers.add_parser('preprocess', help='Batch preprocessing vs PIL transform')
+    add_common(preprocess)
+    preprocess.set_defaults(func=benchmark_preprocess)
+
+    prefetch = subparsers.add_parser('prefetch', help='Overlapped preprocessing and inference')
+    add_common(prefetch)
+    prefetch.add_argument('--depth', type=int, default=2, help='Batches prepared ahead')
+    prefetch.set_defaults(func=benchmark_prefetch)
+
+    dense = subparsers.add_parser('dense', help='Fully convolutional vs per-patch grid inference')
+    add_common(dense)
+    dense.add_argument('--image', required=True, help='Slide to tile')
+    dense.add_argument('--region-cells', type=int, default=16, help='Windows per region side')
+    dense.add_argument('--halo-cells', type=int, default=2, help='Context cells around regions')
+    dense.set_defaults(func=benchmark_dense)
+    
+    backends = subparsers.add_parser('backends', help='Eager vs TorchScript vs ONNX Runtime')
+    add_common(backends)
+    backends.set_defaults(func=benchmark_backends)
+    
+    quantize = subparsers.add_parser('quantize', help='INT8 accuracy-vs-speed report (CPU)')
+    add_common(quantize)
+    quantize.add_argument('--images', nargs='*', default=[], help='Slides to sample patches from')
+    quantize.add_argument('--calibration-patches', type=int, default=128)
+    quantize.add_argument('--modes', nargs='+', choices=['dynamic', 'static'],
+                          default=['dynamic', 'static'])
+    quantize.set_defaults(func=benchmark_quantize)
+    
+    profiles = subparsers.add_parser('profiles', help='Memory layout / bf16 execution profiles')
+    add_common(profiles)
+    profiles.set_defaults(func=benchmark_profiles)
+    
+    ensemble = subparsers.add_parser('ensemble', help='Batched and vmapped ensemble inference')
+    add_common(ensemble)
+    ensemble.add_argument('--members', type=int, default=3, help='Ensemble size')
+    ensemble.set_defaults(func=benchmark_ensemble)
+    
+    cascade = subparsers.add_parser('cascade', help='Screening + escalation vs full model')
+    add_common(cascade)
+    cascade.add_argument('--image', default=None, help='Slide to tile (random patches if omitted)')
+    cascade.add_argument('--band', type=float, nargs=2, default=[0.1, 0.9], help='Escalated range')
+    cascade.add_argument('--screening-size', type=int, default=48)
+    cascade.set_defaults(func=benchmark_cascade)
+    
+    tta = subparsers.add_parser('tta', help='Stacked vs per-view test-time augmentation')
+    add_common(tta)
+    tta.add_argument('--tta', choices=['flips', 'dihedral'], default='dihedral')
+    tta.set_defaults(func=benchmark_tta)
+    
+    heatmap = subparsers.add_parser('heatmap', help='Per-patch vs vectorized heatmap accumulation')
+    add_common(heatmap)
+    heatmap.add_argument('--overlap', type=float, default=0.25)
+    heatmap.add_argument('--method', choices=['weighted_average', 'average', 'max'],
+                         default='weighted_average')
+    heatmap.set_defaults(func=benchmark_heatmap, patches=100000)
+    
+    lesions = subparsers.add_parser('lesions', help='Per-threshold detect_lesions vs a threshold index')
+    lesions.add_argument('--size', type=int, default=2048, help='Heatmap side')
+    lesions.add_argument('--sigma', type=float, default=6.0, help='Smoothing of the random heatmap')
+    lesions.add_argument('--thresholds', type=float, nargs='+', default=[0.3, 0.5, 0.6, 0.7])
+    lesions.add_argument('--min-size', type=int, default=100, help='Minimum lesion area')
+    lesions.add_argument('--repeats', type=int, default=3)
+    lesions.set_defaults(func=benchmark_lesions)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# 🪜 Cascade Inference
+# Cheap screening pass over every patch; only patches in an uncertainty band
+# are escalated to the full classifier (or an ensemble)
+
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+from typing import List, Optional, Tuple
+
+from .classifier import PatchClassifier, PatchPredictions, EnsembleClassifier
+
+
+class CascadeClassifier:
+    """
+    Two-stage patch classification.
+
+    Stage 1 (screening) scores every patch with either a small model or
+    the full model on a downscaled input (by default 48px instead of 96px,
+    about a quarter of the FLOPs). Patches whose screening probability is
+    outside band are decided there; the rest are escalated to the full
+    PatchClassifier, or to an EnsembleClassifier when one is given.
+
+    predict_tensor has the same signature and record format as
+    PatchClassifier.predict_tensor, so the cascade plugs into any
+    execution mode of the pipeline. The predictions add the columns
+    'decided_by' ('screening', 'classifier' or 'ensemble') and
+    'screening_probability' (and 'uncertainty', NaN unless decided by the
+    ensemble, when escalating to one).
+    """
+
+    def __init__(
+        self,
+        classifier: PatchClassifier,
+        band: Tuple[float, float] = (0.1, 0.9),
+        screening_size: Optional[int] = 48,
+        screening_classifier: Optional[PatchClassifier] = None,
+        ensemble: Optional[EnsembleClassifier] = None
+    ):
+        """
+        Args:
+            classifier: Full model; also preprocesses batches and formats records
+            band: (low, high) screening probabilities that get escalated
+            screening_size: Input size of the downscaled screening pass of the
+                full model (ignored when screening_classifier is given)
+            screening_classifier: Separate small/fast screening model
+            ensemble: Escalate to this ensemble instead of the full classifier
+        """
+        low, high = band
+        if not 0 <= low <= high <= 1:
+            raise ValueError(f"Invalid uncertainty band {band}")
+
+        self.classifier = classifier
+        self.band = (low, high)
+        self.screening_size = screening_size
+        self.screening_classifier = screening_classifier
+        self.ensemble = ensemble
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'patches': 0, 'escalated': 0, 'screening_s': 0.0, 'escalation_s': 0.0}
+
+    @property
+    def escalation_fraction(self) -> float:
+        return self.stats['escalated'] / self.stats['patches'] if self.stats['patches'] else 0.0
+
+    def screen(self, batch_tensor: torch.Tensor) -> torch.Tensor:
+        """
+        Screening probabilities for a preprocessed (B, 3, H, W) batch.
+
+        Inputs are normalized already, so downscaling the batch is the same
+        as preprocessing at the smaller size (up to resampling filter).
+        """
+        screener = self.screening_classifier or self.classifier
+        if self.screening_classifier is not None:
+            size = tuple(screener.input_size)
+        else:
+            size = (self.screening_size, self.screening_size) if self.screening_size else None
+
+        batch_tensor = batch_tensor.to(screener.device, non_blocking=True)
+        if size is not None and tuple(batch_tensor.shape[-2:]) != size:
+            batch_tensor = F.interpolate(
+                batch_tensor, size=size, mode='bilinear', align_corners=False, antialias=True
+            )
+
+        # Eager model: exported graphs are traced for the full input size
+        logits = screener.profile.run(screener.model, batch_tensor)
+        return torch.sigmoid(logits[:, 0])
+
+    def predict_tensor(self, batch_tensor: torch.Tensor) -> PatchPredictions:
+        """
+        Classify a preprocessed batch through the cascade.
+
+        Returns:
+            PatchPredictions in batch order
+        """
+        start = time.perf_counter()
+        screening = self.screen(batch_tensor).cpu().numpy()
+        self.stats['screening_s'] += time.perf_counter() - start
+
+        low, high = self.band
+        escalate = np.flatnonzero((screening >= low) & (screening <= high))
+
+        results = self.classifier.format_predictions(screening)
+        results.set_column('decided_by', 'screening')
+        results.set_column('screening_probability', screening)
+
+        if len(escalate):
+            start = time.perf_counter()
+            subset = batch_tensor[torch.from_numpy(escalate).to(batch_tensor.device)]
+            results.update_rows(escalate, self._escalate(subset))
+            self.stats['escalation_s'] += time.perf_counter() - start
+
+        self.stats['patches'] += len(results)
+        self.stats['escalated'] += len(escalate)
+        return results
+
+    def _escalate(self, batch_tensor: torch.Tensor) -> PatchPredictions:
+        """Full-model (or ensemble) predictions for the escalated patches"""
+        if self.ensemble is None:
+            return self.classifier.predict_tensor(batch_tensor).set_column('decided_by', 'classifier')
+
+        member_probs = self.ensemble.member_probabilities(batch_tensor).cpu().numpy()
+        if self.ensemble.ensemble_method == 'vote':
+            probabilities = (member_probs > 0.5).mean(axis=0)
+        else:
+            probabilities = member_probs.mean(axis=0)
+
+        records = self.classifier.format_predictions(probabilities)
+        records.set_column('decided_by', 'ensemble')
+        return records.set_column('uncertainty', member_probs.std(axis=0))
+
+    def predict_batch(self, patches: List[np.ndarray], batch_size: int = 32) -> PatchPredictions:
+        """Cascade classification of raw patches"""
+        return PatchPredictions.concatenate([
+            self.predict_tensor(self.classifier.preprocess_batch(patches[i:i + batch_size]))
+            for i in range(0, len(patches), batch_size)
+        ])
@@ -4,9 +4,18 @@
 import torch
 import torch.nn as nn
 from torchvision import models, transforms
-from typing import Tuple, List, Optional, Dict
+from typing import Callable, Generator, Tuple, List, Optional, Dict, Sequence
 import numpy as np
 from PIL import Image
+import copy
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+
+from .inference_backends import EagerBackend, create_backend
+from .quantization import quantize_model
+from .execution_profiles import ExecutionProfile, resolve_profile
 
 
 class ResNet50Classifier(nn.Module):
@@ -53,6 +62,207 @@ class ResNet50Classifier(nn.Module):
         x = self.backbone.layer4(x)
         
         return x  # (B, 2048, 7, 7) for ResNet50
+    
+    def forward_with_features(
+        self,
+        x: torch.Tensor,
+        layers: Optional[List[str]] = None
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Logits and embeddings from a single backbone pass.
+        
+        Same operations as forward(), with the intermediate results kept.
+        
+        Args:
+            x: (B, 3, H, W) input batch
+            layers: Extra modules to capture with forward hooks, by name
+                ('layer2' or 'backbone.layer2')
+            
+        Returns:
+            'logits' (B, num_classes), 'embeddings' (B, 2048) globally pooled
+            layer4 features, 'feature_map' (B, 2048, h, w) and one entry per
+            requested layer
+        """
+        modules = dict(self.named_modules())
+        captured = {}
+        handles = []
+        for name in layers or []:
+            module = modules.get(name, modules.get(f'backbone.{name}'))
+            if module is None:
+                raise ValueError(f"Unknown layer '{name}'")
+            handles.append(module.register_forward_hook(
+                lambda module, inputs, output, name=name: captured.__setitem__(name, output)
+            ))
+        
+        try:
+            feature_map = self.get_features(x)
+            embeddings = torch.flatten(self.backbone.avgpool(feature_map), 1)
+            logits = self.backbone.fc(embeddings)
+        finally:
+            for handle in handles:
+                handle.remove()
+        
+        return {'logits': logits, 'embeddings': embeddings, 'feature_map': feature_map, **captured}
+
+
+class PatchPredictions:
+    """
+    Columnar patch predictions.
+    
+    One NumPy array per field instead of one dictionary per patch:
+    - tumor_probability: float32 sigmoid outputs
+    - class_id: int64, 1 where tumor_probability > threshold
+    - confidence: float64 tumor_probability * 100
+    - x, y: optional int32 top-left corners (aligned with a TilingPlan)
+    - embeddings: optional (N, D) float32 pooled layer4 features
+    - columns: extra per-patch arrays (e.g. 'tta_variance', 'decided_by')
+    
+    For backwards compatibility it behaves like the list of prediction
+    dictionaries it replaces: len(), iteration and integer indexing build
+    those dictionaries on access. Slices, boolean masks and index arrays
+    return another PatchPredictions.
+    """
+    
+    def __init__(
+        self,
+        tumor_probability: np.ndarray,
+        threshold: float = 0.5,
+        class_names: Sequence[str] = ('Normal', 'Tumor'),
+        x: Optional[np.ndarray] = None,
+        y: Optional[np.ndarray] = None,
+        embeddings: Optional[np.ndarray] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None
+    ):
+        self.tumor_probability = np.ascontiguousarray(tumor_probability, dtype=np.float32).reshape(-1)
+        # Thresholded in float64 like the Python floats of the dictionaries
+        probabilities = self.tumor_probability.astype(np.float64)
+        self.class_id = (probabilities > threshold).astype(np.int64)
+        self.confidence = probabilities * 100
+        self.threshold = threshold
+        self.class_names = list(class_names)
+        self.x = None if x is None else np.ascontiguousarray(x, dtype=np.int32)
+        self.y = None if y is None else np.ascontiguousarray(y, dtype=np.int32)
+        self.embeddings = embeddings
+        self.columns = {}
+        for name, values in (columns or {}).items():
+            self.set_column(name, values)
+    
+    @classmethod
+    def concatenate(cls, parts: List['PatchPredictions']) -> 'PatchPredictions':
+        """
+        Join predictions of consecutive batches (empty predictions for no parts).
+        
+        An extra column missing from some parts is filled there with NaN
+        (numbers) or '' (strings).
+        """
+        if not parts:
+            return cls(np.zeros(0, dtype=np.float32))
+        first = parts[0]
+        
+        def joined(getter):
+            arrays = [getter(p) for p in parts]
+            return None if any(a is None for a in arrays) else np.concatenate(arrays)
+        
+        dtypes = {}
+        for part in parts:
+            for name, values in part.columns.items():
+                dtypes.setdefault(name, values.dtype)
+        
+        def column(part, name):
+            if name in part.columns:
+                return part.columns[name]
+            if dtypes[name].kind in 'fiub':
+                return np.full(len(part), np.nan)
+            return np.full(len(part), '', dtype=object)
+        
+        return cls(
+            joined(lambda p: p.tumor_probability),
+            threshold=first.threshold,
+            class_names=first.class_names,
+            x=joined(lambda p: p.x),
+            y=joined(lambda p: p.y),
+            embeddings=joined(lambda p: p.embeddings),
+            columns={name: np.concatenate([column(p, name) for p in parts]) for name in dtypes}
+        )
+    
+    def with_positions(self, x: np.ndarray, y: np.ndarray) -> 'PatchPredictions':
+        """Attach top-left corners (e.g. TilingPlan.x / TilingPlan.y); returns self"""
+        self.x = np.ascontiguousarray(x, dtype=np.int32)
+        self.y = np.ascontiguousarray(y, dtype=np.int32)
+        return self
+    
+    def set_column(self, name: str, values) -> 'PatchPredictions':
+        """Add or replace an extra per-patch column; returns self"""
+        values = np.asarray(values)
+        if values.shape[:1] != (len(self),):
+            values = np.full(len(self), values)
+        if values.dtype.kind == 'U':
+            values = values.astype(object)  # Fixed-width strings would truncate on update
+        self.columns[name] = values
+        return self
+    
+    def update_rows(self, indices: np.ndarray, other: 'PatchPredictions'):
+        """
+        Overwrite rows at indices with other's predictions (in order).
+        
+        Extra columns missing on either side keep their values; columns new
+        to self are filled with NaN (floats) or '' elsewhere.
+        """
+        self.tumor_probability[indices] = other.tumor_probability
+        self.class_id[indices] = other.class_id
+        self.confidence[indices] = other.confidence
+        if self.embeddings is not None and other.embeddings is not None:
+            self.embeddings[indices] = other.embeddings
+        for name, values in other.columns.items():
+            if name not in self.columns:
+                self.set_column(name, np.nan if values.dtype.kind in 'fiub' else '')
+            self.columns[name][indices] = values
+    
+    def record(self, index: int) -> Dict:
+        """Prediction dictionary of one patch (same keys as format_predictions used to build)"""
+        probability = float(self.tumor_probability[index])
+        class_id = int(self.class_id[index])
+        result = {
+            'class_id': class_id,
+            'class_name': self.class_names[class_id],
+            'tumor_probability': probability,
+            'normal_probability': 1 - probability,
+            'confidence': float(self.confidence[index])
+        }
+        if self.x is not None:
+            result['x'] = int(self.x[index])
+            result['y'] = int(self.y[index])
+        for name, values in self.columns.items():
+            value = values[index]
+            result[name] = value.item() if isinstance(value, np.generic) else value
+        if self.embeddings is not None:
+            result['embedding'] = self.embeddings[index]
+        return result
+    
+    def to_dicts(self) -> List[Dict]:
+        return [self.record(i) for i in range(len(self))]
+    
+    def __len__(self) -> int:
+        return len(self.tumor_probability)
+    
+    def __iter__(self):
+        return (self.record(i) for i in range(len(self)))
+    
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.record(index)
+        return PatchPredictions(
+            self.tumor_probability[index],
+            threshold=self.threshold,
+            class_names=self.class_names,
+            x=None if self.x is None else self.x[index],
+            y=None if self.y is None else self.y[index],
+            embeddings=None if self.embeddings is None else self.embeddings[index],
+            columns={name: values[index] for name, values in self.columns.items()}
+        )
+    
+    def __repr__(self) -> str:
+        return f"PatchPredictions({len(self)} patches, columns={list(self.columns)})"
 
 
 class PatchClassifier:
@@ -66,8 +276,24 @@ class PatchClassifier:
         model_path: str,
         device: str = 'cuda' if torch.cuda.is_available() else 'cpu',
         class_names: List[str] = ['Normal', 'Tumor'],
-        threshold: float = 0.5
+        threshold: float = 0.5,
+        backend: str = 'eager',
+        backend_path: Optional[str] = None,
+        profile: str = 'default'
     ):
+        """
+        Args:
+            model_path: Trained weights (.pth)
+            device: 'cuda' or 'cpu'
+            class_names: Names of class 0 and class 1
+            threshold: Tumor probability threshold
+            backend: 'eager', 'torchscript' or 'onnx' (ONNX Runtime); exported
+                backends produce the same prediction dictionaries
+            backend_path: Exported artifact (defaults to model_path with a
+                .ts / .onnx suffix, as written by export_model)
+            profile: Eager execution profile: 'default', 'channels_last',
+                'channels_last_bf16', or 'auto' to probe for the fastest one
+        """
         self.device = torch.device(device)
         self.class_names = class_names
         self.threshold = threshold
@@ -81,15 +307,48 @@ class PatchClassifier:
         self.model.eval()
         print("✅ Model loaded successfully!")
         
+        # Runtime used for predictions (features always come from the eager model)
+        self.backend_name = backend
+        self.backend = create_backend(
+            backend, self.model, self.device, model_path=model_path, artifact_path=backend_path
+        )
+        self.quantization = None
+        
         # Preprocessing
+        self.input_size = (96, 96)  # Camelyon16 patch size
+        self.mean = [0.485, 0.456, 0.406]
+        self.std = [0.229, 0.224, 0.225]
         self.transform = transforms.Compose([
-            transforms.Resize((96, 96)),  # Camelyon16 patch size
+            transforms.Resize(self.input_size),
             transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
+            transforms.Normalize(mean=self.mean, std=self.std)
         ])
+        
+        # Memory layout / precision of the eager model
+        self.profile = ExecutionProfile('default', self.device)
+        if profile != 'default':
+            self.set_profile(profile)
+    
+    def set_profile(self, profile: str) -> ExecutionProfile:
+        """
+        Switch the eager model to an execution profile ('auto' probes the machine).
+        
+        After quantize(), predictions keep running through the INT8 model;
+        the profile then only applies to the fp32 model (features, dense
+        inference, cascade screening).
+        
+        Returns:
+            The profile now in use
+        """
+        if self.backend_name != 'eager':
+            raise ValueError(f"Execution profiles apply to the eager backend, not '{self.backend_name}'")
+        self.profile = resolve_profile(profile, self.model, (32, 3, *self.input_size), self.device)
+        if self.quantization:
+            print(f"⚠️  Predictions stay on the {self.quantization} INT8 model; "
+                  f"profile '{self.profile.name}' applies to the fp32 model only")
+        else:
+            self.backend = EagerBackend(self.model, self.profile)
+        return self.profile
     
     def preprocess_patch(self, patch: np.ndarray) -> torch.Tensor:
         """Convert numpy patch to model input tensor"""
@@ -117,17 +376,16 @@ class PatchClassifier:
         # Preprocess
         input_tensor = self.preprocess_patch(patch)
         
-        # Forward pass
-        with torch.no_grad():
-            # Get prediction
-            output = self.model(input_tensor).squeeze()
-            probability = torch.sigmoid(output).item()
-            
-            # Get features if requested
-            features = None
-            if return_features:
-                features = self.model.get_features(input_tensor)
-                features = features.cpu().numpy()
+        # Forward pass (one backbone pass also yields the layer4 features)
+        features = None
+        if return_features:
+            outputs = self.forward_batch(input_tensor)
+            probability = outputs['probabilities'][0].item()
+            features = outputs['feature_map'].cpu().numpy()
+        else:
+            with torch.no_grad():
+                output = self.backend(input_tensor).squeeze()
+                probability = torch.sigmoid(output).item()
         
         # Interpret results
         confidence = probability * 100
@@ -146,68 +404,300 @@ class PatchClassifier:
     def predict_batch(
         self,
         patches: List[np.ndarray],
-        batch_size: int = 32
-    ) -> List[Dict]:
+        batch_size: int = 32,
+        prefetch: bool = True,
+        return_embeddings: bool = False,
+        tta: Optional[str] = None
+    ) -> PatchPredictions:
         """
         Classify multiple patches efficiently.
         
         Args:
             patches: List of patches as numpy arrays
             batch_size: Batch size for inference
+            prefetch: Preprocess the next batch while the current one runs
+            return_embeddings: Add each patch's pooled layer4 'embedding'
+                (from the same forward pass)
+            tta: Test-time augmentation: 'flips' (4 views) or 'dihedral'
+                (8 views: flips and 90° rotations); see predict_tensor
             
         Returns:
-            List of prediction dictionaries
+            PatchPredictions in patch order (iterates as prediction dictionaries)
         """
         results = []
+        infer_fn = partial(self.predict_tensor, return_embeddings=return_embeddings, tta=tta)
+        
+        if prefetch and len(patches) > batch_size:
+            batches = (
+                (patches[i:i + batch_size], None) for i in range(0, len(patches), batch_size)
+            )
+            for predictions, _ in PrefetchingInferenceRunner(self, infer_fn=infer_fn).run(batches):
+                results.append(predictions)
+            return PatchPredictions.concatenate(results)
         
         for i in range(0, len(patches), batch_size):
             batch_patches = patches[i:i+batch_size]
             
             # Preprocess batch
-            batch_tensors = []
-            for patch in batch_patches:
-                if isinstance(patch, np.ndarray):
-                    patch = Image.fromarray(patch)
-                tensor = self.transform(patch)
-                batch_tensors.append(tensor)
-            
-            batch_tensor = torch.stack(batch_tensors).to(self.device)
+            batch_tensor = self.preprocess_batch(batch_patches)
             
             # Forward pass
+            results.append(infer_fn(batch_tensor))
+        
+        return PatchPredictions.concatenate(results)
+    
+    def preprocess_batch(self, patches: List[np.ndarray]) -> torch.Tensor:
+        """
+        Convert patches to a (B, 3, H, W) input tensor on the model device.
+        
+        Same-sized patches go through the fused tensor path (uint8 copied to
+        the device, then resize/scale/normalize on the whole batch); mixed
+        sizes fall back to the per-patch torchvision transform.
+        """
+        if _same_shape(patches):
+            return preprocess_patch_batch(
+                patches, self.input_size, self.mean, self.std, device=self.device
+            )
+        return preprocess_patches(patches, self.transform).to(self.device)
+    
+    def predict_tensor(
+        self,
+        batch_tensor: torch.Tensor,
+        return_embeddings: bool = False,
+        tta: Optional[str] = None
+    ) -> PatchPredictions:
+        """
+        Classify an already preprocessed batch.
+        
+        Args:
+            batch_tensor: (B, 3, H, W) normalized input tensor
+            return_embeddings: Add each patch's pooled layer4 'embedding'
+                ((2048,) float32 array) from the same forward pass
+            tta: 'flips' or 'dihedral' to average over augmented views, all
+                run as one (views * B) batch; records then hold the mean
+                probability and its 'tta_variance' across views
+            
+        Returns:
+            PatchPredictions (iterates as prediction dictionaries)
+        """
+        if tta:
+            return self._predict_tta(batch_tensor, tta, return_embeddings)
+        
+        if return_embeddings:
+            outputs = self.forward_batch(batch_tensor)
+            return self.format_predictions(outputs['probabilities'], outputs['embeddings'])
+        
+        batch_tensor = batch_tensor.to(self.device, non_blocking=True)
+        
+        with torch.no_grad():
+            outputs = self.backend(batch_tensor).squeeze()
+            if outputs.dim() == 0:
+                outputs = outputs.unsqueeze(0)
+            probabilities = torch.sigmoid(outputs)
+        
+        return self.format_predictions(probabilities)
+    
+    def _predict_tta(
+        self,
+        batch_tensor: torch.Tensor,
+        tta: str,
+        return_embeddings: bool = False
+    ) -> PatchPredictions:
+        """Mean and variance of the tumor probability over augmented views"""
+        batch_tensor = batch_tensor.to(self.device, non_blocking=True)
+        views = augment_views(batch_tensor, tta)  # (V * B, 3, H, W), view-major
+        num_views = views.shape[0] // batch_tensor.shape[0]
+        
+        embeddings = None
+        if return_embeddings:
+            outputs = self.forward_batch(views)
+            probabilities = outputs['probabilities']
+            embeddings = outputs['embeddings'].view(num_views, -1, outputs['embeddings'].shape[-1]).mean(0)
+        else:
             with torch.no_grad():
-                outputs = self.model(batch_tensor).squeeze()
-                if outputs.dim() == 0:
-                    outputs = outputs.unsqueeze(0)
-                probabilities = torch.sigmoid(outputs)
+                probabilities = torch.sigmoid(self.backend(views)[:, 0])
+        
+        probabilities = probabilities.view(num_views, -1)
+        results = self.format_predictions(probabilities.mean(0), embeddings)
+        return results.set_column('tta_variance', probabilities.var(0, unbiased=False).cpu().numpy())
+    
+    def quantize(
+        self,
+        mode: str = 'dynamic',
+        calibration_patches: Optional[List[np.ndarray]] = None,
+        batch_size: int = 32
+    ) -> nn.Module:
+        """
+        Run predictions through an INT8 copy of the model (CPU only).
+        
+        The fp32 model is kept for get_features and dense inference.
+        
+        Args:
+            mode: 'dynamic' (INT8 Linear head) or 'static' (FX-quantized conv
+                backbone plus dynamic head)
+            calibration_patches: Raw patches for static calibration, e.g. from
+                quantization.sample_tiler_patches
+            batch_size: Calibration batch size
             
-            # Process results
-            for prob in probabilities:
-                prob_value = prob.item()
-                confidence = prob_value * 100
-                predicted_class = 1 if prob_value > self.threshold else 0
-                
-                results.append({
-                    'class_id': predicted_class,
-                    'class_name': self.class_names[predicted_class],
-                    'tumor_probability': prob_value,
-                    'normal_probability': 1 - prob_value,
-                    'confidence': confidence
-                })
+        Returns:
+            The quantized model
+        """
+        if self.device.type != 'cpu':
+            raise ValueError("INT8 quantized inference runs on the CPU only")
+        if self.backend_name != 'eager':
+            raise ValueError(f"Quantization needs the eager backend, not '{self.backend_name}'")
+        
+        batches = None
+        if calibration_patches is not None:
+            batches = [
+                self.preprocess_batch(calibration_patches[i:i + batch_size])
+                for i in range(0, len(calibration_patches), batch_size)
+            ]
+        
+        quantized = quantize_model(self.model, mode, batches)
+        self.backend = EagerBackend(quantized)
+        self.quantization = mode
+        print(f"✅ Using {mode} INT8 quantized model")
+        return quantized
+    
+    def forward_batch(
+        self,
+        batch_tensor: torch.Tensor,
+        layers: Optional[List[str]] = None
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Logits, probabilities and embeddings from one backbone pass.
+        
+        Always runs the eager fp32 model (under the execution profile), since
+        exported and quantized backends only expose the final output.
         
-        return results
+        Args:
+            batch_tensor: (B, 3, H, W) normalized input tensor
+            layers: Intermediate modules to capture as well, e.g. ['layer3']
+            
+        Returns:
+            'logits' (B, 1), 'probabilities' (B,), 'embeddings' (B, 2048),
+            'feature_map' (B, 2048, 3, 3) and the requested layers
+        """
+        batch_tensor = batch_tensor.to(self.device, non_blocking=True)
+        outputs = self.profile.run(
+            partial(self.model.forward_with_features, layers=layers), batch_tensor
+        )
+        outputs['probabilities'] = torch.sigmoid(outputs['logits'][:, 0])
+        return outputs
+    
+    def format_predictions(self, probabilities, embeddings=None) -> PatchPredictions:
+        """
+        Columnar predictions for a sequence of tumor probabilities.
+        
+        Args:
+            probabilities: 1-D tensor or array of sigmoid outputs
+            embeddings: Optional (N, D) tensor or array; each patch's
+                dictionary view then has its row as 'embedding'
+            
+        Returns:
+            PatchPredictions (iterates as prediction dictionaries)
+        """
+        if isinstance(probabilities, torch.Tensor):
+            probabilities = probabilities.detach().cpu().numpy()
+        if isinstance(embeddings, torch.Tensor):
+            embeddings = embeddings.detach().cpu().numpy()
+        
+        return PatchPredictions(
+            probabilities,
+            threshold=self.threshold,
+            class_names=self.class_names,
+            embeddings=embeddings
+        )
+
+
+class PrefetchingInferenceRunner:
+    """
+    Double-buffered inference loop.
+    
+    A worker thread pulls batch N+1 from the source iterator (tiling) and
+    preprocesses it while the calling thread runs batch N through the
+    model, so slide time approaches max(preprocess, forward) instead of
+    their sum. PIL resampling and torch ops release the GIL, so a thread
+    is enough. Results are delivered in input order.
+    """
+    
+    def __init__(
+        self,
+        classifier: 'PatchClassifier',
+        depth: int = 2,
+        infer_fn: Optional[Callable] = None
+    ):
+        """
+        Args:
+            classifier: Provides preprocess_batch and predict_tensor
+            depth: Batches prepared ahead of the forward pass
+            infer_fn: Input tensor -> predictions (defaults to classifier.predict_tensor)
+        """
+        self.classifier = classifier
+        self.infer_fn = infer_fn or classifier.predict_tensor
+        self.depth = max(1, depth)
+        self.stats = {'batches': 0, 'forward_s': 0.0, 'wait_s': 0.0, 'preprocess_s': 0.0}
+    
+    def run(self, batches) -> Generator[Tuple[PatchPredictions, object], None, None]:
+        """
+        Classify batches with preprocessing overlapped.
+        
+        Args:
+            batches: Iterable of (patches, meta), e.g. GigapixelTiler.iter_plan_batches
+            
+        Yields:
+            (predictions, meta) per batch, in order
+        """
+        source = iter(batches)
+        
+        def load():
+            # Only one worker, so the source iterator is never advanced concurrently
+            start = time.perf_counter()
+            try:
+                patches, meta = next(source)
+            except StopIteration:
+                return None
+            tensor = self.classifier.preprocess_batch(patches)
+            self.stats['preprocess_s'] += time.perf_counter() - start
+            return tensor, meta
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch') as pool:
+            pending = deque(pool.submit(load) for _ in range(self.depth))
+            while pending:
+                start = time.perf_counter()
+                item = pending.popleft().result()
+                self.stats['wait_s'] += time.perf_counter() - start
+                if item is None:
+                    break
+                pending.append(pool.submit(load))
+                
+                tensor, meta = item
+                start = time.perf_counter()
+                predictions = self.infer_fn(tensor)
+                self.stats['forward_s'] += time.perf_counter() - start
+                self.stats['batches'] += 1
+                
+                yield predictions, meta
 
 
 class EnsembleClassifier:
     """
     Ensemble of multiple models for robust predictions.
     Combines predictions using voting or averaging.
+    
+    Batches are preprocessed once and run through every member. Members can
+    be fused into one vmapped module over their stacked weights
+    (torch.func), which turns each layer into a single grouped kernel; this
+    pays off on GPUs, while on CPUs a loop over members is faster.
     """
     
     def __init__(
         self,
         model_paths: List[str],
         device: str = 'cuda' if torch.cuda.is_available() else 'cpu',
-        ensemble_method: str = 'average'  # 'average' or 'vote'
+        ensemble_method: str = 'average',  # 'average' or 'vote'
+        fusion: str = 'auto'  # 'vmap', 'loop', or 'auto' (vmap on accelerators)
     ):
         self.device = torch.device(device)
         self.ensemble_method = ensemble_method
@@ -225,81 +715,150 @@ class EnsembleClassifier:
         print(f"✅ Loaded {len(self.models)} models for ensemble")
         
         # Preprocessing
+        self.input_size = (96, 96)
+        self.mean = [0.485, 0.456, 0.406]
+        self.std = [0.229, 0.224, 0.225]
         self.transform = transforms.Compose([
-            transforms.Resize((96, 96)),
+            transforms.Resize(self.input_size),
             transforms.ToTensor(),
             transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
+                mean=self.mean,
+                std=self.std
             )
         ])
+        
+        if fusion == 'auto':
+            fusion = 'loop' if self.device.type == 'cpu' else 'vmap'
+        self.fusion = fusion
+        self._fused = None
+        if fusion == 'vmap' and len(self.models) > 1:
+            self._fused = self._build_fused()
+            if self._fused is None:
+                self.fusion = 'loop'
     
-    def predict(self, patch: np.ndarray) -> Dict:
-        """Ensemble prediction on single patch"""
-        # Preprocess
-        if isinstance(patch, np.ndarray):
-            patch = Image.fromarray(patch)
-        input_tensor = self.transform(patch).unsqueeze(0).to(self.device)
+    def _build_fused(self) -> Optional[Callable]:
+        """vmapped forward over the members' stacked parameters and buffers"""
+        try:
+            from torch.func import functional_call, stack_module_state, vmap
+        except ImportError:
+            print("⚠️  torch.func unavailable, running ensemble members in a loop")
+            return None
         
-        # Get predictions from all models
-        predictions = []
+        params, buffers = stack_module_state(self.models)
+        skeleton = copy.deepcopy(self.models[0]).to('meta')
+        
+        def member_forward(member_params, member_buffers, x):
+            return functional_call(skeleton, (member_params, member_buffers), (x,))
+        
+        fused = vmap(member_forward, in_dims=(0, 0, None))
+        return lambda x: fused(params, buffers, x)
+    
+    def preprocess_batch(self, patches: List[np.ndarray]) -> torch.Tensor:
+        """(B, 3, H, W) input tensor shared by all members"""
+        if _same_shape(patches):
+            return preprocess_patch_batch(
+                patches, self.input_size, self.mean, self.std, device=self.device
+            )
+        return preprocess_patches(patches, self.transform).to(self.device)
+    
+    def member_probabilities(self, batch_tensor: torch.Tensor) -> torch.Tensor:
+        """
+        Tumor probability of every member on a preprocessed batch.
+        
+        Returns:
+            (num_models, B) tensor
+        """
+        batch_tensor = batch_tensor.to(self.device, non_blocking=True)
         with torch.no_grad():
-            for model in self.models:
-                output = model(input_tensor).squeeze()
-                prob = torch.sigmoid(output).item()
-                predictions.append(prob)
-        
-        # Ensemble
-        if self.ensemble_method == 'average':
-            final_prob = np.mean(predictions)
-        elif self.ensemble_method == 'vote':
-            votes = [1 if p > 0.5 else 0 for p in predictions]
-            final_prob = np.mean(votes)
-        else:
-            final_prob = np.mean(predictions)
+            if self._fused is not None:
+                logits = self._fused(batch_tensor)  # (M, B, 1)
+            else:
+                logits = torch.stack([model(batch_tensor) for model in self.models])
+        return torch.sigmoid(logits[..., 0])
+    
+    def predict_batch(
+        self,
+        patches: List[np.ndarray],
+        batch_size: int = 32
+    ) -> Dict[str, np.ndarray]:
+        """
+        Ensemble predictions for many patches.
         
-        predicted_class = 1 if final_prob > 0.5 else 0
+        Args:
+            patches: List of (H, W, 3) patches
+            batch_size: Patches per forward pass (each pass runs all members)
+            
+        Returns:
+            Dictionary of per-patch arrays:
+            - 'mean': average member probability
+            - 'vote': fraction of members voting tumor
+            - 'uncertainty': std of member probabilities (disagreement)
+            - 'tumor_probability': mean or vote, per ensemble_method
+            - 'class_id': tumor_probability > 0.5
+            - 'individual_predictions': (num_models, N) member probabilities
+        """
+        member_probs = [
+            self.member_probabilities(self.preprocess_batch(patches[i:i + batch_size])).cpu().numpy()
+            for i in range(0, len(patches), batch_size)
+        ]
+        member_probs = np.concatenate(member_probs, axis=1) if member_probs \
+            else np.zeros((len(self.models), 0), dtype=np.float32)
+        
+        mean = member_probs.mean(axis=0)
+        vote = (member_probs > 0.5).mean(axis=0)
+        tumor_probability = vote if self.ensemble_method == 'vote' else mean
+        
+        return {
+            'mean': mean,
+            'vote': vote,
+            'uncertainty': member_probs.std(axis=0),  # Higher = more disagreement
+            'tumor_probability': tumor_probability,
+            'class_id': (tumor_probability > 0.5).astype(np.int64),
+            'individual_predictions': member_probs
+        }
+    
+    def predict(self, patch: np.ndarray) -> Dict:
+        """Ensemble prediction on single patch"""
+        result = self.predict_batch([patch])
+        final_prob = float(result['tumor_probability'][0])
+        predicted_class = int(result['class_id'][0])
         
         return {
             'class_id': predicted_class,
             'class_name': ['Normal', 'Tumor'][predicted_class],
             'tumor_probability': final_prob,
             'confidence': final_prob * 100 if predicted_class == 1 else (1-final_prob) * 100,
-            'individual_predictions': predictions,
-            'uncertainty': np.std(predictions)  # Higher = more disagreement
+            'individual_predictions': result['individual_predictions'][:, 0].tolist(),
+            'uncertainty': float(result['uncertainty'][0])  # Higher = more disagreement
         }
 
 
 class FeatureExtractor:
     """
     Extract deep features from patches for clustering/similarity analysis.
+    
+    Pass an existing PatchClassifier to share its weights instead of
+    loading another copy of the model.
     """
     
     def __init__(
         self,
-        model_path: str,
+        model_path: Optional[str] = None,
         device: str = 'cuda' if torch.cuda.is_available() else 'cpu',
-        layer: str = 'layer4'  # Which layer to extract from
+        layer: str = 'layer4',  # Which layer to extract from
+        profile: str = 'default',  # Execution profile (see PatchClassifier)
+        classifier: Optional[PatchClassifier] = None
     ):
-        self.device = torch.device(device)
-        self.layer = layer
+        if classifier is None:
+            if model_path is None:
+                raise ValueError("FeatureExtractor needs a model_path or a classifier")
+            classifier = PatchClassifier(model_path=model_path, device=device, profile=profile)
         
-        # Load model
-        self.model = ResNet50Classifier(num_classes=1)
-        checkpoint = torch.load(model_path, map_location=self.device)
-        self.model.load_state_dict(checkpoint)
-        self.model.to(self.device)
-        self.model.eval()
-        
-        # Preprocessing
-        self.transform = transforms.Compose([
-            transforms.Resize((96, 96)),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
+        self.classifier = classifier
+        self.model = classifier.model
+        self.device = classifier.device
+        self.layer = layer
+        self.transform = classifier.transform
     
     def extract_features(
         self,
@@ -313,26 +872,21 @@ class FeatureExtractor:
             features: (N, feature_dim) numpy array
         """
         all_features = []
+        layers = None if self.layer == 'layer4' else [self.layer]
         
         for i in range(0, len(patches), batch_size):
             batch_patches = patches[i:i+batch_size]
             
             # Preprocess
-            batch_tensors = []
-            for patch in batch_patches:
-                if isinstance(patch, np.ndarray):
-                    patch = Image.fromarray(patch)
-                tensor = self.transform(patch)
-                batch_tensors.append(tensor)
-            
-            batch_tensor = torch.stack(batch_tensors).to(self.device)
+            batch_tensor = self.classifier.preprocess_batch(batch_patches)
             
-            # Extract features
-            with torch.no_grad():
-                features = self.model.get_features(batch_tensor)
-                # Global average pooling
-                features = torch.mean(features, dim=(2, 3))  # (B, 2048)
-                all_features.append(features.cpu().numpy())
+            # Extract features (global average pooled)
+            outputs = self.classifier.forward_batch(batch_tensor, layers=layers)
+            if layers:
+                features = torch.mean(outputs[self.layer], dim=(2, 3))
+            else:
+                features = outputs['embeddings']  # (B, 2048)
+            all_features.append(features.cpu().numpy())
         
         return np.vstack(all_features)
 
@@ -341,13 +895,193 @@ class FeatureExtractor:
 # UTILITY FUNCTIONS
 # ============================================
 
-def calculate_patch_statistics(predictions: List[Dict]) -> Dict:
-    """Calculate statistics across multiple patches"""
-    tumor_patches = sum(1 for p in predictions if p['class_id'] == 1)
+TTA_VIEWS = {'flips': 4, 'dihedral': 8}
+
+
+def augment_views(batch: torch.Tensor, tta: str = 'dihedral') -> torch.Tensor:
+    """
+    Stack the augmented views of a (B, C, H, W) batch into one batch.
+    
+    'flips' gives identity, horizontal, vertical and both flips; 'dihedral'
+    adds the four transposed views, i.e. all 90° rotations and their
+    mirror images.
+    
+    Returns:
+        (views * B, C, H, W) tensor, view-major (rows [v*B:(v+1)*B] are view v)
+    """
+    if tta not in TTA_VIEWS:
+        raise ValueError(f"Unknown TTA mode '{tta}', expected one of {list(TTA_VIEWS)}")
+    
+    views = [batch, batch.flip(-1), batch.flip(-2), batch.flip(-2, -1)]
+    if tta == 'dihedral':
+        transposed = batch.transpose(-2, -1)
+        views += [transposed, transposed.flip(-1), transposed.flip(-2), transposed.flip(-2, -1)]
+    return torch.cat(views)
+
+
+def preprocess_patches(patches: List[np.ndarray], transform) -> torch.Tensor:
+    """
+    Apply a torchvision transform to each patch and stack the results.
+    Module-level so it can run in worker processes.
+    """
+    batch_tensors = []
+    for patch in patches:
+        if isinstance(patch, np.ndarray):
+            patch = Image.fromarray(patch)
+        batch_tensors.append(transform(patch))
+    
+    return torch.stack(batch_tensors)
+
+
+def preprocess_patch_batch(
+    patches,
+    size: Tuple[int, int] = (96, 96),
+    mean: List[float] = [0.485, 0.456, 0.406],
+    std: List[float] = [0.229, 0.224, 0.225],
+    device: Optional[torch.device] = None,
+    resize_backend: str = 'auto'
+) -> torch.Tensor:
+    """
+    Batched equivalent of Resize -> ToTensor -> Normalize.
+    
+    Patches are moved to the device as uint8 and scaled/normalized with a
+    handful of tensor ops on the whole batch. The resize reproduces PIL's
+    bilinear resampling (which the torchvision transform applies to PIL
+    images) bit for bit, using one of two backends:
+    - 'tensor': PIL's fixed-point coefficients applied as matrix products
+      on the device (fast on GPU, where the batch already lives)
+    - 'pil': PIL's SIMD resampler per patch into one uint8 batch
+      (fastest on CPU)
+    'auto' picks 'tensor' on accelerators and 'pil' on CPU.
+    Module-level so it can run in worker processes.
+    
+    Args:
+        patches: uint8 (N, H, W, 3) array or tensor, or a list of (H, W, 3) arrays
+        size: Output (height, width)
+        mean, std: Per-channel normalization
+        device: Where to run (defaults to CPU)
+        resize_backend: 'auto', 'tensor' or 'pil'
+        
+    Returns:
+        (N, 3, size[0], size[1]) float32 tensor
+    """
+    device = torch.device(device or 'cpu')
+    out_height, out_width = size
+    if resize_backend == 'auto':
+        resize_backend = 'pil' if device.type == 'cpu' else 'tensor'
+    
+    needs_resize = tuple(patches[0].shape[:2]) != (out_height, out_width)
+    if needs_resize and resize_backend == 'pil':
+        if isinstance(patches, torch.Tensor):
+            patches = patches.cpu().numpy()
+        patches = np.stack([
+            np.asarray(Image.fromarray(p).resize((out_width, out_height), Image.BILINEAR))
+            for p in patches
+        ])
+        needs_resize = False
+    
+    if isinstance(patches, torch.Tensor):
+        batch = patches
+    else:
+        if not isinstance(patches, np.ndarray):
+            patches = np.stack(patches)
+        batch = torch.from_numpy(np.ascontiguousarray(patches))
+    
+    # Transfer as uint8 (4x less data than float32)
+    batch = batch.to(device, non_blocking=True).permute(0, 3, 1, 2).contiguous().float()
+    
+    if needs_resize:
+        # PIL resizes rows first, rounding to uint8 levels after each pass
+        if batch.shape[-1] != out_width:
+            digits = _pil_bilinear_weights(batch.shape[-1], out_width, batch.device)
+            batch = _fixed_point_product(digits, lambda w: batch @ w.T)
+        if batch.shape[-2] != out_height:
+            digits = _pil_bilinear_weights(batch.shape[-2], out_height, batch.device)
+            batch = _fixed_point_product(digits, lambda w: w @ batch)
+    
+    batch = batch.div_(255)
+    mean_t = torch.tensor(mean, dtype=torch.float32, device=batch.device).view(1, 3, 1, 1)
+    std_t = torch.tensor(std, dtype=torch.float32, device=batch.device).view(1, 3, 1, 1)
+    return batch.sub_(mean_t).div_(std_t)
+
+
+_PIL_PRECISION_BITS = 22  # Fixed-point precision of PIL's 8-bit resampling
+_DIGIT_BITS = 8  # Weight digits small enough for exact float32 (and TF32) products
+
+
+@lru_cache(maxsize=32)
+def _pil_bilinear_weights(in_size: int, out_size: int, device: torch.device) -> List[torch.Tensor]:
+    """
+    PIL's integer bilinear coefficients as an (out_size, in_size) matrix
+    (same support, normalization and rounding as Pillow's precompute_coeffs),
+    split into base-256 digit matrices so float32 products stay exact.
+    """
+    scale = in_size / out_size
+    filter_scale = max(scale, 1.0)
+    support = 1.0 * filter_scale
+    
+    weights = np.zeros((out_size, in_size), dtype=np.int64)
+    for xx in range(out_size):
+        center = (xx + 0.5) * scale
+        x_min = max(int(center - support + 0.5), 0)
+        x_max = min(int(center + support + 0.5), in_size)
+        
+        positions = np.arange(x_min, x_max)
+        k = np.clip(1.0 - np.abs((positions - center + 0.5) / filter_scale), 0.0, None)
+        if k.sum() != 0:
+            k /= k.sum()
+        weights[xx, x_min:x_max] = np.trunc(k * (1 << _PIL_PRECISION_BITS) + 0.5)
+    
+    digits = []
+    for shift in range(0, _PIL_PRECISION_BITS + 1, _DIGIT_BITS):
+        digit = (weights >> shift) & ((1 << _DIGIT_BITS) - 1)
+        digits.append(torch.from_numpy(digit.astype(np.float32)).to(device))
+    return digits
+
+
+def _fixed_point_product(digits: List[torch.Tensor], product: Callable) -> torch.Tensor:
+    """
+    Exact integer product of uint8-valued pixels with PIL's coefficients,
+    followed by PIL's rounding and clipping back to uint8 levels.
+    """
+    total = None
+    for i, digit in enumerate(digits):
+        partial_sum = product(digit).round_().to(torch.int64) << (i * _DIGIT_BITS)
+        total = partial_sum if total is None else total + partial_sum
+    
+    half = 1 << (_PIL_PRECISION_BITS - 1)
+    return ((total + half) >> _PIL_PRECISION_BITS).clamp_(0, 255).float()
+
+
+def _same_shape(patches) -> bool:
+    """True if patches can be stacked into one uint8 batch"""
+    if isinstance(patches, (np.ndarray, torch.Tensor)):
+        return patches.ndim == 4 and patches.dtype in (np.uint8, torch.uint8)
+    return (
+        len(patches) > 0
+        and all(isinstance(p, np.ndarray) and p.dtype == np.uint8 and p.ndim == 3 for p in patches)
+        and len({p.shape for p in patches}) == 1
+    )
+
+
+def calculate_patch_statistics(predictions) -> Dict:
+    """
+    Calculate statistics across multiple patches.
+    
+    Args:
+        predictions: PatchPredictions or a list of prediction dictionaries
+    """
+    if isinstance(predictions, PatchPredictions):
+        class_ids, probabilities = predictions.class_id, predictions.tumor_probability.astype(np.float64)
+    else:
+        class_ids = np.array([p['class_id'] for p in predictions])
+        probabilities = np.array([p['tumor_probability'] for p in predictions], dtype=np.float64)
+    
+    tumor_patches = int(np.count_nonzero(class_ids == 1))
     normal_patches = len(predictions) - tumor_patches
     
-    avg_tumor_prob = np.mean([p['tumor_probability'] for p in predictions])
-    max_tumor_prob = max([p['tumor_probability'] for p in predictions])
+    avg_tumor_prob = np.mean(probabilities) if len(probabilities) else float('nan')
+    max_tumor_prob = float(probabilities.max()) if len(probabilities) else 0.0
     
     return {
         'total_patches': len(predictions),
@@ -0,0 +1,312 @@
+# 🧱 Dense Inference Module
+# Fully convolutional classification of overlapping patches: the backbone runs
+# once over large tissue regions and the head slides over the layer4 feature map
+
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+from typing import Dict, Generator, Optional, Tuple
+
+from .tiling import GigapixelTiler, TilingPlan
+from .classifier import PatchClassifier, PatchPredictions, preprocess_patch_batch
+
+
+class DenseInferenceEngine:
+    """
+    Dense (fully convolutional) equivalent of classifying every grid patch.
+
+    ResNet50 reduces its input 32x, so a 96px patch yields a 3x3 layer4 map
+    that the classifier average-pools before the head. Running the backbone
+    over a whole region instead gives one layer4 cell per 32 input pixels;
+    a 3x3 stride-1 average pool followed by the head applied per cell (a
+    sliding 1x1 operation) scores every 96px window on a 32px grid, with
+    the convolutions of overlapping windows computed once.
+
+    Patches are read at the classifier's input size (native-resolution
+    tiling), so the dense grid step is 32 * patch_size / 96 original
+    pixels, about 75px for 224px patches. Windows see their neighbours
+    instead of zero padding at their borders, so probabilities are close
+    to, but not identical with, per-patch predictions (see validate).
+    """
+
+    CELL = 32  # Backbone output stride (input pixels per layer4 cell)
+    WINDOW_CELLS = 3  # layer4 cells spanned by one classifier input
+
+    def __init__(
+        self,
+        classifier: PatchClassifier,
+        tiler: GigapixelTiler,
+        region_cells: int = 16,
+        halo_cells: int = 2,
+        regions_per_batch: int = 4
+    ):
+        """
+        Args:
+            classifier: Provides the model, normalization and prediction records
+            tiler: Provides slide readers, tissue masks and plans; its
+                output_size must equal the classifier input size
+            region_cells: Windows per region side scored by one backbone pass
+            halo_cells: Extra context cells read around each region, so
+                windows at region borders see the same pixels as inside ones
+            regions_per_batch: Regions stacked into one forward pass
+        """
+        input_size = classifier.input_size[0]
+        if input_size % self.CELL or input_size // self.CELL != self.WINDOW_CELLS:
+            raise ValueError(f"Dense inference needs a {self.WINDOW_CELLS * self.CELL}px "
+                             f"classifier input, got {input_size}px")
+        if tiler.read_size != input_size:
+            raise ValueError(f"Tiler must read patches at the classifier input size "
+                             f"({input_size}px), got {tiler.read_size}px; set output_size")
+
+        self.classifier = classifier
+        self.tiler = tiler
+        self.region_cells = region_cells
+        self.halo_cells = halo_cells
+        self.regions_per_batch = max(1, regions_per_batch)
+        self.stats = {'regions': 0, 'windows': 0, 'forward_s': 0.0, 'read_s': 0.0}
+
+    @property
+    def stride(self) -> int:
+        """Grid stride in original pixels (one layer4 cell)"""
+        return int(round(self.CELL * self.tiler.patch_size / self.tiler.read_size))
+
+    @property
+    def region_pixels(self) -> int:
+        """Side of the region read for one backbone pass, in level pixels"""
+        return self.CELL * (self.region_cells + self.WINDOW_CELLS - 1 + 2 * self.halo_cells)
+
+    def create_dense_plan(self, image_path: str) -> TilingPlan:
+        """Tiling plan of the dense grid (full resolution only)"""
+        with self.tiler.open_reader(image_path) as reader:
+            tissue_mask = self.tiler.compute_tissue_mask(reader)
+            return self.tiler.build_tiling_plan(
+                reader.size, tissue_mask, scales=[1.0], stride=self.stride
+            )
+
+    def iter_predictions(
+        self,
+        image_path: str,
+        plan: Optional[TilingPlan] = None,
+        return_embeddings: bool = False
+    ) -> Generator[Tuple[PatchPredictions, TilingPlan], None, None]:
+        """
+        Score every tissue window of the dense grid.
+
+        Args:
+            image_path: Slide to analyse
+            plan: Dense plan from create_dense_plan (computed if omitted)
+            return_embeddings: Add each window's pooled layer4 'embedding'
+
+        Yields:
+            (predictions, batch_plan) per batch of regions; predictions are
+            PatchPredictions positioned at the windows' top-left corners
+        """
+        plan = self.create_dense_plan(image_path) if plan is None else plan
+        self.stats = {'regions': 0, 'windows': 0, 'forward_s': 0.0, 'read_s': 0.0}
+        candidates = plan.tissue()
+        if len(candidates) == 0:
+            return
+
+        reader = self.tiler.open_reader(image_path)
+        pyramid = self.tiler.open_pyramid(image_path, reader)
+        try:
+            level_reader = pyramid.get_level(plan.read_scale(0))
+            batch = []
+            for region in self._iter_regions(level_reader, candidates):
+                batch.append(region)
+                if len(batch) >= self.regions_per_batch:
+                    yield self._score_regions(batch, return_embeddings)
+                    batch = []
+            if batch:
+                yield self._score_regions(batch, return_embeddings)
+        finally:
+            pyramid.close()
+            reader.close()
+
+    def predict_slide(self, image_path: str) -> Tuple[PatchPredictions, TilingPlan]:
+        """
+        Dense predictions for a whole slide.
+
+        Returns:
+            (predictions, plan): one prediction per tissue window and the
+            matching plan entries
+        """
+        predictions, plans = [], []
+        for batch_predictions, batch_plan in self.iter_predictions(image_path):
+            predictions.append(batch_predictions)
+            plans.append(batch_plan)
+        if not plans:
+            return PatchPredictions.concatenate([]), self.create_dense_plan(image_path)[:0]
+        return PatchPredictions.concatenate(predictions), TilingPlan.concatenate(plans)
+
+    @staticmethod
+    def probability_grid(predictions: PatchPredictions, plan: TilingPlan) -> np.ndarray:
+        """
+        Per-cell tumor probability grid of the dense plan.
+
+        Returns:
+            (rows, cols) float32 array, NaN where no window was scored
+        """
+        if len(plan) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        cols = plan.level_x // DenseInferenceEngine.CELL
+        rows = plan.level_y // DenseInferenceEngine.CELL
+
+        grid = np.full((rows.max() + 1, cols.max() + 1), np.nan, dtype=np.float32)
+        grid[rows, cols] = predictions.tumor_probability
+        return grid
+
+    def _iter_regions(self, level_reader, candidates: TilingPlan):
+        """
+        Group tissue windows by region and read each region with its halo.
+
+        Yields:
+            (region pixels, window rows, window cols, region plan)
+        """
+        size = candidates.read_size
+        n = self.region_cells
+        cells_x = candidates.level_x.astype(np.int64) // self.CELL
+        cells_y = candidates.level_y.astype(np.int64) // self.CELL
+        region_x, region_y = cells_x // n, cells_y // n
+
+        # Row-major over regions, so strips of the slide are read in order
+        order = np.lexsort((region_x, region_y))
+        keys = region_y[order] * (region_x.max() + 1) + region_x[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+
+        width, height = level_reader.size
+        side = self.region_pixels
+        for group in np.split(order, bounds):
+            rx, ry = int(region_x[group[0]]), int(region_y[group[0]])
+            left = (rx * n - self.halo_cells) * self.CELL
+            top = (ry * n - self.halo_cells) * self.CELL
+
+            start = time.perf_counter()
+            region = _read_padded(level_reader, left, top, side, (width, height))
+            self.stats['read_s'] += time.perf_counter() - start
+
+            # Same pixel-level tissue check as the per-patch path
+            xs = candidates.level_x[group].astype(np.int64) - left
+            ys = candidates.level_y[group].astype(np.int64) - top
+            keep = self.tiler.tissue_check_at(region, xs, ys, size)
+            if not keep.any():
+                continue
+
+            group = group[keep]
+            rows = cells_y[group] - ry * n + self.halo_cells
+            cols = cells_x[group] - rx * n + self.halo_cells
+            yield region, rows, cols, candidates[group]
+
+    def _score_regions(
+        self,
+        regions,
+        return_embeddings: bool = False
+    ) -> Tuple[PatchPredictions, TilingPlan]:
+        """One backbone pass over stacked regions, then the head on each window"""
+        classifier = self.classifier
+        model = classifier.model
+
+        start = time.perf_counter()
+        batch = preprocess_patch_batch(
+            np.stack([region for region, _, _, _ in regions]),
+            size=(self.region_pixels, self.region_pixels),
+            mean=classifier.mean, std=classifier.std, device=classifier.device
+        )
+
+        with torch.no_grad():
+            # (B, 2048, cells, cells), in the classifier's layout and precision
+            features = classifier.profile.run(model.get_features, batch)
+            # Mean over each 3x3 window = the model's global pool on a 96px patch
+            pooled = F.avg_pool2d(features, kernel_size=self.WINDOW_CELLS, stride=1)
+
+            image_index = torch.cat([
+                torch.full((len(rows),), i, dtype=torch.long)
+                for i, (_, rows, _, _) in enumerate(regions)
+            ])
+            rows = torch.from_numpy(np.concatenate([r for _, r, _, _ in regions]))
+            cols = torch.from_numpy(np.concatenate([c for _, _, c, _ in regions]))
+
+            # Head as a 1x1 operation: only on the cells of tissue windows
+            window_features = pooled[image_index, :, rows, cols]  # (N, 2048)
+            logits = model.backbone.fc(window_features).squeeze(1)
+            probabilities = torch.sigmoid(logits)
+
+        self.stats['forward_s'] += time.perf_counter() - start
+        self.stats['regions'] += len(regions)
+        self.stats['windows'] += len(probabilities)
+
+        batch_plan = TilingPlan.concatenate([plan for _, _, _, plan in regions])
+        embeddings = window_features if return_embeddings else None
+        predictions = classifier.format_predictions(probabilities, embeddings)
+        return predictions.with_positions(batch_plan.x, batch_plan.y), batch_plan
+
+    def validate(
+        self,
+        image_path: str,
+        max_windows: int = 256,
+        batch_size: int = 32,
+        seed: int = 0
+    ) -> Dict:
+        """
+        Compare dense predictions with per-patch predictions on the same grid.
+
+        A random sample of dense windows is read as individual patches and
+        classified with PatchClassifier.predict_batch.
+
+        Returns:
+            Comparison statistics of the tumor probabilities
+        """
+        predictions, plan = self.predict_slide(image_path)
+        if len(predictions) == 0:
+            return {'windows': 0}
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(plan), size=min(max_windows, len(plan)), replace=False))
+        sample_plan = plan[sample]
+        size = plan.read_size
+
+        reader = self.tiler.open_reader(image_path)
+        pyramid = self.tiler.open_pyramid(image_path, reader)
+        try:
+            level_reader = pyramid.get_level(plan.read_scale(0))
+            patches = [
+                level_reader.read_region(int(x), int(y), size, size)
+                for x, y in zip(sample_plan.level_x, sample_plan.level_y)
+            ]
+        finally:
+            pyramid.close()
+            reader.close()
+
+        reference = self.classifier.predict_batch(patches, batch_size=batch_size)
+        dense = predictions.tumor_probability[sample]
+        patch = reference.tumor_probability
+        diff = np.abs(dense - patch)
+        threshold = self.classifier.threshold
+
+        return {
+            'windows': len(sample),
+            'max_abs_diff': float(diff.max()),
+            'mean_abs_diff': float(diff.mean()),
+            'correlation': float(np.corrcoef(dense, patch)[0, 1]) if len(sample) > 1 else 1.0,
+            'class_agreement': float(np.mean((dense > threshold) == (patch > threshold)))
+        }
+
+
+def _read_padded(
+    reader,
+    left: int,
+    top: int,
+    side: int,
+    level_size: Tuple[int, int]
+) -> np.ndarray:
+    """Square region that may extend past the level; outside pixels are white background"""
+    width, height = level_size
+    region = np.full((side, side, 3), 255, dtype=np.uint8)
+
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + side, width), min(top + side, height)
+    if x1 > x0 and y1 > y0:
+        region[y0 - top:y1 - top, x0 - left:x1 - left] = reader.read_region(x0, y0, x1 - x0, y1 - y0)
+    return region
@@ -0,0 +1,163 @@
+# 🏎️ Execution Profiles
+# Memory layout and precision settings for eager ResNet50 inference, with a
+# startup probe that picks the fastest profile on the current machine
+
+import time
+import torch
+import torch.nn as nn
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional, Tuple
+
+
+PROFILES = ('default', 'channels_last', 'channels_last_bf16')
+
+
+def bf16_supported(device: torch.device) -> bool:
+    """Whether the device has native bfloat16 matmul/conv kernels"""
+    device = torch.device(device)
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.backends.mkldnn.is_available()
+                    and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class ExecutionProfile:
+    """
+    How an eager model and its input batches are laid out and computed.
+
+    - 'default': contiguous (NCHW) float32
+    - 'channels_last': NHWC float32 - oneDNN and cuDNN convolutions run
+      without layout reorders
+    - 'channels_last_bf16': NHWC under bfloat16 autocast (AMX / AVX512-BF16
+      on recent Xeons); outputs are returned as float32
+    """
+
+    def __init__(self, name: str = 'default', device: torch.device = torch.device('cpu')):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown execution profile '{name}', expected one of {PROFILES} or 'auto'")
+        self.name = name
+        self.device = torch.device(device)
+        self.channels_last = name.startswith('channels_last')
+        self.bf16 = name.endswith('bf16')
+
+    @property
+    def memory_format(self) -> torch.memory_format:
+        return torch.channels_last if self.channels_last else torch.contiguous_format
+
+    def prepare_model(self, model: nn.Module) -> nn.Module:
+        """Convert model weights to the profile's memory format (in place)"""
+        return model.to(memory_format=self.memory_format)
+
+    def prepare_input(self, batch: torch.Tensor) -> torch.Tensor:
+        """Lay out a (B, 3, H, W) batch like the model weights"""
+        return batch.contiguous(memory_format=self.memory_format)
+
+    def autocast(self):
+        """Precision context for the forward pass"""
+        if self.bf16:
+            return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16)
+        return nullcontext()
+
+    def run(self, forward: Callable, batch: torch.Tensor):
+        """forward(batch) under this profile, as float32 (a tensor or a dict of tensors)"""
+        with torch.no_grad(), self.autocast():
+            output = forward(self.prepare_input(batch))
+        if isinstance(output, dict):
+            return {name: value.float() for name, value in output.items()}
+        return output.float()
+
+    def __repr__(self) -> str:
+        return f"ExecutionProfile('{self.name}')"
+
+
+def probe_profiles(
+    model: nn.Module,
+    input_shape: Tuple[int, ...],
+    device: torch.device,
+    forward: Optional[Callable] = None,
+    repeats: int = 3,
+    tolerance: float = 0.02
+) -> Tuple[str, Dict[str, Dict]]:
+    """
+    Time every applicable profile on a synthetic batch and pick the fastest.
+
+    Profiles whose output deviates from the default profile by more than
+    tolerance (max absolute difference relative to the output range) are
+    not eligible. The model is left in the default layout.
+
+    Args:
+        model: Eval-mode model on device
+        input_shape: (B, 3, H, W) probe batch shape
+        device: Device the model lives on
+        forward: Function of the batch to time (defaults to model)
+        repeats: Timed runs per profile (after one warm-up)
+        tolerance: Allowed relative output deviation
+
+    Returns:
+        (best profile name, {profile: {'seconds', 'relative_diff', 'eligible'}})
+    """
+    device = torch.device(device)
+    forward = forward or model
+    batch = torch.randn(*input_shape, generator=torch.Generator().manual_seed(0)).to(device)
+
+    candidates = [name for name in PROFILES if not name.endswith('bf16') or bf16_supported(device)]
+    results = {}
+    reference = None
+    for name in candidates:
+        profile = ExecutionProfile(name, device)
+        profile.prepare_model(model)
+
+        output = profile.run(forward, batch)  # Warm-up (oneDNN primitive creation)
+        seconds = float('inf')
+        for _ in range(repeats):
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            profile.run(forward, batch)
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        if reference is None:
+            reference = output
+        scale = float(reference.abs().max()) or 1.0
+        relative_diff = float((output - reference).abs().max()) / scale
+        results[name] = {
+            'seconds': seconds,
+            'relative_diff': relative_diff,
+            'eligible': relative_diff <= tolerance
+        }
+
+    ExecutionProfile('default', device).prepare_model(model)
+
+    eligible = {name: r['seconds'] for name, r in results.items() if r['eligible']}
+    return min(eligible, key=eligible.get), results
+
+
+def resolve_profile(
+    name: str,
+    model: nn.Module,
+    input_shape: Tuple[int, ...],
+    device: torch.device,
+    forward: Optional[Callable] = None
+) -> ExecutionProfile:
+    """
+    Profile by name, probing the machine for 'auto', applied to the model.
+
+    Returns:
+        The ExecutionProfile the model was converted to
+    """
+    if name == 'auto':
+        name, results = probe_profiles(model, input_shape, device, forward)
+        timings = ", ".join(
+            f"{profile} {r['seconds'] * 1e3:.0f}ms" + ("" if r['eligible'] else " (inexact)")
+            for profile, r in results.items()
+        )
+        print(f"⏱️  Execution profile probe: {timings} → {name}")
+
+    profile = ExecutionProfile(name, device)
+    profile.prepare_model(model)
+    return profile
@@ -0,0 +1,175 @@
+# 📦 Model Export
+# Export trained checkpoints to TorchScript and ONNX for the CPU inference backends
+#
+# Usage:
+#   python -m ml.export_model ml/models/best_resnet50_model.pth
+#   python -m ml.export_model model.pth --arch tumor-predictor --formats onnx
+
+import os
+import argparse
+import torch
+import torch.nn as nn
+from typing import Dict, List, Optional, Tuple
+
+from .classifier import ResNet50Classifier
+from .inference_backends import create_backend, default_artifact_path
+
+try:
+    import onnx
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models', 'best_resnet50_model.pth')
+
+# Input size each architecture is trained on
+ARCH_INPUT_SIZES = {
+    'patch-classifier': (96, 96),  # ResNet50Classifier / PatchClassifier
+    'tumor-predictor': (224, 224)  # TumorPredictor
+}
+
+
+def load_eager_model(model_path: str, arch: str = 'patch-classifier') -> nn.Module:
+    """
+    Load a checkpoint into its eager model, in eval mode on the CPU.
+
+    Args:
+        model_path: Trained weights (.pth)
+        arch: 'patch-classifier' (ResNet50Classifier) or 'tumor-predictor'
+    """
+    if arch == 'patch-classifier':
+        model = ResNet50Classifier(num_classes=1, pretrained=False)
+        model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    elif arch == 'tumor-predictor':
+        from .models.tumor_predictor import TumorPredictor
+        predictor = TumorPredictor(model_path=model_path)
+        predictor.model.to('cpu')
+        model = predictor.model
+    else:
+        raise ValueError(f"Unknown architecture '{arch}', expected one of {list(ARCH_INPUT_SIZES)}")
+
+    return model.eval()
+
+
+def export_torchscript(model: nn.Module, path: str, input_size: Tuple[int, int]) -> str:
+    """
+    Trace and freeze a model (dropout removed, conv+BN folded).
+
+    Returns:
+        Path of the written .ts file
+    """
+    example = torch.randn(1, 3, *input_size)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.freeze(traced)
+    frozen.save(path)
+    return path
+
+
+def export_onnx(
+    model: nn.Module,
+    path: str,
+    input_size: Tuple[int, int],
+    opset: int = 17
+) -> str:
+    """
+    Export a model to ONNX with a dynamic batch dimension.
+
+    Returns:
+        Path of the written .onnx file
+    """
+    example = torch.randn(1, 3, *input_size)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (example,), path,
+            input_names=['input'],
+            output_names=['output'],
+            dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+            opset_version=opset,
+            do_constant_folding=True,
+            dynamo=False
+        )
+
+    if ONNX_AVAILABLE:
+        onnx.checker.check_model(onnx.load(path))
+    return path
+
+
+def verify_artifact(
+    model: nn.Module,
+    backend: str,
+    path: str,
+    input_size: Tuple[int, int],
+    batch_size: int = 4
+) -> float:
+    """Max absolute output difference between an artifact and the eager model"""
+    inputs = torch.randn(batch_size, 3, *input_size)
+    runtime = create_backend(backend, model, torch.device('cpu'), artifact_path=path)
+    with torch.no_grad():
+        expected = model(inputs)
+    return float((runtime(inputs) - expected).abs().max())
+
+
+def export_model(
+    model_path: str = DEFAULT_MODEL_PATH,
+    arch: str = 'patch-classifier',
+    formats: List[str] = ['torchscript', 'onnx'],
+    output_dir: Optional[str] = None,
+    opset: int = 17
+) -> Dict[str, str]:
+    """
+    Export a checkpoint to the requested formats and verify each artifact.
+
+    Artifacts are named after the checkpoint (model.pth -> model.ts,
+    model.onnx), which is where PatchClassifier and TumorPredictor look
+    for them by default.
+
+    Returns:
+        Mapping of format to artifact path
+    """
+    model = load_eager_model(model_path, arch)
+    input_size = ARCH_INPUT_SIZES[arch]
+
+    artifacts = {}
+    for fmt in formats:
+        path = default_artifact_path(model_path, fmt)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, os.path.basename(path))
+
+        print(f"📦 Exporting {fmt}: {path}")
+        if fmt == 'torchscript':
+            export_torchscript(model, path, input_size)
+        elif fmt == 'onnx':
+            export_onnx(model, path, input_size, opset)
+        else:
+            raise ValueError(f"Unknown export format '{fmt}'")
+
+        try:
+            max_diff = verify_artifact(model, fmt, path, input_size)
+            print(f"   ✅ {os.path.getsize(path) / 1024 ** 2:.1f} MB, "
+                  f"max |Δ| vs eager: {max_diff:.2e}")
+        except ImportError as e:
+            print(f"   ⚠️  Not verified: {e}")
+        artifacts[fmt] = path
+
+    return artifacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a trained model to TorchScript and ONNX')
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH, help='Checkpoint (.pth)')
+    parser.add_argument('--arch', choices=list(ARCH_INPUT_SIZES), default='patch-classifier',
+                        help='Architecture the checkpoint belongs to')
+    parser.add_argument('--formats', nargs='+', choices=['torchscript', 'onnx'],
+                        default=['torchscript', 'onnx'])
+    parser.add_argument('--output-dir', default=None, help='Defaults to the checkpoint directory')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset version')
+    args = parser.parse_args()
+
+    export_model(args.model_path, args.arch, args.formats, args.output_dir, args.opset)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# 🚀 Inference Backends
+# Interchangeable runtimes for the classification models: eager PyTorch,
+# TorchScript and ONNX Runtime (see export_model.py for the artifacts)
+
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from typing import Optional
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+ARTIFACT_SUFFIXES = {'torchscript': '.ts', 'onnx': '.onnx'}
+
+
+class InferenceBackend:
+    """
+    Runs a model on a preprocessed (B, 3, H, W) batch and returns its raw
+    outputs as a tensor on the input's device, whatever the runtime.
+    """
+
+    name = 'base'
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+
+class EagerBackend(InferenceBackend):
+    """The nn.Module itself, optionally under an ExecutionProfile (layout/precision)"""
+
+    name = 'eager'
+
+    def __init__(self, model: nn.Module, profile=None):
+        self.model = model
+        self.profile = profile
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        if self.profile is not None:
+            return self.profile.run(self.model, batch)
+        with torch.no_grad():
+            return self.model(batch)
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Frozen TorchScript module written by export_model.export_torchscript"""
+
+    name = 'torchscript'
+
+    def __init__(self, path: str, device: torch.device):
+        self.device = torch.device(device)
+        self.module = torch.jit.load(path, map_location=self.device)
+        self.module.eval()
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.module(batch.to(self.device))
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    ONNX Runtime session over an exported graph.
+
+    CPU sessions use all graph optimizations; num_threads=None lets ONNX
+    Runtime size its intra-op pool to the machine like torch does.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, path: str, device: torch.device, num_threads: Optional[int] = None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is required for the 'onnx' backend: "
+                              "pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        providers = ['CPUExecutionProvider']
+        if torch.device(device).type == 'cuda' and \
+                'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+
+        self.session = ort.InferenceSession(path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        inputs = batch.detach().cpu().numpy().astype(np.float32, copy=False)
+        outputs = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(outputs).to(batch.device)
+
+
+def default_artifact_path(model_path: str, backend: str) -> str:
+    """Where export_model writes the artifact of a checkpoint for a backend"""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIXES[backend]
+
+
+def create_backend(
+    backend: str,
+    model: nn.Module,
+    device: torch.device,
+    model_path: Optional[str] = None,
+    artifact_path: Optional[str] = None
+) -> InferenceBackend:
+    """
+    Build an inference backend for a loaded model.
+
+    Args:
+        backend: 'eager', 'torchscript' or 'onnx'
+        model: Eager model (used directly by the eager backend)
+        device: Device inputs live on
+        model_path: Checkpoint the artifact was exported from (locates the
+            artifact when artifact_path is not given)
+        artifact_path: Exported TorchScript/ONNX file
+
+    Returns:
+        Callable backend
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'eager':
+        return EagerBackend(model)
+
+    if artifact_path is None:
+        if model_path is None:
+            raise ValueError(f"The '{backend}' backend needs model_path or artifact_path")
+        artifact_path = default_artifact_path(model_path, backend)
+    if not os.path.exists(artifact_path):
+        raise FileNotFoundError(
+            f"No {backend} artifact at {artifact_path}. "
+            f"Create it with: python -m ml.export_model {model_path or '<model.pth>'}"
+        )
+
+    print(f"Using {backend} backend: {artifact_path}")
+    if backend == 'torchscript':
+        return TorchScriptBackend(artifact_path, device)
+    return OnnxRuntimeBackend(artifact_path, device)
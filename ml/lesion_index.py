@@ -0,0 +1,330 @@
+# 🎚️ Lesion Threshold Index
+# Component tree of a heatmap's superlevel sets, built once so lesions can be
+# queried at any detection threshold in milliseconds (interactive sliders)
+
+import numpy as np
+from scipy import ndimage
+from typing import Dict, List, Optional, Tuple
+
+from .aggregation import MASK_FORMATS, calculate_tumor_burden, encode_lesion_geometry
+
+
+class LesionThresholdIndex:
+    """
+    Answers LesionDetector.detect_lesions for any threshold without
+    relabelling the heatmap.
+
+    Construction (once per heatmap, vectorized):
+    1. Every pixel above min_threshold points to its highest 4-neighbour
+       (ties broken by raster index) when that neighbour is higher; pointer
+       jumping sends each pixel to the local maximum it climbs to. The
+       resulting basins have the property that the part of a basin above
+       any threshold is connected.
+    2. Adjacent basins are joined at their saddle, the highest
+       min(value_p, value_q) over neighbouring pixel pairs that cross the
+       boundary. A sorted union-find (Kruskal) over these saddles builds the
+       merge tree of the superlevel sets {heatmap > t}.
+
+    A query at t picks the tree nodes alive at t (level > t, parent level
+    <= t); each is one connected component of heatmap > t. Its statistics
+    come from per-basin prefix statistics over pixels in descending value
+    order, reduced over the contiguous range of basins below the node.
+
+    Lesion dictionaries (ids, bboxes, areas, confidences, centres, order,
+    geometry) match detect_lesions on the same heatmap; mean confidences
+    agree up to float64 summation order.
+    """
+
+    def __init__(self, heatmap: np.ndarray, min_threshold: float = 0.0):
+        """
+        Args:
+            heatmap: (H, W) probability map
+            min_threshold: Lowest threshold that will be queried; pixels at or
+                below it are left out of the index
+        """
+        self.heatmap = np.asarray(heatmap)
+        self.min_threshold = min_threshold
+        self.shape = self.heatmap.shape
+        height, width = self.shape
+
+        values = self.heatmap.ravel().astype(np.float64)
+        active = (self.heatmap > min_threshold).ravel()
+
+        # Pixel order: value descending, raster index breaking ties (stable sort)
+        order = np.argsort(-values, kind='stable')
+        order = order[active[order]]
+        rank = np.full(values.size, -1, dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        self._sorted_values = values[order]  # Descending
+
+        basin = self._climb(rank, active, height, width)
+        self._build_basins(values, order, rank, basin, width)
+        self._build_tree(values, basin, height, width)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _climb(rank: np.ndarray, active: np.ndarray, height: int, width: int) -> np.ndarray:
+        """Local maximum (flat index) reached by steepest ascent from each pixel (-1 if inactive)"""
+        size = height * width
+        index = np.arange(size)
+        # Lower rank = higher (value, -index) key
+        key = np.where(active, rank, size)
+        best = index.copy()
+        best_key = key.copy()
+
+        grid_key = key.reshape(height, width)
+        grid_index = index.reshape(height, width)
+        for axis, shift in ((0, 1), (0, -1), (1, 1), (1, -1)):
+            neighbour_key = np.full((height, width), size, dtype=np.int64)
+            neighbour_index = np.zeros((height, width), dtype=np.int64)
+            target = [slice(None), slice(None)]
+            source = [slice(None), slice(None)]
+            target[axis] = slice(shift, None) if shift > 0 else slice(None, shift)
+            source[axis] = slice(None, -shift) if shift > 0 else slice(-shift, None)
+            neighbour_key[tuple(target)] = grid_key[tuple(source)]
+            neighbour_index[tuple(target)] = grid_index[tuple(source)]
+
+            neighbour_key = neighbour_key.ravel()
+            higher = neighbour_key < best_key
+            best = np.where(higher, neighbour_index.ravel(), best)
+            best_key = np.where(higher, neighbour_key, best_key)
+
+        # Pointer jumping to the roots (local maxima point to themselves)
+        parent = np.where(active, best, index)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        return np.where(active, parent, -1)
+
+    def _build_basins(self, values: np.ndarray, order: np.ndarray, rank: np.ndarray, basin: np.ndarray, width: int):
+        """Group pixels by basin (descending value inside) with prefix statistics"""
+        roots = np.flatnonzero(basin == np.arange(basin.size))
+        self.num_basins = len(roots)
+        lookup = np.full(basin.size, -1, dtype=np.int64)
+        lookup[roots] = np.arange(self.num_basins)
+        basin_id = lookup[basin[order]]
+
+        # Stable sort keeps the descending value order inside each basin
+        by_basin = np.argsort(basin_id, kind='stable')
+        pixels = order[by_basin]
+        segment = basin_id[by_basin]
+        self._segment_start = np.searchsorted(segment, np.arange(self.num_basins))
+
+        # Global ranks are ascending within each basin: searchable with one composite key
+        self._stride = len(order) + 1
+        self._rank_key = segment * self._stride + rank[pixels]
+
+        ys, xs = np.divmod(pixels, width)
+        offset = segment.astype(np.int64) * (int(pixels.max(initial=0)) + 1)
+        self._cum_sum = np.cumsum(values[pixels])
+        self._seg_sum_base = np.concatenate([[0.0], self._cum_sum])[self._segment_start]
+        self._cum_min_x = np.minimum.accumulate(xs - offset) + offset
+        self._cum_min_y = np.minimum.accumulate(ys - offset) + offset
+        self._cum_max_x = np.maximum.accumulate(xs + offset) - offset
+        self._cum_max_y = np.maximum.accumulate(ys + offset) - offset
+        self._cum_first = np.minimum.accumulate(pixels - offset) + offset  # First pixel in raster order
+        self._basin_max = values[pixels[self._segment_start]] if len(pixels) else np.zeros(0)
+        self._roots = roots
+
+    def _build_tree(self, values: np.ndarray, basin: np.ndarray, height: int, width: int):
+        """Kruskal merge tree over basin saddles, with leaf ranges in DFS order"""
+        grid = basin.reshape(height, width)
+        grid_values = values.reshape(height, width)
+        first, second, level = [], [], []
+        for a, b, va, vb in (
+            (grid[:, :-1], grid[:, 1:], grid_values[:, :-1], grid_values[:, 1:]),
+            (grid[:-1, :], grid[1:, :], grid_values[:-1, :], grid_values[1:, :])
+        ):
+            crossing = (a >= 0) & (b >= 0) & (a != b)
+            first.append(a[crossing])
+            second.append(b[crossing])
+            level.append(np.minimum(va[crossing], vb[crossing]))
+
+        lookup = np.full(height * width, -1, dtype=np.int64)
+        lookup[self._roots] = np.arange(self.num_basins)
+        first = lookup[np.concatenate(first)]
+        second = lookup[np.concatenate(second)]
+        level = np.concatenate(level)
+        low, high = np.minimum(first, second), np.maximum(first, second)
+
+        # Highest saddle per basin pair, then Kruskal in descending saddle order
+        pair = low * max(self.num_basins, 1) + high
+        by_pair = np.lexsort((level, pair))
+        last = np.append(pair[by_pair][1:] != pair[by_pair][:-1], True)[:len(pair)]
+        saddles = by_pair[last]
+        saddles = saddles[np.argsort(-level[saddles], kind='stable')]
+
+        num_nodes = self.num_basins
+        node_level = list(self._basin_max)
+        children: List[Tuple[int, int]] = [()] * self.num_basins
+        set_parent = list(range(self.num_basins))  # Union-find over basins
+        set_node = list(range(self.num_basins))    # Tree node of each set's root
+
+        def find(i):
+            while set_parent[i] != i:
+                set_parent[i] = set_parent[set_parent[i]]
+                i = set_parent[i]
+            return i
+
+        for a, b, saddle in zip(low[saddles].tolist(), high[saddles].tolist(), level[saddles].tolist()):
+            ra, rb = find(a), find(b)
+            if ra == rb:
+                continue
+            node_level.append(saddle)
+            children.append((set_node[ra], set_node[rb]))
+            set_parent[rb] = ra
+            set_node[ra] = num_nodes
+            num_nodes += 1
+
+        node_level = np.array(node_level, dtype=np.float64)
+        parent = np.full(num_nodes, -1, dtype=np.int64)
+        for node in range(self.num_basins, num_nodes):
+            parent[list(children[node])] = node
+
+        # Leaves of every subtree are contiguous in DFS order
+        leaf_order, leaf_range = [], np.zeros((num_nodes, 2), dtype=np.int64)
+        stack = [(node, False) for node in np.flatnonzero(parent < 0)[::-1].tolist()]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                leaf_range[node, 1] = len(leaf_order)
+                continue
+            leaf_range[node, 0] = len(leaf_order)
+            if node < self.num_basins:
+                leaf_order.append(node)
+                leaf_range[node, 1] = len(leaf_order)
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in children[node][::-1])
+
+        self.num_nodes = num_nodes
+        self._node_level = node_level
+        self._parent_level = np.where(parent >= 0, node_level[np.maximum(parent, 0)], -np.inf)
+        self._leaf_order = np.array(leaf_order, dtype=np.int64)
+        self._leaf_range = leaf_range
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def component_stats(self, threshold: float) -> Dict[str, np.ndarray]:
+        """
+        Statistics of every connected component of heatmap > threshold.
+
+        Returns:
+            Arrays over components, ordered like ndimage.label labels (by
+            first pixel in raster order): 'area', 'sum', 'max', 'x_min',
+            'y_min', 'x_max', 'y_max', 'first'
+        """
+        if threshold < self.min_threshold:
+            raise ValueError(f"Threshold {threshold} is below the index's min_threshold {self.min_threshold}")
+
+        # Compare like heatmap > threshold does (a float32 heatmap casts a Python float threshold)
+        level = float(np.asarray(threshold, dtype=np.result_type(self.heatmap, threshold)))
+        alive = np.flatnonzero((self._node_level > level) & (self._parent_level <= level))
+        empty = {name: np.zeros(0) for name in ('area', 'sum', 'max', 'x_min', 'y_min', 'x_max', 'y_max', 'first')}
+        if len(alive) == 0:
+            return empty
+
+        # Pixels above the threshold in every basin: a prefix of its descending order
+        above = np.searchsorted(-self._sorted_values, -level, side='left')
+        leaves = np.arange(self.num_basins)
+        end = np.searchsorted(self._rank_key, leaves * self._stride + above)
+        count = end - self._segment_start
+        has_pixels = count > 0
+        last = np.maximum(end - 1, 0)
+
+        big = np.iinfo(np.int64).max
+        leaf_stats = {
+            'area': count,
+            'sum': np.where(has_pixels, self._cum_sum[last] - self._seg_sum_base, 0.0),
+            'max': np.where(has_pixels, self._basin_max, -np.inf),
+            'x_min': np.where(has_pixels, self._cum_min_x[last], big),
+            'y_min': np.where(has_pixels, self._cum_min_y[last], big),
+            'x_max': np.where(has_pixels, self._cum_max_x[last], -1),
+            'y_max': np.where(has_pixels, self._cum_max_y[last], -1),
+            'first': np.where(has_pixels, self._cum_first[last], big)
+        }
+
+        # Alive subtrees are disjoint leaf ranges: reduce over [start, end) pairs
+        ranges = self._leaf_range[alive]
+        by_start = np.argsort(ranges[:, 0])
+        ranges = ranges[by_start]
+        bounds = ranges.ravel()
+        reducers = {'area': np.add, 'sum': np.add, 'max': np.maximum, 'x_min': np.minimum,
+                    'y_min': np.minimum, 'x_max': np.maximum, 'y_max': np.maximum, 'first': np.minimum}
+        stats = {}
+        for name, ufunc in reducers.items():
+            ordered = np.append(leaf_stats[name][self._leaf_order], leaf_stats[name][:1])  # Sentinel for the last end
+            stats[name] = ufunc.reduceat(ordered, bounds)[::2]
+
+        # ndimage.label numbers components in raster order of their first pixel
+        by_label = np.argsort(stats['first'], kind='stable')
+        return {name: values[by_label] for name, values in stats.items()}
+
+    def detect_lesions(
+        self,
+        threshold: float,
+        min_lesion_size: int = 100,
+        max_lesion_size: Optional[int] = None,
+        return_masks: bool = False,
+        mask_format: str = 'rle'
+    ) -> List[Dict]:
+        """
+        Lesions at a threshold, as LesionDetector(threshold, min_lesion_size,
+        max_lesion_size).detect_lesions(heatmap, return_masks, mask_format).
+        """
+        if mask_format not in MASK_FORMATS:
+            raise ValueError(f"Unknown mask format '{mask_format}', expected one of {MASK_FORMATS}")
+
+        stats = self.component_stats(threshold)
+        areas = stats['area']
+        keep = areas >= min_lesion_size
+        if max_lesion_size:
+            keep &= areas <= max_lesion_size
+
+        lesions = []
+        for label_id in (np.flatnonzero(keep) + 1).tolist():
+            i = label_id - 1
+            x_min, y_min = int(stats['x_min'][i]), int(stats['y_min'][i])
+            x_max, y_max = int(stats['x_max'][i]), int(stats['y_max'][i])
+
+            lesion_info = {
+                'id': label_id,
+                'bbox': (x_min, y_min, x_max, y_max),
+                'area': int(areas[i]),
+                'avg_confidence': float(stats['sum'][i] / areas[i]),
+                'max_confidence': float(stats['max'][i]),
+                'center': (int((x_min + x_max) / 2), int((y_min + y_max) / 2))
+            }
+
+            if return_masks:
+                # The component is the one containing its first pixel within its bbox
+                crop = self.heatmap[y_min:y_max + 1, x_min:x_max + 1] > threshold
+                labeled, _ = ndimage.label(crop)
+                first_y, first_x = divmod(int(stats['first'][i]), self.shape[1])
+                mask = labeled == labeled[first_y - y_min, first_x - x_min]
+                lesion_info['geometry'] = encode_lesion_geometry(mask, (x_min, y_min), mask_format)
+
+            lesions.append(lesion_info)
+
+        # Sort by confidence
+        lesions.sort(key=lambda x: x['avg_confidence'], reverse=True)
+
+        return lesions
+
+    def tumor_burden(
+        self,
+        threshold: float,
+        image_size: Optional[Tuple[int, int]] = None,
+        min_lesion_size: int = 100,
+        max_lesion_size: Optional[int] = None
+    ) -> Dict:
+        """calculate_tumor_burden of the lesions at a threshold (image_size defaults to the heatmap)"""
+        lesions = self.detect_lesions(threshold, min_lesion_size, max_lesion_size)
+        return calculate_tumor_burden(lesions, image_size or (self.shape[1], self.shape[0]))
@@ -8,6 +8,15 @@ from PIL import Image
 import os
 import logging
 
+try:
+    from ..inference_backends import EagerBackend, create_backend
+    from ..quantization import quantize_model
+    from ..execution_profiles import resolve_profile
+except ImportError:  # Imported as a top-level package (api/, predict.py)
+    from inference_backends import EagerBackend, create_backend
+    from quantization import quantize_model
+    from execution_profiles import resolve_profile
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,9 +27,26 @@ class TumorPredictor:
     Designed for binary classification: tumor vs non-tumor.
     """
     
-    def __init__(self, model_path=None, num_classes=2):
+    def __init__(self, model_path=None, num_classes=2, backend='eager', backend_path=None,
+                 profile='default'):
+        """
+        Args:
+            model_path: Trained weights (defaults to best_resnet50_model.pth next to this file)
+            num_classes: Number of output classes
+            backend: 'eager', 'torchscript' or 'onnx'; exported artifacts come from
+                python -m ml.export_model <model_path> --arch tumor-predictor
+            backend_path: Exported artifact (defaults to model_path with a .ts / .onnx suffix)
+            profile: Eager execution profile: 'default', 'channels_last',
+                'channels_last_bf16', or 'auto' to probe for the fastest one
+        """
         self.num_classes = num_classes
         self.model = None
+        self.model_path = None
+        self.backend_name = backend
+        self.backend_path = backend_path
+        self.backend = None
+        self.profile_name = profile
+        self.profile = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.class_names = ['Non-Tumor', 'Tumor']
         
@@ -65,6 +91,7 @@ class TumorPredictor:
             # Move model to device
             self.model = self.model.to(self.device)
             self.model.eval()
+            self.backend = None
             
             logger.info("Model built successfully")
             return self.model
@@ -125,7 +152,7 @@ class TumorPredictor:
             
             # Make prediction
             with torch.no_grad():
-                prediction = self.model(processed_image)
+                prediction = self.get_backend()(processed_image)
                 probabilities = prediction.cpu().numpy()[0]
             
             # Get predicted class and confidence
@@ -152,6 +179,62 @@ class TumorPredictor:
             logger.error(f"Error during prediction: {str(e)}")
             raise
     
+    def get_backend(self):
+        """
+        Inference backend for the current model, created on first use.
+        
+        Exported backends need the model to have been loaded from a
+        checkpoint (or an explicit backend_path).
+        """
+        if self.backend is None:
+            self.backend = create_backend(
+                self.backend_name, self.model, self.device,
+                model_path=self.model_path, artifact_path=self.backend_path
+            )
+            if self.profile_name != 'default':
+                if self.backend_name != 'eager':
+                    raise ValueError("Execution profiles apply to the eager backend only")
+                self.profile = resolve_profile(
+                    self.profile_name, self.model, (8, 3, 224, 224), self.device
+                )
+                self.backend = EagerBackend(self.model, self.profile)
+            logger.info(f"Using {self.backend_name} inference backend")
+        return self.backend
+    
+    def quantize(self, mode='dynamic', calibration_images=None, batch_size=16):
+        """
+        Predict with an INT8 copy of the model (CPU, eager backend only).
+        
+        Args:
+            mode: 'dynamic' (INT8 Linear head) or 'static' (FX-quantized conv
+                backbone plus dynamic head)
+            calibration_images: Images or patches for static calibration, e.g.
+                from quantization.sample_tiler_patches
+            batch_size: Calibration batch size
+            
+        Returns:
+            The quantized model
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Call load_model() or build_model() first.")
+        if self.device.type != 'cpu':
+            raise ValueError("INT8 quantized inference runs on the CPU only")
+        if self.backend_name != 'eager':
+            raise ValueError(f"Quantization needs the eager backend, not '{self.backend_name}'")
+        
+        batches = None
+        if calibration_images is not None:
+            tensors = [self.preprocess_image(image) for image in calibration_images]
+            batches = [
+                torch.cat(tensors[i:i + batch_size])
+                for i in range(0, len(tensors), batch_size)
+            ]
+        
+        quantized = quantize_model(self.model, mode, batches, head_name='fc')
+        self.backend = EagerBackend(quantized)
+        logger.info(f"Using {mode} INT8 quantized model")
+        return quantized
+    
     def _get_risk_level(self, confidence, predicted_class_idx):
         """
         Determine risk level based on prediction confidence.
@@ -218,6 +301,8 @@ class TumorPredictor:
             
             self.model.load_state_dict(state_dict)
             self.model.eval()
+            self.model_path = model_path
+            self.backend = None
             
             logger.info(f"Model loaded successfully from {model_path}")
             
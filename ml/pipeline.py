@@ -14,6 +14,7 @@ from tqdm import tqdm
 import json
 import base64
 from io import BytesIO
+from functools import partial
 
 try:
     from scipy.interpolate import griddata
@@ -21,10 +22,21 @@ try:
 except ImportError:
     SCIPY_AVAILABLE = False
 
-from .tiling import GigapixelTiler, PatchExtractor
-from .classifier import PatchClassifier
-from .aggregation import HeatmapGenerator, LesionDetector, calculate_tumor_burden
+from .tiling import GigapixelTiler, PatchExtractor, TilingPlan
+from .classifier import (
+    PatchClassifier, PatchPredictions, EnsembleClassifier, PrefetchingInferenceRunner,
+    calculate_patch_statistics, preprocess_patch_batch
+)
+from .cascade import CascadeClassifier
+from .dense_inference import DenseInferenceEngine
+from .quantization import sample_tiler_patches
+from .aggregation import (
+    HeatmapGenerator, LesionDetector, calculate_tumor_burden, lesion_to_json, rescale_lesions
+)
+from .lesion_index import LesionThresholdIndex
 from .attention import MultiScaleAttention, aggregate_patch_attentions
+from .slide_cache import DecodedSlideCache
+from .staged_execution import StagedPatchExecutor, format_stage_stats
 
 
 class HistopathologyPipeline:
@@ -46,7 +58,27 @@ class HistopathologyPipeline:
         overlap: float = 0.25,
         detection_threshold: float = 0.5,
         device: str = 'cuda',
-        verbose: bool = True
+        verbose: bool = True,
+        max_memory_mb: float = 512,
+        execution_mode: str = 'prefetch',
+        num_workers: int = 2,
+        queue_size: int = 8,
+        worker_type: str = 'thread',
+        cache_dir: Optional[str] = None,
+        cache_max_gb: float = 20,
+        native_resolution: bool = False,
+        backend: str = 'eager',
+        profile: str = 'default',
+        quantization: Optional[str] = None,
+        calibration_slides: Optional[List[str]] = None,
+        collect_embeddings: bool = False,
+        cascade_band: Optional[Tuple[float, float]] = None,
+        screening_size: int = 48,
+        screening_model_path: Optional[str] = None,
+        ensemble_model_paths: Optional[List[str]] = None,
+        tta: Optional[str] = None,
+        heatmap_max_size: int = 4096,
+        lesion_index: bool = False
     ):
         """
         Initialize pipeline.
@@ -58,32 +90,133 @@ class HistopathologyPipeline:
             detection_threshold: Probability threshold for tumor detection
             device: 'cuda' or 'cpu'
             verbose: Print progress
+            max_memory_mb: Memory ceiling for decoded slide pixels during tiling
+            execution_mode: 'prefetch' (tiling and preprocessing of the next batch
+                overlap the forward pass), 'serial', or 'staged' (concurrent
+                tiling/preprocessing/inference/aggregation connected by bounded queues),
+                or 'dense' (backbone run once over tissue regions, every window of a
+                finer native-resolution grid scored from the shared feature map)
+            num_workers: Decode (tiling + tissue check) and preprocessing workers
+                in staged mode; each decode worker holds its own row band
+            queue_size: Capacity, in batches, of each queue in staged mode
+            worker_type: 'thread' or 'process' preprocessing workers in staged mode
+            cache_dir: Directory for decoded, memory-mapped slide rasters, so
+                re-analysing a slide skips decoding (None disables the cache)
+            cache_max_gb: Size budget of the slide cache (LRU eviction)
+            native_resolution: Read each patch_size field of view directly at the
+                classifier's input size from a downsampled pyramid level, instead
+                of cutting patch_size pixels and resizing every patch
+            backend: Classifier runtime: 'eager', 'torchscript' or 'onnx' (artifacts
+                from python -m ml.export_model next to model_path)
+            profile: Eager execution profile ('default', 'channels_last',
+                'channels_last_bf16', or 'auto' to probe the machine at startup)
+            quantization: None, 'dynamic' or 'static' INT8 inference on the CPU
+            calibration_slides: Slides whose tissue patches calibrate 'static'
+                quantization
+            collect_embeddings: Also return (and save) the pooled layer4 embedding
+                of every patch, from the same forward pass as its prediction
+                (for MIL or similarity search); uses the eager fp32 model
+            cascade_band: (low, high) enables cascade inference: every patch is
+                screened cheaply and only screening probabilities inside the band
+                go through the full classifier (None disables the cascade)
+            screening_size: Input size of the downscaled screening pass
+            screening_model_path: Separate small screening model instead
+            ensemble_model_paths: Escalate uncertain patches to an ensemble of
+                these models instead of the single classifier
+            tta: Test-time augmentation, 'flips' or 'dihedral' (flips and 90°
+                rotations): every patch is classified as the mean over its
+                views, with their variance as 'tta_variance'
+            heatmap_max_size: Longest side of the pixel heatmap; larger slides get
+                a proportionally downscaled heatmap (lesions are reported in
+                slide pixels either way)
+            lesion_index: Also build a LesionThresholdIndex over the heatmap
+                (results['lesion_index']) so lesions_at_threshold can answer
+                other detection thresholds without re-running detection
         """
         self.patch_size = patch_size
         self.overlap = overlap
         self.detection_threshold = detection_threshold
         self.verbose = verbose
+        self.execution_mode = execution_mode
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.worker_type = worker_type
+        self.collect_embeddings = collect_embeddings
+        self.tta = tta
+        self.heatmap_max_size = heatmap_max_size
+        self.lesion_index = lesion_index
         
         # Initialize components
         if verbose:
             print("🔬 Initializing Histopathology Analysis Pipeline")
             print("=" * 70)
         
+        # Decoded-slide cache shared by tiling and visualization
+        self.slide_cache = None
+        if cache_dir:
+            self.slide_cache = DecodedSlideCache(
+                cache_dir,
+                max_bytes=int(cache_max_gb * 1024 ** 3),
+                max_memory_mb=max_memory_mb
+            )
+        
         # Tiler
         self.tiler = GigapixelTiler(
             patch_size=patch_size,
             overlap=overlap,
             scales=[1.0],  # Single scale for efficiency
-            tissue_threshold=0.85
+            tissue_threshold=0.85,
+            max_memory_mb=max_memory_mb,
+            slide_cache=self.slide_cache
         )
         
+        # Dense mode scores windows from the eager fp32 backbone's feature maps
+        if execution_mode == 'dense' and quantization:
+            raise ValueError("INT8 quantization is not supported with dense inference")
+        if execution_mode == 'dense' and backend != 'eager':
+            raise ValueError(f"The '{backend}' backend is not supported with dense inference")
+        
         # Classifier
         self.classifier = PatchClassifier(
             model_path=model_path,
             device=device,
-            threshold=detection_threshold
+            threshold=detection_threshold,
+            backend=backend,
+            profile=profile
         )
         
+        if tta and (cascade_band is not None or execution_mode == 'dense'):
+            raise ValueError("Test-time augmentation is not supported with cascade or dense inference")
+        
+        self.cascade = None
+        if cascade_band is not None:
+            if collect_embeddings:
+                raise ValueError("Embeddings are not available for screened patches in cascade mode")
+            self.cascade = CascadeClassifier(
+                self.classifier,
+                band=cascade_band,
+                screening_size=screening_size,
+                screening_classifier=PatchClassifier(
+                    model_path=screening_model_path, device=device
+                ) if screening_model_path else None,
+                ensemble=EnsembleClassifier(
+                    ensemble_model_paths, device=device
+                ) if ensemble_model_paths else None
+            )
+        
+        if quantization:
+            calibration = None
+            if calibration_slides:
+                calibration = sample_tiler_patches(self.tiler, calibration_slides)
+            self.classifier.quantize(quantization, calibration_patches=calibration)
+        
+        if native_resolution or execution_mode == 'dense':
+            self.tiler.output_size = self.classifier.input_size[0]
+        
+        self.dense_engine = None
+        if execution_mode == 'dense':
+            self.dense_engine = DenseInferenceEngine(self.classifier, self.tiler)
+        
         if verbose:
             print("✅ Pipeline initialized successfully\n")
     
@@ -122,8 +255,8 @@ class HistopathologyPipeline:
         os.makedirs(output_dir, exist_ok=True)
         
         # Load image to get size
-        img = Image.open(image_path)
-        image_size = img.size  # (width, height)
+        with Image.open(image_path) as img:
+            image_size = img.size  # (width, height)
         
         if self.verbose:
             print(f"📏 Image size: {image_size[0]}x{image_size[1]} pixels")
@@ -132,71 +265,87 @@ class HistopathologyPipeline:
         if self.verbose:
             print("\n📦 Step 1: Extracting and classifying patches...")
         
-        patch_predictions = []
-        patch_positions = []
-        patch_batch = []
-        position_batch = []
-        
-        # Initialize heatmap generator
+        # Initialize heatmap generator (accumulates on the tiling grid)
         heatmap_gen = HeatmapGenerator(
             image_size=image_size,
             patch_size=self.patch_size,
             aggregation_method='weighted_average',
-            smoothing_sigma=3.0
+            smoothing_sigma=3.0,
+            stride=self.tiler.stride,
+            cell_size=self.dense_engine.stride if self.dense_engine is not None else None
         )
         
         # Process patches
-        patch_count = 0
-        for patch, patch_info in self.tiler.extract_patches(image_path, save_patches=False):
-            patch_batch.append(patch)
-            position_batch.append((patch_info.x, patch_info.y))
-            
-            # Process batch
-            if len(patch_batch) >= batch_size:
-                predictions = self.classifier.predict_batch(patch_batch, batch_size=batch_size)
-                
-                # Add to heatmap
-                for pred, (x, y) in zip(predictions, position_batch):
-                    heatmap_gen.add_patch_prediction(
-                        x, y,
-                        pred['tumor_probability'],
-                        pred['confidence']
-                    )
-                    patch_predictions.append(pred)
-                    patch_positions.append((x, y))
-                
-                patch_count += len(patch_batch)
-                patch_batch = []
-                position_batch = []
-        
-        # Process remaining patches
-        if patch_batch:
-            predictions = self.classifier.predict_batch(patch_batch, batch_size=batch_size)
-            
-            for pred, (x, y) in zip(predictions, position_batch):
-                heatmap_gen.add_patch_prediction(
-                    x, y,
-                    pred['tumor_probability'],
-                    pred['confidence']
-                )
-                patch_predictions.append(pred)
-                patch_positions.append((x, y))
-            
-            patch_count += len(patch_batch)
+        stage_stats = None
+        if self.cascade is not None:
+            self.cascade.reset_stats()
+        if self.execution_mode == 'staged':
+            patch_predictions, patch_positions, stage_stats = self._classify_patches_staged(
+                image_path, heatmap_gen, batch_size
+            )
+        elif self.execution_mode == 'dense':
+            patch_predictions, patch_positions, stage_stats = self._classify_patches_dense(
+                image_path, heatmap_gen
+            )
+        elif self.execution_mode == 'prefetch':
+            patch_predictions, patch_positions, stage_stats = self._classify_patches_prefetch(
+                image_path, heatmap_gen, batch_size
+            )
+        else:
+            patch_predictions, patch_positions = self._classify_patches_serial(
+                image_path, heatmap_gen, batch_size
+            )
+        patch_count = len(patch_predictions)
+        
+        if self.cascade is not None:
+            cascade_stats = self._cascade_report()
+            if self.verbose:
+                print(f"   Cascade: {cascade_stats['escalated']}/{cascade_stats['patches']} patches "
+                      f"escalated ({cascade_stats['escalation_fraction'] * 100:.1f}%), screening "
+                      f"{cascade_stats['screening_s']:.2f}s, escalation {cascade_stats['escalation_s']:.2f}s, "
+                      f"est. speedup {cascade_stats['estimated_speedup']:.2f}x")
+        
+        # Embeddings travel with their predictions (batches may finish out of order)
+        embeddings = None
+        if self.collect_embeddings:
+            embeddings = patch_predictions.embeddings if patch_predictions.embeddings is not None \
+                else np.zeros((0, 2048), dtype=np.float32)
+            patch_predictions.embeddings = None
+            np.savez(
+                os.path.join(output_dir, "embeddings.npz"),
+                embeddings=embeddings,
+                positions=np.array(patch_positions, dtype=np.int64).reshape(-1, 2)
+            )
         
         if self.verbose:
             print(f"✅ Classified {patch_count} patches")
+            if stage_stats and self.execution_mode == 'staged':
+                print(format_stage_stats(stage_stats))
+            elif stage_stats and self.execution_mode == 'dense':
+                print(f"   Dense grid: {stage_stats['windows']} windows from "
+                      f"{stage_stats['regions']} regions, forward {stage_stats['forward_s']:.2f}s, "
+                      f"reading {stage_stats['read_s']:.2f}s")
+            elif stage_stats:
+                print(f"   Forward {stage_stats['forward_s']:.2f}s, tiling+preprocessing "
+                      f"{stage_stats['preprocess_s']:.2f}s (overlapped), "
+                      f"stalled {stage_stats['wait_s']:.2f}s waiting for input")
         
         # Step 2: Generate heatmap
         if self.verbose:
             print("\n🗺️  Step 2: Generating probability heatmap...")
         
-        heatmap = heatmap_gen.generate_heatmap(apply_smoothing=True)
+        heatmap_scale = min(1.0, self.heatmap_max_size / max(image_size))
+        heatmap_size = (
+            max(1, int(round(image_size[0] * heatmap_scale))),
+            max(1, int(round(image_size[1] * heatmap_scale)))
+        )
+        heatmap = heatmap_gen.generate_heatmap(apply_smoothing=True, output_size=heatmap_size)
         
         # Calculate statistics
-        tumor_patches = sum(1 for p in patch_predictions if p['class_id'] == 1)
-        tumor_ratio = tumor_patches / len(patch_predictions) if patch_predictions else 0
-        avg_tumor_prob = np.mean([p['tumor_probability'] for p in patch_predictions])
+        patch_stats = calculate_patch_statistics(patch_predictions)
+        tumor_patches = patch_stats['tumor_patches']
+        tumor_ratio = patch_stats['tumor_ratio']
+        avg_tumor_prob = patch_stats['avg_tumor_probability']
         
         if self.verbose:
             print(f"✅ Heatmap generated")
@@ -207,11 +356,23 @@ class HistopathologyPipeline:
         if self.verbose:
             print("\n🎯 Step 3: Detecting lesions...")
         
+        # Heatmap pixels -> slide pixels
+        scale_x = image_size[0] / heatmap.shape[1]
+        scale_y = image_size[1] / heatmap.shape[0]
         detector = LesionDetector(
             detection_threshold=self.detection_threshold,
-            min_lesion_size=100
+            min_lesion_size=self._heatmap_min_lesion_size(scale_x, scale_y)
+        )
+        lesions = rescale_lesions(
+            detector.detect_lesions(heatmap, return_masks=True, mask_format='rle'), scale_x, scale_y
         )
-        lesions = detector.detect_lesions(heatmap, return_masks=True)
+        
+        lesion_index = None
+        if self.lesion_index:
+            start = time.time()
+            lesion_index = LesionThresholdIndex(heatmap)
+            if self.verbose:
+                print(f"   Threshold index: {lesion_index.num_nodes} tree nodes in {time.time() - start:.2f}s")
         
         if self.verbose:
             print(f"✅ Detected {len(lesions)} lesions")
@@ -226,8 +387,13 @@ class HistopathologyPipeline:
         if self.verbose:
             print("\n🎨 Step 4: Generating visualizations...")
         
-        # Load original image as numpy array
-        img_array = np.array(img.resize((1024, 1024)))  # Resize for visualization
+        # Overview of the original image, built band by band (never a full decode)
+        if self.slide_cache is not None:
+            thumbnail = self.slide_cache.get_thumbnail(image_path, self.tiler.thumbnail_size)
+        else:
+            with self.tiler.open_reader(image_path) as reader:
+                thumbnail = reader.get_thumbnail(1024)
+        img_array = np.array(Image.fromarray(thumbnail).resize((1024, 1024)))  # Resize for visualization
         heatmap_resized = np.array(Image.fromarray((heatmap * 255).astype(np.uint8)).resize((1024, 1024))) / 255.0
         
         # Create visualizations
@@ -236,19 +402,7 @@ class HistopathologyPipeline:
         
         # Draw detections
         # Resize lesion bounding boxes for visualization
-        scale_x = 1024 / image_size[0]
-        scale_y = 1024 / image_size[1]
-        scaled_lesions = []
-        for lesion in lesions:
-            x_min, y_min, x_max, y_max = lesion['bbox']
-            scaled_lesion = lesion.copy()
-            scaled_lesion['bbox'] = (
-                int(x_min * scale_x),
-                int(y_min * scale_y),
-                int(x_max * scale_x),
-                int(y_max * scale_y)
-            )
-            scaled_lesions.append(scaled_lesion)
+        scaled_lesions = rescale_lesions(lesions, 1024 / image_size[0], 1024 / image_size[1])
         
         detections_img = detector.draw_detections(img_array, scaled_lesions)
         
@@ -259,6 +413,9 @@ class HistopathologyPipeline:
             Image.fromarray(overlay).save(os.path.join(output_dir, "overlay.png"))
         if save_detections:
             Image.fromarray(detections_img).save(os.path.join(output_dir, "detections.png"))
+            # Lesion geometry (run-length encoded) for the web backend
+            with open(os.path.join(output_dir, "lesions.json"), 'w') as f:
+                json.dump([lesion_to_json(lesion) for lesion in lesions], f)
         
         # Create comprehensive report
         self._generate_report(
@@ -292,9 +449,214 @@ class HistopathologyPipeline:
             'tumor_burden': tumor_metrics,
             'heatmap': heatmap,
             'processing_time': elapsed_time,
-            'output_dir': output_dir
+            'output_dir': output_dir,
+            'stage_stats': stage_stats,
+            'patch_positions': patch_positions,
+            'embeddings': embeddings,
+            'cascade_stats': self._cascade_report() if self.cascade is not None else None,
+            'lesion_index': lesion_index
         }
     
+    @staticmethod
+    def _heatmap_min_lesion_size(scale_x: float, scale_y: float) -> int:
+        """100 slide pixels, in heatmap pixels"""
+        return max(1, int(round(100 / (scale_x * scale_y))))
+    
+    def lesions_at_threshold(self, results: Dict, threshold: float) -> Tuple[List[Dict], Dict]:
+        """
+        Lesions and tumor burden of an analyzed slide at another detection threshold.
+        
+        Args:
+            results: process_image results of a pipeline built with lesion_index=True
+            threshold: Detection threshold
+        
+        Returns:
+            (lesions in slide pixels, tumor burden metrics), as process_image
+            reports them for detection_threshold=threshold
+        """
+        lesion_index = results.get('lesion_index')
+        if lesion_index is None:
+            raise ValueError("No lesion index in these results: create the pipeline with lesion_index=True")
+        
+        image_size = results['image_size']
+        scale_x = image_size[0] / lesion_index.shape[1]
+        scale_y = image_size[1] / lesion_index.shape[0]
+        lesions = rescale_lesions(
+            lesion_index.detect_lesions(
+                threshold, self._heatmap_min_lesion_size(scale_x, scale_y),
+                return_masks=True, mask_format='rle'
+            ),
+            scale_x, scale_y
+        )
+        return lesions, calculate_tumor_burden(lesions, image_size)
+    
+    def _classify_patches_serial(
+        self,
+        image_path: str,
+        heatmap_gen: HeatmapGenerator,
+        batch_size: int
+    ) -> Tuple[PatchPredictions, List[Tuple[int, int]]]:
+        """Tile, classify and aggregate patches one batch at a time in this thread"""
+        patch_predictions = []
+        position_batches = []
+        
+        plan = self.tiler.create_tiling_plan(image_path)
+        if self.verbose:
+            print(f"   Tiling plan: {len(plan)} grid cells, "
+                  f"{int(plan.is_tissue.sum())} on tissue ({plan.nbytes / 1024:.0f} KB)")
+        
+        infer_fn = self._infer_fn()
+        for patches, batch_plan in self.tiler.iter_plan_batches(image_path, plan, batch_size):
+            predictions = infer_fn(self.classifier.preprocess_batch(patches))
+            self._aggregate_batch(heatmap_gen, predictions, batch_plan)
+            patch_predictions.append(predictions)
+            position_batches.append(batch_plan)
+        
+        return PatchPredictions.concatenate(patch_predictions), self._plan_positions(position_batches)
+    
+    def _classify_patches_prefetch(
+        self,
+        image_path: str,
+        heatmap_gen: HeatmapGenerator,
+        batch_size: int
+    ) -> Tuple[PatchPredictions, List[Tuple[int, int]], Dict]:
+        """
+        Classify batches in this thread while a worker tiles and preprocesses
+        the next ones.
+        
+        Returns:
+            (predictions, positions, runner statistics)
+        """
+        patch_predictions = []
+        position_batches = []
+        
+        plan = self.tiler.create_tiling_plan(image_path)
+        runner = PrefetchingInferenceRunner(self.classifier, infer_fn=self._infer_fn())
+        batches = self.tiler.iter_plan_batches(image_path, plan, batch_size)
+        
+        for predictions, batch_plan in runner.run(batches):
+            self._aggregate_batch(heatmap_gen, predictions, batch_plan)
+            patch_predictions.append(predictions)
+            position_batches.append(batch_plan)
+        
+        return PatchPredictions.concatenate(patch_predictions), self._plan_positions(position_batches), runner.stats
+    
+    def _classify_patches_staged(
+        self,
+        image_path: str,
+        heatmap_gen: HeatmapGenerator,
+        batch_size: int
+    ) -> Tuple[PatchPredictions, List[Tuple[int, int]], Dict]:
+        """
+        Tile, preprocess, classify and aggregate patches in concurrent stages.
+        
+        Returns:
+            (predictions, positions, stage statistics)
+        """
+        patch_predictions = []
+        position_batches = []
+        
+        def add_predictions(predictions, batch_plan):
+            self._aggregate_batch(heatmap_gen, predictions, batch_plan)
+            patch_predictions.append(predictions)
+            position_batches.append(batch_plan)
+        
+        executor = StagedPatchExecutor(
+            preprocess_fn=partial(
+                preprocess_patch_batch,
+                size=self.classifier.input_size,
+                mean=self.classifier.mean,
+                std=self.classifier.std
+            ),
+            infer_fn=self._infer_fn(),
+            num_workers=self.num_workers,
+            queue_size=self.queue_size,
+            batch_size=batch_size,
+            use_processes=(self.worker_type == 'process')
+        )
+        # Decode workers read contiguous runs of plan chunks, each with its own reader
+        plan = self.tiler.create_tiling_plan(image_path)
+        chunks = list(enumerate(self.tiler.plan_chunks(plan, batch_size)))
+        parts = [part for part in np.array_split(np.arange(len(chunks)), self.num_workers) if len(part)]
+        stage_stats = executor.run_sources(
+            [self.tiler.iter_plan_chunks(image_path, [chunks[i] for i in part]) for part in parts],
+            add_predictions
+        )
+        
+        return PatchPredictions.concatenate(patch_predictions), self._plan_positions(position_batches), stage_stats
+    
+    def _classify_patches_dense(
+        self,
+        image_path: str,
+        heatmap_gen: HeatmapGenerator
+    ) -> Tuple[PatchPredictions, List[Tuple[int, int]], Dict]:
+        """
+        Score every window of the dense grid from shared region feature maps.
+        
+        Returns:
+            (predictions, positions, dense inference statistics)
+        """
+        patch_predictions = []
+        position_batches = []
+        
+        plan = self.dense_engine.create_dense_plan(image_path)
+        if self.verbose:
+            print(f"   Dense plan: {len(plan)} windows every {self.dense_engine.stride}px, "
+                  f"{int(plan.is_tissue.sum())} on tissue")
+        
+        for predictions, batch_plan in self.dense_engine.iter_predictions(
+            image_path, plan, return_embeddings=self.collect_embeddings
+        ):
+            self._aggregate_batch(heatmap_gen, predictions, batch_plan)
+            patch_predictions.append(predictions)
+            position_batches.append(batch_plan)
+        
+        return (
+            PatchPredictions.concatenate(patch_predictions),
+            self._plan_positions(position_batches),
+            dict(self.dense_engine.stats)
+        )
+    
+    def _infer_fn(self):
+        """Input tensor -> predictions (through the cascade, with embeddings if collected, with TTA)"""
+        if self.cascade is not None:
+            return self.cascade.predict_tensor
+        return partial(self.classifier.predict_tensor, return_embeddings=self.collect_embeddings, tta=self.tta)
+    
+    def _cascade_report(self) -> Dict:
+        """
+        Cascade statistics of the last slide.
+        
+        The speedup is estimated against classifying every patch at the
+        measured per-patch cost of the escalation stage.
+        """
+        stats = dict(self.cascade.stats)
+        stats['escalation_fraction'] = self.cascade.escalation_fraction
+        cascade_s = stats['screening_s'] + stats['escalation_s']
+        if stats['escalated'] and cascade_s > 0:
+            full_s = stats['escalation_s'] / stats['escalated'] * stats['patches']
+            stats['estimated_speedup'] = full_s / cascade_s
+        else:
+            stats['estimated_speedup'] = float('nan')
+        return stats
+    
+    @staticmethod
+    def _aggregate_batch(
+        heatmap_gen: HeatmapGenerator,
+        predictions: PatchPredictions,
+        batch_plan: TilingPlan
+    ):
+        """Position one batch of predictions at the plan's coordinates and add it to the heatmap"""
+        heatmap_gen.add_predictions(predictions.with_positions(batch_plan.x, batch_plan.y))
+    
+    @staticmethod
+    def _plan_positions(batch_plans: List[TilingPlan]) -> List[Tuple[int, int]]:
+        """(x, y) tuples for all classified patches, in tiling order"""
+        if not batch_plans:
+            return []
+        plan = TilingPlan.concatenate(batch_plans)
+        return list(zip(plan.x.tolist(), plan.y.tolist()))
+    
     def _generate_report(
         self,
         original_img,
@@ -336,7 +698,7 @@ class HistopathologyPipeline:
         
         # Histogram
         ax5 = plt.subplot(2, 3, 5)
-        tumor_probs = [p['tumor_probability'] for p in predictions]
+        tumor_probs = predictions.tumor_probability.astype(np.float64)
         ax5.hist(tumor_probs, bins=50, color='steelblue', edgecolor='black', alpha=0.7)
         ax5.axvline(x=0.5, color='red', linestyle='--', label='Threshold')
         ax5.set_xlabel('Tumor Probability', fontsize=12)
@@ -356,8 +718,8 @@ class HistopathologyPipeline:
 
 📊 PATCH STATISTICS:
   • Total patches: {len(predictions)}
-  • Tumor patches: {sum(1 for p in predictions if p['class_id']==1)}
-  • Normal patches: {sum(1 for p in predictions if p['class_id']==0)}
+  • Tumor patches: {int(np.count_nonzero(predictions.class_id == 1))}
+  • Normal patches: {int(np.count_nonzero(predictions.class_id == 0))}
   • Tumor ratio: {tumor_metrics.get('tumor_burden_percentage', 0):.2f}%
 
 🎯 LESION DETECTION:
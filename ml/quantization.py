@@ -0,0 +1,123 @@
+# 🔢 INT8 Quantization
+# Quantized CPU inference: dynamic INT8 Linear heads and FX static INT8 conv
+# backbones, calibrated on tissue patches sampled by GigapixelTiler
+
+import copy
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from typing import Iterable, Optional, Sequence, Tuple
+
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+
+def quantization_engine() -> str:
+    """Best available quantized kernel library on this CPU"""
+    supported = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in supported:
+            return engine
+    raise RuntimeError(f"No INT8 quantization engine available (supported: {supported})")
+
+
+def quantize_model(
+    model: nn.Module,
+    mode: str,
+    calibration_batches: Optional[Iterable[torch.Tensor]] = None,
+    head_name: str = 'backbone.fc'
+) -> nn.Module:
+    """
+    INT8 copy of an eval-mode model for CPU inference.
+
+    Modes:
+    - 'dynamic': Linear layers get INT8 weights and per-batch activation
+      scales; convolutions stay fp32. No calibration needed.
+    - 'static': the conv backbone is traced with FX and quantized with
+      activation ranges observed on calibration_batches; the head (kept
+      out of static quantization) is then quantized dynamically.
+
+    Args:
+        model: fp32 model (left untouched)
+        mode: 'dynamic' or 'static'
+        calibration_batches: Preprocessed (B, 3, H, W) CPU tensors, required for 'static'
+        head_name: Qualified name of the classification head module
+
+    Returns:
+        Quantized model (CPU only)
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+
+    engine = quantization_engine()
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(model).cpu().eval()
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization is deprecated in favour of torchao, same kernels
+        warnings.simplefilter('ignore')
+
+        if mode == 'static':
+            batches = list(calibration_batches or [])
+            if not batches:
+                raise ValueError("Static quantization needs calibration batches")
+
+            qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name(head_name, None)
+            prepared = prepare_fx(model, qconfig_mapping, (batches[0][:1].cpu(),))
+            with torch.no_grad():
+                for batch in batches:
+                    prepared(batch.cpu())
+            model = convert_fx(prepared)
+
+        return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def sample_tiler_patches(
+    tiler,
+    image_paths: Sequence[str],
+    num_patches: int = 256,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Random tissue patches from slides, read exactly as tiling would read them.
+
+    Grid cells are drawn uniformly from the tissue cells of every slide's
+    tiling plan; cells rejected by the pixel-level tissue check are skipped.
+
+    Returns:
+        uint8 (N, P, P, 3) array with N <= num_patches
+    """
+    rng = np.random.default_rng(seed)
+    per_slide = int(np.ceil(num_patches / max(len(image_paths), 1)))
+
+    patches = []
+    for image_path in image_paths:
+        plan = tiler.create_tiling_plan(image_path).tissue()
+        if len(plan) == 0:
+            continue
+        chosen = np.sort(rng.choice(len(plan), size=min(per_slide, len(plan)), replace=False))
+        for batch, _ in tiler.iter_plan_batches(image_path, plan[chosen]):
+            patches.extend(batch)
+
+    if not patches:
+        raise ValueError("No tissue patches found in the calibration slides")
+
+    patches = np.stack(patches)
+    order = rng.permutation(len(patches))[:num_patches]
+    return patches[order]
+
+
+def split_holdout(
+    patches: np.ndarray,
+    holdout_fraction: float = 0.5,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(calibration, held-out) split, so accuracy is never measured on calibration data"""
+    order = np.random.default_rng(seed).permutation(len(patches))
+    split = int(round(len(patches) * (1 - holdout_fraction)))
+    return patches[order[:split]], patches[order[split:]]
+
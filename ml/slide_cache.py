@@ -0,0 +1,298 @@
+# 💾 Decoded Slide Cache
+# On-disk cache of decoded RGB rasters and pyramid levels as memory-mapped arrays
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from PIL import Image
+from typing import Dict, Optional
+
+from .slide_io import RegionReader, ArrayRegionReader, ImagePyramid, open_region_reader
+
+
+class CachedRegionReader(ArrayRegionReader):
+    """
+    Zero-copy region reader over a cached, memory-mapped level.
+    Thumbnails are served from the cache as well.
+    """
+
+    def __init__(self, array: np.ndarray, cache: 'DecodedSlideCache', path: str):
+        super().__init__(array, copy=False)
+        self.cache = cache
+        self.path = path
+
+    @property
+    def band_height(self) -> int:
+        # Regions are views into the page cache: large strips cost no copies
+        return min(self.size[1], 1024)
+
+    def get_thumbnail(self, max_size: int = 1024) -> np.ndarray:
+        return self.cache.get_thumbnail(self.path, max_size)
+
+
+class CachedSlidePyramid:
+    """ImagePyramid counterpart whose levels come from a DecodedSlideCache"""
+
+    def __init__(self, cache: 'DecodedSlideCache', path: str, resample: int = Image.LANCZOS):
+        self.cache = cache
+        self.path = path
+        self.resample = resample
+        self.levels = {}
+
+    def get_level(self, scale: float) -> RegionReader:
+        if scale not in self.levels:
+            self.levels[scale] = self.cache.open_reader(self.path, scale, self.resample)
+        return self.levels[scale]
+
+    def close(self):
+        for level in self.levels.values():
+            level.close()
+        self.levels = {}
+
+
+class DecodedSlideCache:
+    """
+    Decode each slide once and reuse the raster across runs.
+
+    Levels are stored as .npy files and opened with np.load(mmap_mode='r'),
+    so readers slice pages straight from the OS page cache. Entries are
+    keyed by the SHA-256 of the source file content (not its path), and the
+    least recently used entries are evicted once the cache exceeds max_bytes.
+
+    The cache is meant for one process at a time.
+    """
+
+    INDEX_NAME = 'index.json'
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 20 * 1024 ** 3,
+        max_memory_mb: float = 512
+    ):
+        """
+        Args:
+            cache_dir: Directory holding the cached arrays
+            max_bytes: Size budget for all cached arrays
+            max_memory_mb: Memory ceiling while decoding a slide into the cache
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_memory_mb = max_memory_mb
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+        self._prune_fingerprints()
+
+    # ------------------------------------------------------------------
+    # Keys and index
+    # ------------------------------------------------------------------
+
+    def slide_key(self, path: str) -> str:
+        """
+        SHA-256 of the file content.
+
+        Hashes are remembered per (path, size, mtime), so unchanged files
+        are only read once.
+        """
+        stat = os.stat(path)
+        fingerprint = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = self.index['fingerprints'].get(fingerprint)
+        if key is None:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                    digest.update(chunk)
+            key = digest.hexdigest()
+            self.index['fingerprints'][fingerprint] = key
+            self._save_index()
+        return key
+
+    def _load_index(self) -> Dict:
+        index_path = os.path.join(self.cache_dir, self.INDEX_NAME)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+        else:
+            index = {'entries': {}, 'fingerprints': {}}
+
+        # Drop entries whose files were removed behind our back
+        index['entries'] = {
+            name: entry for name, entry in index['entries'].items()
+            if os.path.exists(os.path.join(self.cache_dir, name))
+        }
+        return index
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_NAME)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, index_path)
+
+    @staticmethod
+    def _entry_name(key: str, level: str) -> str:
+        return f"{key}_{level}.npy"
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry['bytes'] for entry in self.index['entries'].values())
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def open_reader(
+        self,
+        path: str,
+        scale: float = 1.0,
+        resample: int = Image.LANCZOS
+    ) -> CachedRegionReader:
+        """
+        Zero-copy reader for a slide level, decoding it into the cache on a miss.
+
+        Args:
+            path: Source slide
+            scale: Pyramid level (1.0 = full resolution)
+            resample: PIL filter used if the level has to be derived
+        """
+        level = f"s{float(scale)!r}"  # repr round-trips exactly
+        if scale != 1.0 and resample != Image.LANCZOS:
+            level += f"_r{int(resample)}"
+        array = self._get_array(path, level, lambda: self._decode_level(path, scale, resample))
+        return CachedRegionReader(array, self, path)
+
+    def get_thumbnail(self, path: str, max_size: int = 1024) -> np.ndarray:
+        """Cached low-resolution overview (same result as RegionReader.get_thumbnail)"""
+        def build():
+            reader = self.open_reader(path)
+            thumbnail = RegionReader.get_thumbnail(reader, max_size)
+            reader.close()
+            return thumbnail
+
+        return np.asarray(self._get_array(path, f"thumb{max_size}", build))
+
+    def pyramid(self, path: str, resample: int = Image.LANCZOS) -> CachedSlidePyramid:
+        """Pyramid whose levels are cached rasters"""
+        return CachedSlidePyramid(self, path, resample)
+
+    def clear(self):
+        """Remove all cached arrays"""
+        for name in list(self.index['entries']):
+            self._remove(name)
+        self._prune_fingerprints()
+        self._save_index()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get_array(self, path: str, level: str, build) -> np.ndarray:
+        key = self.slide_key(path)
+        name = self._entry_name(key, level)
+        file_path = os.path.join(self.cache_dir, name)
+
+        if name not in self.index['entries']:
+            result = build()
+            tmp_path = file_path + '.tmp'
+            if isinstance(result, RegionReader):
+                self._write_reader(result, tmp_path)
+                result.close()
+            else:
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, result)
+            os.replace(tmp_path, file_path)
+
+            self.index['entries'][name] = {
+                'bytes': os.path.getsize(file_path),
+                'source': os.path.abspath(path),
+                'last_used': time.time()
+            }
+            self._evict(keep=name)
+        else:
+            self.index['entries'][name]['last_used'] = time.time()
+
+        self._save_index()
+        return np.load(file_path, mmap_mode='r')
+
+    def _decode_level(self, path: str, scale: float, resample: int) -> RegionReader:
+        """Reader producing the level, built from the cached full-resolution raster"""
+        if scale == 1.0:
+            return open_region_reader(path, max_memory_mb=self.max_memory_mb)
+
+        base = self.open_reader(path, 1.0)
+        pyramid = ImagePyramid(path, base, max_memory_mb=self.max_memory_mb, resample=resample)
+
+        # Derive from the closest cached level, like an in-memory pyramid would
+        for cached_scale in self._cached_scales(path, resample):
+            if cached_scale > scale:
+                pyramid.levels[cached_scale] = self.open_reader(path, cached_scale, resample)
+
+        return pyramid.get_level(scale)
+
+    def _cached_scales(self, path: str, resample: int):
+        prefix = self.slide_key(path) + '_s'
+        suffix = '.npy' if resample == Image.LANCZOS else f"_r{int(resample)}.npy"
+        scales = []
+        for name in self.index['entries']:
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    scales.append(float(name[len(prefix):-len(suffix)]))
+                except ValueError:  # Level derived with another filter
+                    continue
+        return scales
+
+    @staticmethod
+    def _write_reader(reader: RegionReader, file_path: str):
+        """Stream a reader into a .npy memory map, one band at a time"""
+        width, height = reader.size
+        array = np.lib.format.open_memmap(
+            file_path, mode='w+', dtype=np.uint8, shape=(height, width, 3)
+        )
+        rows = reader.band_height
+        for y in range(0, height, rows):
+            array[y:y + rows] = reader.read_region(0, y, width, min(rows, height - y))
+        array.flush()
+        del array
+
+    def _evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits its budget"""
+        entries = sorted(self.index['entries'].items(), key=lambda item: item[1]['last_used'])
+        total = self.total_bytes
+        for name, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            if self._remove(name):
+                total -= entry['bytes']
+        self._prune_fingerprints()
+
+    def _remove(self, name: str) -> bool:
+        """Delete a cached array; False if it is still in use and stays in the index"""
+        # Open memory maps stay valid after unlink on POSIX; Windows refuses to
+        # delete mapped files, so the entry is retried on a later eviction
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        self.index['entries'].pop(name, None)
+        return True
+
+    def _prune_fingerprints(self):
+        """Forget file hashes whose slides have no cached arrays left"""
+        live_keys = {name.split('_', 1)[0] for name in self.index['entries']}
+        self.index['fingerprints'] = {
+            fingerprint: key for fingerprint, key in self.index['fingerprints'].items()
+            if key in live_keys
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self.index['entries']),
+            'total_mb': self.total_bytes / 1024 ** 2,
+            'max_mb': self.max_bytes / 1024 ** 2
+        }
@@ -0,0 +1,767 @@
+# 📂 Slide I/O Module
+# Windowed region readers for gigapixel images with a bounded memory footprint
+
+import threading
+import numpy as np
+from PIL import Image, ImageFile
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+try:
+    import tifffile
+    TIFFFILE_AVAILABLE = True
+except ImportError:
+    TIFFFILE_AVAILABLE = False
+
+
+# Bytes per pixel for raw decoder layouts whose rows can be addressed directly
+RAW_MODE_BYTES = {
+    'L': 1,
+    'RGB': 3,
+    'BGR': 3,
+    'RGBX': 4,
+    'RGBA': 4,
+    'BGRX': 4,
+    'BGRA': 4,
+    'RGBa': 4
+}
+
+
+class RegionReader:
+    """
+    Random-access reader for rectangular regions of a slide.
+
+    Subclasses decode only what is needed for the requested window,
+    so callers can walk gigapixel images without materialising them.
+    """
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Slide size as (width, height)"""
+        raise NotImplementedError
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """
+        Read a region of the slide.
+
+        Returns:
+            (height, width, 3) uint8 RGB array
+        """
+        raise NotImplementedError
+
+    @property
+    def band_height(self) -> int:
+        """Rows read at once when scanning the whole slide"""
+        return min(self.size[1], 256)
+
+    def get_thumbnail(self, max_size: int = 1024) -> np.ndarray:
+        """
+        Low-resolution RGB overview of the slide.
+
+        The slide is scanned band by band and box-reduced by an integer
+        factor, so memory stays within one band plus the thumbnail.
+
+        Returns:
+            (ceil(H / f), ceil(W / f), 3) uint8 array with f = thumbnail_factor(max_size)
+        """
+        width, height = self.size
+        factor = self.thumbnail_factor(max_size)
+        rows = max(factor, (self.band_height // factor) * factor)
+
+        bands = []
+        for y in range(0, height, rows):
+            band = self.read_region(0, y, width, min(rows, height - y))
+            bands.append(np.asarray(Image.fromarray(band).reduce(factor)))
+
+        return np.concatenate(bands, axis=0)
+
+    def thumbnail_factor(self, max_size: int) -> int:
+        """Integer downsampling factor so the longest side fits max_size"""
+        return max(1, int(np.ceil(max(self.size) / max_size)))
+
+    def close(self):
+        """Release decoded data and file handles"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PILRegionReader(RegionReader):
+    """
+    Row-band reader for any image PIL can open.
+
+    Features:
+    - Holds a single decoded row band, sized by a configurable memory ceiling
+    - Strip/tile organised files (TIFF, BMP, raw formats) decode only the
+      strips that intersect the band
+    - Monolithic formats (JPEG, PNG) are decoded once by PIL and cropped
+      band by band, never copied to a full-image numpy array
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Image.Image],
+        max_memory_mb: float = 512,
+        min_band_height: int = 0,
+        frame: int = 0
+    ):
+        """
+        Args:
+            source: Image path or an already opened PIL image
+            max_memory_mb: Memory ceiling for the cached row band
+            min_band_height: Minimum rows decoded per band
+            frame: Page of a multi-page file (e.g. a TIFF pyramid level)
+        """
+        self.frame = frame
+        if isinstance(source, Image.Image):
+            self.path = getattr(source, 'filename', None) or None
+            self._image = source
+        else:
+            self.path = source
+            self._image = self._open_frame()
+
+        self.max_memory_mb = max_memory_mb
+        self.min_band_height = min_band_height
+
+        self._band = None
+        self._band_y0 = 0
+        self._band_y1 = 0
+
+        # Banded decoding needs a file we can reopen and a tile layout we understand
+        self._banded = (
+            self.path is not None
+            and isinstance(self._image, ImageFile.ImageFile)
+            and self._image.tile is not None
+            and self._band_tiles(0, 1) is not None
+        )
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self._image.size
+
+    @property
+    def band_height(self) -> int:
+        """Number of rows decoded per band under the memory ceiling"""
+        width, height = self.size
+        budget_rows = int(self.max_memory_mb * 1024 * 1024) // max(width * 3, 1)
+        return max(1, min(height, max(budget_rows, self.min_band_height)))
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        img_width, img_height = self.size
+        x_end = min(x + width, img_width)
+        y_end = min(y + height, img_height)
+
+        if self._band is None or y < self._band_y0 or y_end > self._band_y1:
+            self._load_band(y, y_end)
+
+        band_y = y - self._band_y0
+        return self._band[band_y:band_y + (y_end - y), x:x_end].copy()
+
+    def get_thumbnail(self, max_size: int = 1024) -> np.ndarray:
+        if self._banded:
+            return super().get_thumbnail(max_size)
+
+        # Monolithic sources: let the decoder downscale (JPEG DCT scaling)
+        width, height = self.size
+        factor = self.thumbnail_factor(max_size)
+        target = (-(-width // factor), -(-height // factor))
+
+        img = self._open_frame() if self.path else self._image
+        img.draft('RGB', target)
+        thumbnail = img.convert('RGB').resize(target, Image.BOX)
+        if img is not self._image:
+            img.close()
+
+        return np.asarray(thumbnail)
+
+    def close(self):
+        self._band = None
+        if self._image is not None and self.path is not None:
+            self._image.close()
+
+    def _load_band(self, y0: int, y1: int):
+        """Decode rows [y0, y1) plus as many following rows as the budget allows"""
+        img_height = self.size[1]
+        band_rows = max(self.band_height, y1 - y0)
+        y1 = min(img_height, y0 + band_rows)
+
+        # Drop the previous band before decoding the next one
+        self._band = None
+        self._band = self._decode_rows(y0, y1)
+        self._band_y0, self._band_y1 = y0, y1
+
+    def _decode_rows(self, y0: int, y1: int) -> np.ndarray:
+        """Decode full-width rows [y0, y1) as an RGB array"""
+        if self._banded:
+            img = self._open_frame()
+            tiles, top, bottom = self._band_tiles(y0, y1)
+            img.tile = tiles
+            img._size = (img.size[0], bottom - top)
+            img.load()
+            band = self._to_rgb_array(img)[y0 - top:y1 - top]
+            img.close()
+            return band
+
+        width = self.size[0]
+        return self._to_rgb_array(self._image.crop((0, y0, width, y1)))
+
+    def _open_frame(self) -> Image.Image:
+        img = Image.open(self.path)
+        if self.frame:
+            img.seek(self.frame)
+        return img
+
+    def _band_tiles(self, y0: int, y1: int):
+        """
+        Build a decoder tile list covering rows [y0, y1).
+
+        Returns:
+            (tiles, top, bottom) with extents shifted to the band origin,
+            or None if the file layout cannot be decoded in bands
+        """
+        tiles = self._image.tile
+        if not tiles or any(tile[0] == 'libtiff' for tile in tiles):
+            return None
+
+        if len(tiles) > 1:
+            # Strip/tile organised: keep the tiles that intersect the band
+            selected = [t for t in tiles if t[1][1] < y1 and t[1][3] > y0]
+            if not selected:
+                return None
+            top = min(t[1][1] for t in selected)
+            bottom = max(t[1][3] for t in selected)
+            shifted = [
+                _replace_tile(t, (t[1][0], t[1][1] - top, t[1][2], t[1][3] - top), t[2], t[3])
+                for t in selected
+            ]
+            return shifted, top, bottom
+
+        # Single raw tile: rows are addressable by offset
+        codec, extents, offset, args = tiles[0][:4]
+        if codec != 'raw' or not isinstance(args, tuple) or len(args) < 3:
+            return None
+        rawmode, stride, orientation = args[:3]
+        if rawmode not in RAW_MODE_BYTES or orientation not in (1, -1):
+            return None
+
+        x0, top, x1, bottom = extents
+        stride = stride or (x1 - x0) * RAW_MODE_BYTES[rawmode]
+        if orientation == 1:
+            band_offset = offset + (y0 - top) * stride
+        else:
+            # Bottom-up files store the last row first
+            band_offset = offset + (bottom - y1) * stride
+
+        band_tile = _replace_tile(
+            tiles[0], (x0, 0, x1, y1 - y0), band_offset, (rawmode, stride, orientation)
+        )
+        return [band_tile], y0, y1
+
+    @staticmethod
+    def _to_rgb_array(img: Image.Image) -> np.ndarray:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return np.asarray(img)
+
+
+class ArrayRegionReader(RegionReader):
+    """
+    Region reader over an already decoded (H, W, 3) array.
+    Used for derived pyramid levels; regions are sliced without decoding.
+    With copy=False regions are returned as views (e.g. into a memory map).
+    """
+
+    def __init__(self, array: np.ndarray, copy: bool = True):
+        self.array = array
+        self.copy = copy
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.array.shape[1], self.array.shape[0]
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        region = self.array[y:y + height, x:x + width]
+        return region.copy() if self.copy else region
+
+    def close(self):
+        self.array = None
+
+
+class TiffSlideReader(RegionReader):
+    """
+    Native-tile reader for tiled (Big)TIFF slides, based on tifffile.
+
+    Features:
+    - Decodes only the tiles a region touches, straight from their file offsets
+    - Keeps decoded tiles in an LRU cache bounded by tile_cache_mb, so
+      overlapping patches and neighbouring crops reuse tiles
+    - Exposes the stored pyramid levels (SubIFDs / reduced pages) as
+      readers sharing the same file handle and tile cache
+    """
+
+    def __init__(
+        self,
+        path: str,
+        level: int = 0,
+        tile_cache_mb: float = 256,
+        _shared: Optional[dict] = None
+    ):
+        """
+        Args:
+            path: Path to a tiled TIFF
+            level: Pyramid level (0 = full resolution)
+            tile_cache_mb: Budget for decoded tiles (shared by all levels)
+        """
+        if not TIFFFILE_AVAILABLE:
+            raise ImportError("tifffile is required for TiffSlideReader")
+
+        if _shared is None:
+            tif = tifffile.TiffFile(path)
+            _shared = {
+                'tif': tif,
+                'levels': [lvl.keyframe for lvl in tif.series[0].levels],
+                'cache': OrderedDict(),
+                'cache_bytes': 0,
+                'max_bytes': int(tile_cache_mb * 1024 * 1024),
+                'lock': threading.Lock(),     # Tile cache
+                'io_lock': threading.Lock(),  # Shared file handle (seek + read)
+                'refs': 0
+            }
+        _shared['refs'] += 1
+        self._shared = _shared
+        self.path = path
+        self.level = level
+
+        page = _shared['levels'][level]
+        if page.dtype != np.uint8 or page.samplesperpixel not in (1, 3, 4) or page.planarconfig != 1:
+            raise ValueError(
+                f"Unsupported TIFF layout: dtype={page.dtype}, "
+                f"samples={page.samplesperpixel}, planarconfig={page.planarconfig}"
+            )
+
+        self._page = page
+        self._width = page.imagewidth
+        self._height = page.imagelength
+        # Strips are handled as full-width tiles
+        self.tile_width = page.tilewidth or page.imagewidth
+        self.tile_height = page.tilelength or page.rowsperstrip or page.imagelength
+        self._tiles_across = -(-self._width // self.tile_width)
+
+    @staticmethod
+    def is_tiled_tiff(path: str) -> bool:
+        """True if path is a TIFF whose first page is tiled"""
+        if not TIFFFILE_AVAILABLE:
+            return False
+        try:
+            with tifffile.TiffFile(path) as tif:
+                return tif.pages[0].is_tiled
+        except Exception:
+            return False
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self._width, self._height
+
+    @property
+    def band_height(self) -> int:
+        rows = self.tile_height * max(1, 1024 // self.tile_height)
+        return min(self._height, rows)
+
+    @property
+    def level_dimensions(self) -> List[Tuple[int, int]]:
+        """(width, height) of every stored pyramid level"""
+        return [(page.imagewidth, page.imagelength) for page in self._shared['levels']]
+
+    def open_level(self, level: int) -> 'TiffSlideReader':
+        """Reader for another stored level, sharing the file and tile cache"""
+        return TiffSlideReader(self.path, level=level, _shared=self._shared)
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        x_end = min(x + width, self._width)
+        y_end = min(y + height, self._height)
+        region = np.empty((max(y_end - y, 0), max(x_end - x, 0), 3), dtype=np.uint8)
+        tw, th = self.tile_width, self.tile_height
+
+        for ty in range(y // th, (y_end - 1) // th + 1):
+            for tx in range(x // tw, (x_end - 1) // tw + 1):
+                tile = self._get_tile(ty * self._tiles_across + tx)
+
+                # Intersection of the tile with the region, in image coordinates
+                x0, x1 = max(x, tx * tw), min(x_end, (tx + 1) * tw)
+                y0, y1 = max(y, ty * th), min(y_end, (ty + 1) * th)
+                region[y0 - y:y1 - y, x0 - x:x1 - x] = \
+                    tile[y0 - ty * th:y1 - ty * th, x0 - tx * tw:x1 - tx * tw]
+
+        return region
+
+    def get_thumbnail(self, max_size: int = 1024) -> np.ndarray:
+        """Overview from the smallest stored level that still covers max_size"""
+        candidates = [
+            level for level, (w, h) in enumerate(self.level_dimensions)
+            if level >= self.level and max(w, h) >= max_size
+        ]
+        level = max(candidates) if candidates else self.level
+        if level == self.level:
+            return RegionReader.get_thumbnail(self, max_size)
+
+        reader = self.open_level(level)
+        thumbnail = RegionReader.get_thumbnail(reader, max_size)
+        reader.close()
+        return thumbnail
+
+    def _get_tile(self, index: int) -> np.ndarray:
+        """Decoded (tile_height, tile_width, 3) tile, through the LRU cache"""
+        shared = self._shared
+        key = (self.level, index)
+
+        with shared['lock']:
+            tile = shared['cache'].get(key)
+            if tile is not None:
+                shared['cache'].move_to_end(key)
+                return tile
+
+        # Decode outside the cache lock so threads decode in parallel; a tile
+        # raced by two threads is just decoded twice
+        tile = self._decode_tile(index)
+
+        with shared['lock']:
+            previous = shared['cache'].pop(key, None)
+            if previous is not None:
+                shared['cache_bytes'] -= previous.nbytes
+            shared['cache'][key] = tile
+            shared['cache_bytes'] += tile.nbytes
+            while shared['cache_bytes'] > shared['max_bytes'] and len(shared['cache']) > 1:
+                _, evicted = shared['cache'].popitem(last=False)
+                shared['cache_bytes'] -= evicted.nbytes
+
+        return tile
+
+    def _decode_tile(self, index: int) -> np.ndarray:
+        page = self._page
+        offset, bytecount = page.dataoffsets[index], page.databytecounts[index]
+
+        if bytecount == 0:
+            # Sparse file: missing tiles are background
+            return np.full((self.tile_height, self.tile_width, 3), 255, dtype=np.uint8)
+
+        fh = self._shared['tif'].filehandle
+        with self._shared['io_lock']:
+            fh.seek(offset)
+            data = fh.read(bytecount)
+        segment, _, _ = page.decode(data, index, jpegtables=page.jpegtables)
+
+        # (depth, rows, cols, samples) -> (rows, cols, samples); last strips may be short
+        segment = segment.reshape(segment.shape[-3:])
+        if segment.shape[2] == 1:
+            segment = np.repeat(segment, 3, axis=2)
+        elif segment.shape[2] == 4:
+            segment = segment[:, :, :3]
+
+        tile = np.full((self.tile_height, self.tile_width, 3), 255, dtype=np.uint8)
+        tile[:segment.shape[0], :segment.shape[1]] = segment
+        return tile
+
+    def tile_cache_info(self) -> dict:
+        shared = self._shared
+        return {
+            'tiles': len(shared['cache']),
+            'mb': shared['cache_bytes'] / 1024 ** 2,
+            'max_mb': shared['max_bytes'] / 1024 ** 2
+        }
+
+    def close(self):
+        if self._shared is None:
+            return
+        self._shared['refs'] -= 1
+        if self._shared['refs'] == 0:
+            self._shared['cache'].clear()
+            self._shared['tif'].close()
+        self._shared = None
+
+
+class ResampledRegionReader(RegionReader):
+    """
+    Lazily resampled view of another reader at a non-integer scale.
+
+    Each region is resized from the matching source window plus a margin
+    for the filter support, using PIL's box resize, so results match a
+    resize of the whole source image (to within one grey level) without
+    ever materialising it.
+    """
+
+    def __init__(
+        self,
+        source: RegionReader,
+        target: Tuple[int, int],
+        resample: int = Image.LANCZOS,
+        ratio: Optional[float] = None
+    ):
+        """
+        Args:
+            source: Reader to resample
+            target: Output (width, height)
+            resample: PIL filter
+            ratio: Exact source/output pixel ratio; defaults to the ratio of the
+                sizes, which drifts when the target size was rounded
+        """
+        self.source = source
+        self.target = target
+        self.resample = resample
+        source_width, source_height = source.size
+        self.scale_x = ratio or source_width / target[0]
+        self.scale_y = ratio or source_height / target[1]
+        # LANCZOS has the widest support (3 source pixels per output pixel)
+        self.margin_x = int(np.ceil(3 * self.scale_x)) + 2
+        self.margin_y = int(np.ceil(3 * self.scale_y)) + 2
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.target
+
+    @property
+    def band_height(self) -> int:
+        return min(self.target[1], max(1, int(self.source.band_height / self.scale_y)))
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        source_width, source_height = self.source.size
+
+        # Exact source box of the region, widened by the filter margin
+        box_x0, box_x1 = x * self.scale_x, (x + width) * self.scale_x
+        box_y0, box_y1 = y * self.scale_y, (y + height) * self.scale_y
+        left = max(0, int(np.floor(box_x0)) - self.margin_x)
+        top = max(0, int(np.floor(box_y0)) - self.margin_y)
+        right = min(source_width, int(np.ceil(box_x1)) + self.margin_x)
+        bottom = min(source_height, int(np.ceil(box_y1)) + self.margin_y)
+
+        # Boxes past the source edge (from rounding) are clamped by the filter
+        box_x1 = min(box_x1, source_width)
+        box_y1 = min(box_y1, source_height)
+
+        window = Image.fromarray(self.source.read_region(left, top, right - left, bottom - top))
+        region = window.resize(
+            (width, height), self.resample,
+            box=(box_x0 - left, box_y0 - top, box_x1 - left, box_y1 - top)
+        )
+        return np.asarray(region)
+
+    def close(self):
+        self.source = None
+
+
+class ReducedRegionReader(RegionReader):
+    """
+    Lazily box-reduced view of another reader at an integer factor.
+
+    Each region is reduced from the factor-aligned source window, so
+    results equal a reduce() of the whole source image without ever
+    materialising the level.
+    """
+
+    def __init__(self, source: RegionReader, factor: int, target: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            source: Reader to reduce
+            factor: Integer downsampling factor
+            target: Output (width, height), at most ceil(source / factor)
+        """
+        self.source = source
+        self.factor = factor
+        source_width, source_height = source.size
+        self.target = target or (-(-source_width // factor), -(-source_height // factor))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.target
+
+    @property
+    def band_height(self) -> int:
+        return min(self.target[1], max(1, self.source.band_height // self.factor))
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        f = self.factor
+        source_width, source_height = self.source.size
+        x_end = min(x + width, self.target[0])
+        y_end = min(y + height, self.target[1])
+
+        left, top = x * f, y * f
+        window = self.source.read_region(
+            left, top, min(x_end * f, source_width) - left, min(y_end * f, source_height) - top
+        )
+        return np.asarray(Image.fromarray(window).reduce(f))[:y_end - y, :x_end - x]
+
+    def close(self):
+        self.source = None
+
+
+class ImagePyramid:
+    """
+    Downsample chain for multi-scale tiling.
+
+    Levels are produced as cheaply as the source allows:
+    - Pyramidal (multi-page) TIFFs: matching pages are read directly
+    - JPEG: decoded at reduced size via PIL draft (DCT scaling)
+    - Otherwise: derived from the closest larger level already built,
+      lazily, region by region: box-reduced when the ratio is an integer,
+      resampled otherwise
+    """
+
+    def __init__(
+        self,
+        path: str,
+        base_reader: RegionReader,
+        max_memory_mb: float = 512,
+        min_band_height: int = 0,
+        resample: int = Image.LANCZOS
+    ):
+        """
+        Args:
+            path: Source slide
+            base_reader: Full-resolution reader
+            max_memory_mb: Memory ceiling for readers of stored levels
+            min_band_height: Minimum rows decoded per band
+            resample: PIL filter for non-integer scale ratios
+        """
+        self.path = path
+        self.base_reader = base_reader
+        self.max_memory_mb = max_memory_mb
+        self.min_band_height = min_band_height
+        self.resample = resample
+        self.levels = {1.0: base_reader}
+
+        if isinstance(base_reader, TiffSlideReader):
+            self.format = 'TIFF'
+            self.page_sizes = base_reader.level_dimensions
+        else:
+            with Image.open(path) as img:
+                self.format = img.format
+                self.page_sizes = []
+                for frame in range(getattr(img, 'n_frames', 1)):
+                    img.seek(frame)
+                    self.page_sizes.append(img.size)
+
+    def level_size(self, scale: float) -> Tuple[int, int]:
+        width, height = self.base_reader.size
+        return int(width * scale), int(height * scale)
+
+    def get_level(self, scale: float) -> RegionReader:
+        """Region reader for the level at the given scale"""
+        if scale in self.levels:
+            return self.levels[scale]
+
+        target = self.level_size(scale)
+
+        if target in self.page_sizes[1:] and isinstance(self.base_reader, TiffSlideReader):
+            # Stored pyramid level, read tile by tile
+            level = self.base_reader.open_level(self.page_sizes.index(target, 1))
+        elif target in self.page_sizes[1:]:
+            # Stored pyramid level
+            level = PILRegionReader(
+                self.path,
+                max_memory_mb=self.max_memory_mb,
+                min_band_height=self.min_band_height,
+                frame=self.page_sizes.index(target, 1)
+            )
+        elif self.format == 'JPEG' and scale <= 0.5:
+            # Reduced-size decode straight from the compressed stream
+            with Image.open(self.path) as img:
+                img.draft('RGB', target)
+                draft = img.convert('RGB')
+            reduction = round(self.base_reader.size[0] / draft.size[0])
+            if _fits(draft.size, target):
+                level = ArrayRegionReader(np.asarray(draft.crop((0, 0) + target)))
+            else:
+                # Finish the reduction from the DCT-scaled image
+                level = ResampledRegionReader(
+                    ArrayRegionReader(np.asarray(draft)), target, self.resample,
+                    ratio=1 / (scale * reduction)
+                )
+        else:
+            level = self._derive_level(scale, target)
+
+        self.levels[scale] = level
+        return level
+
+    def _derive_level(self, scale: float, target: Tuple[int, int]) -> RegionReader:
+        """Build a level from the closest larger level already available"""
+        larger = [s for s in self.levels if s > scale]
+        source_scale = min(larger) if larger else 1.0
+        source = self.levels[source_scale]
+        ratio = source_scale / scale
+        factor = int(round(ratio))
+
+        if factor > 1 and abs(ratio - factor) < 1e-6:
+            # Integer ratio: box-reduce the matching source window on every read
+            return ReducedRegionReader(source, factor, target)
+
+        return ResampledRegionReader(source, target, self.resample, ratio=ratio)
+
+    def close(self):
+        for scale, level in self.levels.items():
+            if level is not self.base_reader:
+                level.close()
+        self.levels = {1.0: self.base_reader}
+
+
+def _fits(size: Tuple[int, int], target: Tuple[int, int]) -> bool:
+    """True if size only exceeds target by rounding slack (at most one pixel)"""
+    return size[0] - target[0] in (0, 1) and size[1] - target[1] in (0, 1)
+
+
+def _replace_tile(tile, extents, offset, args):
+    """Copy a PIL tile descriptor with new extents, offset and args"""
+    if hasattr(tile, '_replace'):  # Pillow >= 11 uses a named tuple
+        return tile._replace(extents=extents, offset=offset, args=args)
+    return (tile[0], extents, offset, args)
+
+
+def open_region_reader(
+    source: Union[str, Image.Image],
+    max_memory_mb: float = 512,
+    min_band_height: int = 0
+) -> RegionReader:
+    """
+    Open the most suitable region reader for a slide.
+
+    Tiled TIFFs are read tile by tile through tifffile (when installed);
+    everything else goes through PIL in row bands.
+    """
+    if isinstance(source, str) and TiffSlideReader.is_tiled_tiff(source):
+        try:
+            reader = TiffSlideReader(source, tile_cache_mb=max_memory_mb)
+            reader.read_region(0, 0, 1, 1)  # Fail early on codecs tifffile cannot decode
+            return reader
+        except Exception as e:
+            print(f"⚠️  Tile reader unavailable for {source} ({e}), using PIL")
+
+    return PILRegionReader(
+        source,
+        max_memory_mb=max_memory_mb,
+        min_band_height=min_band_height
+    )
+
+
+def estimate_band_memory_mb(image_width: int, band_height: int) -> float:
+    """Memory used by one decoded RGB row band, in MB"""
+    return image_width * band_height * 3 / (1024 * 1024)
+
+
+if __name__ == "__main__":
+    import sys
+
+    print("📂 Slide I/O Module")
+    print("=" * 70)
+
+    if len(sys.argv) > 1:
+        with open_region_reader(sys.argv[1], max_memory_mb=64) as reader:
+            width, height = reader.size
+            print(f"   Slide size: {width}x{height} pixels")
+            print(f"   Band height: {reader.band_height} rows "
+                  f"({estimate_band_memory_mb(width, reader.band_height):.1f} MB)")
+            region = reader.read_region(0, 0, min(width, 224), min(height, 224))
+            print(f"   First region: {region.shape}")
+    else:
+        print("ℹ️  Pass an image path to inspect it. Module ready for use.")
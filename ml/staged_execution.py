@@ -0,0 +1,353 @@
+# ⚙️ Staged Execution Module
+# Producer/consumer execution: tiling → preprocessing → inference → aggregation
+
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+
+class QueueStats:
+    """
+    Depth and wait-time statistics for one bounded queue.
+
+    A queue that is usually full means its consumer is the bottleneck;
+    one that is usually empty means its producer is.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.depth_samples = []
+        self.put_wait = 0.0  # Producers blocked on a full queue
+        self.get_wait = 0.0  # Consumers blocked on an empty queue
+        self._lock = threading.Lock()
+
+    def record_put(self, depth: int, waited: float):
+        with self._lock:
+            self.depth_samples.append(depth)
+            self.put_wait += waited
+
+    def record_get(self, waited: float):
+        with self._lock:
+            self.get_wait += waited
+
+    def summary(self) -> Dict:
+        depths = self.depth_samples or [0]
+        return {
+            'maxsize': self.maxsize,
+            'items': len(self.depth_samples),
+            'mean_depth': float(np.mean(depths)),
+            'max_depth': int(np.max(depths)),
+            'full_fraction': float(np.mean([d >= self.maxsize for d in depths])),
+            'put_wait_s': self.put_wait,
+            'get_wait_s': self.get_wait
+        }
+
+
+class _StageQueue:
+    """Bounded queue that records stats and gives up when the run is aborted"""
+
+    def __init__(self, name: str, maxsize: int, abort: threading.Event):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.stats = QueueStats(name, maxsize)
+        self.abort = abort
+
+    def put(self, item):
+        start = time.perf_counter()
+        while not self.abort.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                self.stats.record_put(self.queue.qsize(), time.perf_counter() - start)
+                return
+            except queue.Full:
+                continue
+
+    def get(self):
+        start = time.perf_counter()
+        while not self.abort.is_set():
+            try:
+                item = self.queue.get(timeout=0.1)
+                self.stats.record_get(time.perf_counter() - start)
+                return item
+            except queue.Empty:
+                continue
+        return _DONE
+
+
+class StagedPatchExecutor:
+    """
+    Run patch classification as a pipeline of concurrent stages.
+
+    Stages:
+    1. Producers: iterate the tiler (decode + tissue check) and form batches;
+       run_sources decodes with one producer thread per source
+    2. Preprocess workers: convert patch batches to input tensors
+       (threads, or a process pool when use_processes=True)
+    3. Inference: a single consumer feeding the classifier
+    4. Aggregation: consumes predictions in tiling order
+
+    Stages are connected by bounded queues, so memory stays flat and
+    per-queue statistics show which stage limits throughput.
+    """
+
+    def __init__(
+        self,
+        preprocess_fn: Callable,
+        infer_fn: Callable,
+        num_workers: int = 2,
+        queue_size: int = 8,
+        batch_size: int = 32,
+        use_processes: bool = False
+    ):
+        """
+        Args:
+            preprocess_fn: patches -> input tensor (must be picklable for processes)
+            infer_fn: input tensor -> predictions (e.g. PatchPredictions)
+            num_workers: Number of preprocessing workers
+            queue_size: Capacity (in batches) of each inter-stage queue
+            batch_size: Patches per batch
+            use_processes: Preprocess in worker processes instead of threads
+        """
+        self.preprocess_fn = preprocess_fn
+        self.infer_fn = infer_fn
+        self.num_workers = max(1, num_workers)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = batch_size
+        self.use_processes = use_processes
+
+    def run(
+        self,
+        patch_iter: Iterable[Tuple[np.ndarray, object]],
+        on_predictions: Callable[[List[Dict], List[object]], None]
+    ) -> Dict:
+        """
+        Process all patches from patch_iter.
+
+        Args:
+            patch_iter: Yields (patch, info) tuples, e.g. GigapixelTiler.extract_patches
+            on_predictions: Called with (predictions, infos) per batch, in tiling order
+
+        Returns:
+            Per-stage timing and queue statistics
+        """
+        def batch_iter():
+            patches, infos = [], []
+            for patch, info in patch_iter:
+                patches.append(patch)
+                infos.append(info)
+                if len(patches) >= self.batch_size:
+                    yield patches, infos
+                    patches, infos = [], []
+            if patches:
+                yield patches, infos
+
+        return self.run_batches(batch_iter(), on_predictions)
+
+    def run_batches(
+        self,
+        batch_iter: Iterable[Tuple[object, object]],
+        on_predictions: Callable[[List[Dict], object], None]
+    ) -> Dict:
+        """
+        Process pre-formed batches, e.g. from GigapixelTiler.iter_plan_batches.
+
+        Args:
+            batch_iter: Yields (patches, meta) per batch
+            on_predictions: Called with (predictions, meta) per batch, in tiling order
+
+        Returns:
+            Per-stage timing and queue statistics
+        """
+        def numbered():
+            for seq, (patches, meta) in enumerate(batch_iter):
+                yield seq, patches, meta
+
+        return self.run_sources([numbered()], on_predictions)
+
+    def run_sources(
+        self,
+        sources: Sequence[Iterable[Tuple[int, object, object]]],
+        on_predictions: Callable[[List[Dict], object], None]
+    ) -> Dict:
+        """
+        Process batches decoded concurrently, one producer thread per source.
+
+        Args:
+            sources: Iterables yielding (seq, patches, meta), e.g. from
+                GigapixelTiler.iter_plan_chunks; seq numbers the batches of all
+                sources 0..N-1 in tiling order. patches may be None for a batch
+                with nothing to classify (it still takes its seq).
+            on_predictions: Called with (predictions, meta) per non-empty
+                batch, in seq order
+
+        Returns:
+            Per-stage timing and queue statistics
+        """
+        sources = list(sources) or [()]
+        abort = threading.Event()
+        errors = []
+        busy = {'produce': 0.0, 'preprocess': 0.0, 'inference': 0.0, 'aggregate': 0.0}
+        busy_lock = threading.Lock()
+
+        tile_queue = _StageQueue('tiles', self.queue_size, abort)
+        tensor_queue = _StageQueue('tensors', self.queue_size, abort)
+        prediction_queue = _StageQueue('predictions', self.queue_size, abort)
+
+        pool = ProcessPoolExecutor(max_workers=self.num_workers) if self.use_processes else None
+
+        def add_busy(stage, seconds):
+            with busy_lock:
+                busy[stage] += seconds
+
+        def guarded(stage_fn):
+            def wrapper():
+                try:
+                    stage_fn()
+                except BaseException as e:  # Surface worker failures in run()
+                    errors.append(e)
+                    abort.set()
+            return wrapper
+
+        producers_left = [len(sources)]
+
+        def produce(source):
+            start = time.perf_counter()
+            for seq, patches, infos in source:
+                if abort.is_set():
+                    return
+                add_busy('produce', time.perf_counter() - start)
+                tile_queue.put((seq, patches, infos))
+                start = time.perf_counter()
+
+            # The last producer to finish ends the stream for the workers
+            with busy_lock:
+                producers_left[0] -= 1
+                last = producers_left[0] == 0
+            if last:
+                for _ in range(self.num_workers):
+                    tile_queue.put(_DONE)
+
+        def preprocess():
+            while True:
+                item = tile_queue.get()
+                if item is _DONE:
+                    tensor_queue.put(_DONE)
+                    return
+                seq, patches, infos = item
+                if patches is None:
+                    tensor_queue.put(item)
+                    continue
+                start = time.perf_counter()
+                if pool is not None:
+                    tensor = pool.submit(self.preprocess_fn, patches).result()
+                else:
+                    tensor = self.preprocess_fn(patches)
+                add_busy('preprocess', time.perf_counter() - start)
+                tensor_queue.put((seq, tensor, infos))
+
+        def infer():
+            finished_workers = 0
+            while finished_workers < self.num_workers:
+                item = tensor_queue.get()
+                if item is _DONE:
+                    finished_workers += 1
+                    if abort.is_set():
+                        break
+                    continue
+                seq, tensor, infos = item
+                if tensor is None:
+                    prediction_queue.put(item)
+                    continue
+                start = time.perf_counter()
+                predictions = self.infer_fn(tensor)
+                add_busy('inference', time.perf_counter() - start)
+                prediction_queue.put((seq, predictions, infos))
+            prediction_queue.put(_DONE)
+
+        def aggregate():
+            # Workers may finish out of order: release batches by sequence number
+            pending = {}
+            next_seq = 0
+            while True:
+                item = prediction_queue.get()
+                if item is _DONE:
+                    break
+                seq, predictions, infos = item
+                pending[seq] = (predictions, infos)
+                while next_seq in pending:
+                    predictions, infos = pending.pop(next_seq)
+                    next_seq += 1
+                    if predictions is None:
+                        continue
+                    start = time.perf_counter()
+                    on_predictions(predictions, infos)
+                    add_busy('aggregate', time.perf_counter() - start)
+
+        start_time = time.perf_counter()
+        threads = [
+            threading.Thread(target=guarded(partial(produce, source)), name=f'tile-producer-{i}', daemon=True)
+            for i, source in enumerate(sources)
+        ]
+        threads += [
+            threading.Thread(target=guarded(preprocess), name=f'preprocess-{i}', daemon=True)
+            for i in range(self.num_workers)
+        ]
+        threads.append(threading.Thread(target=guarded(infer), name='inference', daemon=True))
+        threads.append(threading.Thread(target=guarded(aggregate), name='aggregation', daemon=True))
+
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            abort.set()
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start_time
+        # Decoding and preprocessing run on several workers: report wall-clock share per worker
+        busy['produce'] /= max(len(sources), 1)
+        busy['preprocess'] /= self.num_workers
+        bottleneck = max(busy, key=busy.get)
+
+        return {
+            'elapsed_s': elapsed,
+            'num_workers': self.num_workers,
+            'decode_workers': len(sources),
+            'worker_type': 'process' if self.use_processes else 'thread',
+            'stage_busy_s': busy,
+            'bottleneck_stage': bottleneck,
+            'queues': {
+                q.stats.name: q.stats.summary()
+                for q in (tile_queue, tensor_queue, prediction_queue)
+            }
+        }
+
+
+def format_stage_stats(stats: Dict) -> str:
+    """Human-readable summary of StagedPatchExecutor.run statistics"""
+    lines = [
+        f"   Stage timings ({stats['decode_workers']} decode, "
+        f"{stats['num_workers']} {stats['worker_type']} preprocess workers):"
+    ]
+    for stage, seconds in stats['stage_busy_s'].items():
+        marker = '  ← bottleneck' if stage == stats['bottleneck_stage'] else ''
+        lines.append(f"     {stage:<11} {seconds:7.2f}s{marker}")
+    lines.append("   Queue depths (mean/max of capacity, time full/empty):")
+    for name, q in stats['queues'].items():
+        lines.append(
+            f"     {name:<11} {q['mean_depth']:.1f}/{q['max_depth']} of {q['maxsize']}, "
+            f"put-wait {q['put_wait_s']:.2f}s, get-wait {q['get_wait_s']:.2f}s"
+        )
+    return "\n".join(lines)
@@ -4,10 +4,16 @@
 import numpy as np
 from PIL import Image
 import torch
-from typing import Tuple, List, Optional, Generator, Dict
+from typing import Tuple, List, Optional, Generator, Dict, Iterable
 from dataclasses import dataclass
 import os
 
+from .slide_io import open_region_reader, RegionReader, ImagePyramid
+from .slide_cache import DecodedSlideCache
+from .tissue import (
+    compute_tissue_mask, tissue_grid_from_mask, bright_fraction_grid, bright_fractions_at
+)
+
 
 @dataclass
 class PatchInfo:
@@ -21,6 +27,136 @@ class PatchInfo:
     is_tissue: bool = True  # Whether patch contains tissue (vs background)
 
 
+class TilingPlan:
+    """
+    Struct-of-arrays description of a whole tiling grid.
+    
+    One entry per grid cell, stored as contiguous NumPy arrays instead of
+    one PatchInfo object per patch:
+    - x, y: int32 top-left corner in original (level 0) coordinates
+    - level_x, level_y: int32 top-left corner in the scaled level
+    - level: int32 index into plan.scales
+    - scale: float32 magnification scale (plan.scales holds the exact values)
+    - patch_id: int32 grid cell id (unique within the plan)
+    - is_tissue: bool, False for cells pruned by the thumbnail tissue mask
+    
+    patch_size is the field of view in the scale's pixels; read_size is the
+    number of pixels actually read per patch (smaller in native-resolution
+    tiling, where patches come from a further downsampled level).
+    
+    Plans are indexed with ints, slices, boolean masks or index arrays
+    and always return another TilingPlan.
+    """
+    
+    FIELDS = ('x', 'y', 'level_x', 'level_y', 'level', 'scale', 'patch_id', 'is_tissue')
+    
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        level_x: np.ndarray,
+        level_y: np.ndarray,
+        level: np.ndarray,
+        scale: np.ndarray,
+        patch_id: np.ndarray,
+        is_tissue: np.ndarray,
+        patch_size: int,
+        image_size: Tuple[int, int],
+        scales: Tuple[float, ...] = (1.0,),
+        read_size: Optional[int] = None
+    ):
+        self.x = np.ascontiguousarray(x, dtype=np.int32)
+        self.y = np.ascontiguousarray(y, dtype=np.int32)
+        self.level_x = np.ascontiguousarray(level_x, dtype=np.int32)
+        self.level_y = np.ascontiguousarray(level_y, dtype=np.int32)
+        self.level = np.ascontiguousarray(level, dtype=np.int32)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float32)
+        self.patch_id = np.ascontiguousarray(patch_id, dtype=np.int32)
+        self.is_tissue = np.ascontiguousarray(is_tissue, dtype=bool)
+        self.patch_size = patch_size
+        self.image_size = image_size
+        self.scales = tuple(scales)
+        self.read_size = read_size or patch_size
+    
+    @classmethod
+    def empty(
+        cls,
+        patch_size: int,
+        image_size: Tuple[int, int],
+        scales: Tuple[float, ...] = (1.0,),
+        read_size: Optional[int] = None
+    ) -> 'TilingPlan':
+        arrays = [np.zeros(0) for _ in cls.FIELDS]
+        return cls(
+            *arrays,
+            patch_size=patch_size, image_size=image_size, scales=scales, read_size=read_size
+        )
+    
+    @classmethod
+    def concatenate(cls, plans: List['TilingPlan']) -> 'TilingPlan':
+        """Join plans that share patch size, image size and scales"""
+        first = plans[0]
+        arrays = [np.concatenate([getattr(p, f) for p in plans]) for f in cls.FIELDS]
+        return cls(
+            *arrays,
+            patch_size=first.patch_size, image_size=first.image_size,
+            scales=first.scales, read_size=first.read_size
+        )
+    
+    def __len__(self) -> int:
+        return len(self.x)
+    
+    def __getitem__(self, index) -> 'TilingPlan':
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1 if index != -1 else None)
+        arrays = [getattr(self, f)[index] for f in self.FIELDS]
+        return TilingPlan(
+            *arrays,
+            patch_size=self.patch_size, image_size=self.image_size,
+            scales=self.scales, read_size=self.read_size
+        )
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, f).nbytes for f in self.FIELDS)
+    
+    def read_scale(self, level: int) -> float:
+        """Scale of the pyramid level the patches of a level are read from"""
+        return self.scales[level] * self.read_size / self.patch_size
+    
+    def tissue(self) -> 'TilingPlan':
+        """Entries not pruned by the tissue mask"""
+        return self[self.is_tissue]
+    
+    def for_level(self, level: int) -> 'TilingPlan':
+        """Entries of one scale level"""
+        return self[self.level == level]
+    
+    def batches(self, batch_size: int) -> Generator['TilingPlan', None, None]:
+        """Consecutive slices of at most batch_size entries"""
+        for start in range(0, len(self), batch_size):
+            yield self[start:start + batch_size]
+    
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Patch centers in original coordinates"""
+        half = self.patch_size // 2
+        return self.x + half, self.y + half
+    
+    def to_patch_infos(self) -> List[PatchInfo]:
+        """PatchInfo objects for code that still expects them"""
+        return [
+            PatchInfo(
+                x=int(x), y=int(y),
+                width=self.patch_size, height=self.patch_size,
+                scale=float(scale), patch_id=int(patch_id),
+                is_tissue=bool(is_tissue)
+            )
+            for x, y, scale, patch_id, is_tissue in zip(
+                self.x, self.y, self.scale, self.patch_id, self.is_tissue
+            )
+        ]
+
+
 class GigapixelTiler:
     """
     Efficient tiling system for gigapixel histopathology images.
@@ -39,15 +175,69 @@ class GigapixelTiler:
         overlap: float = 0.25,
         scales: List[float] = [1.0, 0.5, 0.25],  # 40x, 20x, 10x equivalent
         tissue_threshold: float = 0.85,  # Skip patches with >85% white
-        min_tissue_area: float = 0.05  # Minimum 5% tissue required
+        min_tissue_area: float = 0.05,  # Minimum 5% tissue required
+        max_memory_mb: float = 512,  # Ceiling for decoded pixel data per scale
+        use_tissue_mask: bool = True,  # Prune grid with a thumbnail tissue mask
+        thumbnail_size: int = 2048,  # Longest side of the tissue-detection thumbnail
+        slide_cache: Optional[DecodedSlideCache] = None,  # Reuse decoded rasters across runs
+        output_size: Optional[int] = None  # Read patches at this size (e.g. model input)
     ):
         self.patch_size = patch_size
         self.overlap = overlap
         self.scales = scales
         self.tissue_threshold = tissue_threshold
         self.min_tissue_area = min_tissue_area
+        self.max_memory_mb = max_memory_mb
+        self.use_tissue_mask = use_tissue_mask
+        self.thumbnail_size = thumbnail_size
+        self.slide_cache = slide_cache
+        self.output_size = output_size
         self.stride = int(patch_size * (1 - overlap))
         
+    @property
+    def read_size(self) -> int:
+        """
+        Pixels read per patch side.
+        
+        With output_size set (native-resolution tiling), a patch_size field
+        of view is read from the pyramid level where it spans output_size
+        pixels, e.g. 224px of level 0 as 96px of the 96/224 level, so no
+        per-patch resize is needed before the classifier.
+        """
+        return self.output_size or self.patch_size
+    
+    def read_scale(self, scale: float) -> float:
+        """Pyramid level the patches of a nominal scale are read from"""
+        return scale * self.read_size / self.patch_size
+    
+    def open_reader(self, image_path: str) -> RegionReader:
+        """
+        Region reader for a slide: a zero-copy view of the decoded-slide
+        cache when one is configured, otherwise a windowed decoder.
+        """
+        if self.slide_cache is not None:
+            return self.slide_cache.open_reader(image_path)
+        
+        return open_region_reader(
+            image_path,
+            max_memory_mb=self.max_memory_mb,
+            min_band_height=self.patch_size
+        )
+    
+    def open_pyramid(self, image_path: str, reader: RegionReader):
+        """Pyramid levels for multi-scale tiling (cached when a slide cache is set)"""
+        # Native-resolution levels use the classifier's bilinear resize filter
+        resample = Image.BILINEAR if self.output_size else Image.LANCZOS
+        if self.slide_cache is not None:
+            return self.slide_cache.pyramid(image_path, resample=resample)
+        
+        return ImagePyramid(
+            image_path, reader,
+            max_memory_mb=self.max_memory_mb,
+            min_band_height=self.patch_size,
+            resample=resample
+        )
+    
     def is_tissue_patch(self, patch: np.ndarray) -> bool:
         """
         Determine if patch contains tissue (not just background).
@@ -65,6 +255,292 @@ class GigapixelTiler:
         # Check if enough dark/colored pixels (tissue)
         return bright_pixels < self.tissue_threshold
     
+    def compute_tissue_mask(self, reader: RegionReader) -> Optional[np.ndarray]:
+        """
+        Detect tissue once on a low-resolution thumbnail of the slide.
+        
+        Returns:
+            Boolean thumbnail mask, or None if masking is disabled
+        """
+        if not self.use_tissue_mask:
+            return None
+        
+        thumbnail = reader.get_thumbnail(self.thumbnail_size)
+        return compute_tissue_mask(thumbnail)
+    
+    def tissue_grid(
+        self,
+        tissue_mask: Optional[np.ndarray],
+        image_size: Tuple[int, int],
+        x_positions: range,
+        y_positions: range,
+        scale: float = 1.0,
+        patch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Boolean (rows, cols) grid of positions whose footprint touches tissue.
+        All positions are kept when no mask is available.
+        """
+        if tissue_mask is None:
+            return np.ones((len(y_positions), len(x_positions)), dtype=bool)
+        
+        return tissue_grid_from_mask(
+            tissue_mask, image_size, x_positions, y_positions,
+            patch_size or self.patch_size, scale
+        )
+    
+    def tissue_check_grid(
+        self,
+        strip: np.ndarray,
+        x_positions: range,
+        y_offsets: List[int]
+    ) -> np.ndarray:
+        """
+        Vectorized is_tissue_patch for every patch position in a strip.
+        
+        One integral image of the bright-pixel indicator is built per strip,
+        so each patch costs four lookups instead of a full-patch reduction.
+        Threshold semantics are identical to is_tissue_patch.
+        
+        Returns:
+            (len(y_offsets), len(x_positions)) boolean tissue grid
+        """
+        bright_fractions = bright_fraction_grid(strip, x_positions, y_offsets, self.patch_size)
+        return bright_fractions < self.tissue_threshold
+    
+    def tissue_check_at(
+        self,
+        strip: np.ndarray,
+        x_positions: np.ndarray,
+        y_offsets: np.ndarray,
+        patch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Vectorized is_tissue_patch for paired (x, y_offset) positions in a strip.
+        
+        Returns:
+            Boolean array, one entry per position
+        """
+        bright_fractions = bright_fractions_at(
+            strip, x_positions, y_offsets, patch_size or self.patch_size
+        )
+        return bright_fractions < self.tissue_threshold
+    
+    def build_tiling_plan(
+        self,
+        image_size: Tuple[int, int],
+        tissue_mask: Optional[np.ndarray] = None,
+        scales: Optional[List[float]] = None,
+        stride: Optional[int] = None
+    ) -> TilingPlan:
+        """
+        Lay out the sliding-window grid of every scale as a TilingPlan.
+        
+        No pixels are read: grid cells are flagged with the thumbnail tissue
+        mask only. Entries are row-major within each scale level.
+        
+        Args:
+            image_size: Full-resolution (width, height)
+            tissue_mask: Thumbnail tissue mask (None keeps every cell)
+            scales: Scales to plan (defaults to self.scales)
+            stride: Grid stride in scaled pixels (defaults to self.stride)
+            
+        Returns:
+            TilingPlan covering all scales
+        """
+        scales = self.scales if scales is None else scales
+        stride = stride or self.stride
+        img_width, img_height = image_size
+        
+        # Grid in the pixels of the level that is actually read
+        size = self.read_size
+        read_stride = max(1, int(round(stride * size / self.patch_size)))
+        
+        plans = []
+        next_id = 0
+        for level, scale in enumerate(scales):
+            read_scale = self.read_scale(scale)
+            
+            # Same rounding as ImagePyramid.level_size
+            scaled_width, scaled_height = int(img_width * read_scale), int(img_height * read_scale)
+            x_positions = range(0, scaled_width - size + 1, read_stride)
+            y_positions = range(0, scaled_height - size + 1, read_stride)
+            
+            grid = self.tissue_grid(
+                tissue_mask, image_size, x_positions, y_positions, read_scale, size
+            )
+            level_y, level_x = np.meshgrid(
+                np.asarray(y_positions, dtype=np.int64),
+                np.asarray(x_positions, dtype=np.int64),
+                indexing='ij'
+            )
+            count = level_x.size
+            
+            plans.append(TilingPlan(
+                x=_to_original(level_x.ravel(), read_scale),  # Original coordinates
+                y=_to_original(level_y.ravel(), read_scale),
+                level_x=level_x.ravel(),
+                level_y=level_y.ravel(),
+                level=np.full(count, level),
+                scale=np.full(count, scale),
+                patch_id=np.arange(next_id, next_id + count),
+                is_tissue=grid.ravel(),
+                patch_size=self.patch_size,
+                image_size=image_size,
+                scales=scales,
+                read_size=size
+            ))
+            next_id += count
+        
+        if not plans:
+            return TilingPlan.empty(self.patch_size, image_size, scales, size)
+        return TilingPlan.concatenate(plans)
+    
+    def create_tiling_plan(self, image_path: str) -> TilingPlan:
+        """
+        Compute the tiling plan of a slide up front.
+        
+        Only a thumbnail is decoded (for the tissue mask); the plan can then
+        be sliced into batches and read with iter_plan_batches.
+        """
+        with self.open_reader(image_path) as reader:
+            tissue_mask = self.compute_tissue_mask(reader)
+            return self.build_tiling_plan(reader.size, tissue_mask)
+    
+    def _iter_plan_patches(
+        self,
+        reader: RegionReader,
+        plan: TilingPlan
+    ) -> Generator[Tuple[int, Optional[np.ndarray]], None, None]:
+        """
+        Read the patches of a single-level plan, one strip of patch rows at a time.
+        
+        Yields:
+            (index into plan, patch) in row-major order; patch is None when
+            the pixel-level tissue check rejects it
+        """
+        if len(plan) == 0:
+            return
+        
+        size = plan.read_size
+        order = np.argsort(plan.level_y, kind='stable')
+        level_x = plan.level_x[order].astype(np.int64)
+        level_y = plan.level_y[order].astype(np.int64)
+        
+        # Keep the strip and its integral image well inside the band budget
+        strip_height = max(size, reader.band_height // 3)
+        
+        start = 0
+        while start < len(order):
+            top = level_y[start]
+            stop = np.searchsorted(level_y, top + strip_height - size, side='right')
+            stop = max(stop, start + 1)
+            
+            left = level_x[start:stop].min()
+            right = level_x[start:stop].max() + size
+            bottom = level_y[stop - 1] + size
+            strip = reader.read_region(int(left), int(top), int(right - left), int(bottom - top))
+            
+            xs = level_x[start:stop] - left
+            ys = level_y[start:stop] - top
+            tissue = self.tissue_check_at(strip, xs, ys, size)
+            
+            for i in range(stop - start):
+                if tissue[i]:
+                    patch = strip[ys[i]:ys[i] + size, xs[i]:xs[i] + size].copy()
+                    yield int(order[start + i]), patch
+                else:
+                    yield int(order[start + i]), None
+            start = stop
+    
+    def iter_plan_batches(
+        self,
+        image_path: str,
+        plan: TilingPlan,
+        batch_size: int = 32
+    ) -> Generator[Tuple[np.ndarray, TilingPlan], None, None]:
+        """
+        Read the tissue patches of a plan as stacked batches.
+        
+        Cells pruned by the tissue mask are never read, and patches failing
+        the pixel-level tissue check are dropped.
+        
+        Yields:
+            (patches, batch_plan): (B, P, P, 3) uint8 array and the matching
+            plan entries, in plan order
+        """
+        reader = self.open_reader(image_path)
+        pyramid = self.open_pyramid(image_path, reader)
+        
+        try:
+            candidates = plan.tissue()
+            for level in np.unique(candidates.level):
+                level_plan = candidates.for_level(level)
+                scale_reader = pyramid.get_level(plan.read_scale(level))
+                
+                patches, indices = [], []
+                for index, patch in self._iter_plan_patches(scale_reader, level_plan):
+                    if patch is None:
+                        continue
+                    patches.append(patch)
+                    indices.append(index)
+                    if len(patches) >= batch_size:
+                        yield np.stack(patches), level_plan[np.asarray(indices)]
+                        patches, indices = [], []
+                if patches:
+                    yield np.stack(patches), level_plan[np.asarray(indices)]
+        finally:
+            pyramid.close()
+            reader.close()
+    
+    @staticmethod
+    def plan_chunks(plan: TilingPlan, batch_size: int = 32) -> List[TilingPlan]:
+        """
+        Tissue entries of a plan as single-level chunks of at most batch_size,
+        in the order iter_plan_batches reads them.
+        """
+        candidates = plan.tissue()
+        return [
+            chunk
+            for level in np.unique(candidates.level)
+            for chunk in candidates.for_level(level).batches(batch_size)
+        ]
+    
+    def iter_plan_chunks(
+        self,
+        image_path: str,
+        chunks: Iterable[Tuple[int, TilingPlan]]
+    ) -> Generator[Tuple[int, Optional[np.ndarray], TilingPlan], None, None]:
+        """
+        Read numbered plan chunks (from plan_chunks) through a reader of their own.
+        
+        Several of these generators can run in parallel threads, one per
+        decode worker, each holding its own row band. Give every worker a
+        contiguous run of chunks so workers decode different bands.
+        
+        Yields:
+            (seq, patches, chunk_plan): the (B, P, P, 3) patches passing the
+            tissue check (None if there are none) and their plan entries
+        """
+        reader = self.open_reader(image_path)
+        pyramid = self.open_pyramid(image_path, reader)
+        
+        try:
+            for seq, chunk in chunks:
+                scale_reader = pyramid.get_level(chunk.read_scale(int(chunk.level[0])))
+                patches, indices = [], []
+                for index, patch in self._iter_plan_patches(scale_reader, chunk):
+                    if patch is not None:
+                        patches.append(patch)
+                        indices.append(index)
+                if patches:
+                    yield seq, np.stack(patches), chunk[np.asarray(indices)]
+                else:
+                    yield seq, None, chunk[np.zeros(0, dtype=np.int64)]
+        finally:
+            pyramid.close()
+            reader.close()
+    
     def extract_patches(
         self,
         image_path: str,
@@ -79,87 +555,92 @@ class GigapixelTiler:
         """
         print(f"🔲 Tiling image: {image_path}")
         
-        # Load image (use PIL for memory efficiency)
-        img = Image.open(image_path)
-        img_width, img_height = img.size
+        # Open a windowed reader: only the current row band is decoded
+        reader = self.open_reader(image_path)
+        img_width, img_height = reader.size
         
         print(f"   Image size: {img_width}x{img_height} pixels")
         print(f"   Patch size: {self.patch_size}x{self.patch_size}")
+        if self.output_size:
+            print(f"   Native resolution: read as {self.read_size}x{self.read_size}")
         print(f"   Overlap: {self.overlap*100:.0f}%")
         print(f"   Stride: {self.stride}px")
         
         patch_id = 0
         total_patches = 0
         tissue_patches = 0
+        pruned_patches = 0
+        
+        # Tissue mask from a thumbnail, shared by all scales
+        tissue_mask = self.compute_tissue_mask(reader)
+        
+        # Lower scales are derived from the previous level, not the full image
+        pyramid = self.open_pyramid(image_path, reader)
+        
+        # Whole grid as arrays; cells are only flagged, no pixels read yet
+        plan = self.build_tiling_plan((img_width, img_height), tissue_mask)
         
         # Multi-scale extraction
         for scale_idx, scale in enumerate(self.scales):
             print(f"\n📊 Processing scale {scale:.2f}x (Level {scale_idx})")
             
-            # Resize image for current scale
-            if scale != 1.0:
-                scaled_width = int(img_width * scale)
-                scaled_height = int(img_height * scale)
-                scaled_img = img.resize((scaled_width, scaled_height), Image.LANCZOS)
-            else:
-                scaled_img = img
-                scaled_width, scaled_height = img_width, img_height
-            
-            # Convert to numpy for processing
-            img_array = np.array(scaled_img)
-            
-            # Calculate grid
-            x_positions = range(0, scaled_width - self.patch_size + 1, self.stride)
-            y_positions = range(0, scaled_height - self.patch_size + 1, self.stride)
+            # Pyramid level for current scale (further reduced in native-resolution mode)
+            scale_reader = pyramid.get_level(self.read_scale(scale))
             
             scale_patches = 0
             
-            # Extract patches
-            for y in y_positions:
-                for x in x_positions:
-                    # Extract patch
-                    patch = img_array[y:y+self.patch_size, x:x+self.patch_size]
-                    
-                    # Skip if patch is incomplete
-                    if patch.shape[0] != self.patch_size or patch.shape[1] != self.patch_size:
-                        continue
+            # Only visit grid cells that intersect tissue
+            level_plan = plan.for_level(scale_idx)
+            candidates = level_plan.tissue()
+            total_patches += len(level_plan)
+            pruned_patches += len(level_plan) - len(candidates)
+            
+            # Extract patches (one strip of patch rows is decoded and checked at a time)
+            for index, patch in self._iter_plan_patches(scale_reader, candidates):
+                if patch is not None:
+                    tissue_patches += 1
+                    scale_patches += 1
+                    x = int(candidates.level_x[index])
+                    y = int(candidates.level_y[index])
                     
-                    # Check if tissue
-                    is_tissue = self.is_tissue_patch(patch)
+                    # Create metadata
+                    patch_info = PatchInfo(
+                        x=int(candidates.x[index]),  # Original coordinates
+                        y=int(candidates.y[index]),
+                        width=self.patch_size,
+                        height=self.patch_size,
+                        scale=scale,
+                        patch_id=patch_id,
+                        is_tissue=True
+                    )
                     
-                    if is_tissue:
-                        tissue_patches += 1
-                        scale_patches += 1
-                        
-                        # Create metadata
-                        patch_info = PatchInfo(
-                            x=int(x / scale),  # Original coordinates
-                            y=int(y / scale),
-                            width=self.patch_size,
-                            height=self.patch_size,
-                            scale=scale,
-                            patch_id=patch_id,
-                            is_tissue=True
-                        )
-                        
-                        # Save if requested
-                        if save_patches and output_dir:
-                            os.makedirs(output_dir, exist_ok=True)
-                            patch_img = Image.fromarray(patch)
-                            patch_filename = f"patch_{patch_id:06d}_s{scale:.2f}_x{x}_y{y}.png"
-                            patch_img.save(os.path.join(output_dir, patch_filename))
-                        
-                        yield patch, patch_info
-                        patch_id += 1
+                    # Save if requested
+                    if save_patches and output_dir:
+                        os.makedirs(output_dir, exist_ok=True)
+                        patch_img = Image.fromarray(patch)
+                        patch_filename = f"patch_{patch_id:06d}_s{scale:.2f}_x{x}_y{y}.png"
+                        patch_img.save(os.path.join(output_dir, patch_filename))
                     
-                    total_patches += 1
+                    yield patch, patch_info
+                    patch_id += 1
             
             print(f"   Extracted {scale_patches} tissue patches at scale {scale:.2f}x")
         
+        pyramid.close()
+        reader.close()
+        
         print(f"\n✅ Tiling complete:")
         print(f"   Total patches examined: {total_patches}")
         print(f"   Tissue patches: {tissue_patches} ({tissue_patches/max(total_patches,1)*100:.1f}%)")
         print(f"   Background patches skipped: {total_patches - tissue_patches}")
+        if tissue_mask is not None:
+            print(f"   Pruned by tissue mask (never read): {pruned_patches}")
+
+
+def _to_original(level_positions: np.ndarray, scale: float) -> np.ndarray:
+    """Level coordinates to original (level 0) coordinates, truncated like int()"""
+    # The small epsilon keeps exact multiples exact despite inexact scales such as 3/7
+    return np.floor(level_positions / scale + 1e-6).astype(np.int64)
 
 
 class PatchExtractor:
@@ -179,6 +660,17 @@ class PatchExtractor:
         self.normalize = normalize
         self.mean = np.array(mean).reshape(1, 1, 3)
         self.std = np.array(std).reshape(1, 1, 3)
+        self._reader = None  # Last opened slide, reused across calls
+        self._reader_path = None
+    
+    def _get_reader(self, image_path: str) -> RegionReader:
+        """Region reader for image_path; kept open so its tile cache is reused"""
+        if self._reader_path != image_path:
+            if self._reader is not None:
+                self._reader.close()
+            self._reader = open_region_reader(image_path)
+            self._reader_path = image_path
+        return self._reader
     
     def preprocess_patch(self, patch: np.ndarray) -> torch.Tensor:
         """
@@ -216,7 +708,9 @@ class PatchExtractor:
         Extract patches at multiple scales around a center point.
         Useful for multi-scale attention mechanisms.
         """
-        img = Image.open(image_path)
+        # Only the tiles/rows under each crop are decoded
+        reader = self._get_reader(image_path)
+        img_width, img_height = reader.size
         patches = []
         
         for scale_size in scales:
@@ -225,11 +719,11 @@ class PatchExtractor:
             # Calculate bounds
             x1 = max(0, center_x - half_size)
             y1 = max(0, center_y - half_size)
-            x2 = min(img.width, center_x + half_size)
-            y2 = min(img.height, center_y + half_size)
+            x2 = min(img_width, center_x + half_size)
+            y2 = min(img_height, center_y + half_size)
             
             # Extract and resize
-            patch = img.crop((x1, y1, x2, y2))
+            patch = Image.fromarray(reader.read_region(x1, y1, x2 - x1, y2 - y1))
             patch = patch.resize(self.target_size, Image.BILINEAR)
             
             # Preprocess
@@ -303,8 +797,8 @@ class DashboardTiler(GigapixelTiler):
         max_patches = max_patches or self.max_patches_dashboard
         
         # Calculate optimal stride for target resolution
-        img = Image.open(image_path)
-        img_width, img_height = img.size
+        reader = self.open_reader(image_path)
+        img_width, img_height = reader.size
         
         # Adjust stride to fit target resolution
         stride_x = max(img_width // target_resolution[1], self.patch_size)
@@ -317,30 +811,35 @@ class DashboardTiler(GigapixelTiler):
         patches = []
         patch_id = 0
         
-        for y in range(0, img_height - self.patch_size + 1, stride):
-            for x in range(0, img_width - self.patch_size + 1, stride):
-                if len(patches) >= max_patches:
-                    break
-                
-                # Extract patch
-                patch = np.array(img.crop((x, y, x + self.patch_size, y + self.patch_size)))
-                
-                # Quick tissue check
-                if self.is_tissue_patch(patch):
-                    info = PatchInfo(
-                        x=x, y=y, 
-                        width=self.patch_size, 
-                        height=self.patch_size,
-                        scale=1.0, 
-                        patch_id=patch_id,
-                        is_tissue=True
-                    )
-                    patches.append((patch, info))
-                    patch_id += 1
-            
+        # Skip grid cells without tissue before reading any pixels
+        tissue_mask = self.compute_tissue_mask(reader)
+        plan = self.build_tiling_plan(
+            (img_width, img_height), tissue_mask, scales=[1.0], stride=stride
+        ).tissue()
+        
+        # Native-resolution tiling reads from a downsampled level
+        pyramid = self.open_pyramid(image_path, reader)
+        level_reader = pyramid.get_level(plan.read_scale(0))
+        
+        for index, patch in self._iter_plan_patches(level_reader, plan):
             if len(patches) >= max_patches:
                 break
+            
+            # Quick tissue check (vectorized per strip)
+            if patch is not None:
+                info = PatchInfo(
+                    x=int(plan.x[index]), y=int(plan.y[index]), 
+                    width=self.patch_size, 
+                    height=self.patch_size,
+                    scale=1.0, 
+                    patch_id=patch_id,
+                    is_tissue=True
+                )
+                patches.append((patch, info))
+                patch_id += 1
         
+        pyramid.close()
+        reader.close()
         return patches
     
     def create_coordinate_grid(
@@ -379,25 +878,56 @@ class DashboardTiler(GigapixelTiler):
         Returns:
             List of (grid_x, grid_y) coordinates
         """
-        img_width, img_height = image_size
-        grid_height, grid_width = heatmap_resolution
+        if isinstance(patches_info, TilingPlan):
+            grid_x, grid_y = self.get_plan_coordinates_for_heatmap(
+                patches_info, image_size, heatmap_resolution
+            )
+            return list(zip(grid_x.tolist(), grid_y.tolist()))
         
-        grid_coords = []
-        for info in patches_info:
-            # Convert patch center to grid coordinates
-            patch_center_x = info.x + info.width // 2
-            patch_center_y = info.y + info.height // 2
-            
-            grid_x = int((patch_center_x / img_width) * grid_width)
-            grid_y = int((patch_center_y / img_height) * grid_height)
-            
-            # Ensure within bounds
-            grid_x = max(0, min(grid_x, grid_width - 1))
-            grid_y = max(0, min(grid_y, grid_height - 1))
-            
-            grid_coords.append((grid_x, grid_y))
+        x = np.array([info.x for info in patches_info], dtype=np.int64)
+        y = np.array([info.y for info in patches_info], dtype=np.int64)
+        width = np.array([info.width for info in patches_info], dtype=np.int64)
+        height = np.array([info.height for info in patches_info], dtype=np.int64)
         
-        return grid_coords
+        grid_x, grid_y = _centers_to_grid(
+            x + width // 2, y + height // 2, image_size, heatmap_resolution
+        )
+        return list(zip(grid_x.tolist(), grid_y.tolist()))
+    
+    def get_plan_coordinates_for_heatmap(
+        self,
+        plan: TilingPlan,
+        image_size: Tuple[int, int],
+        heatmap_resolution: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Heatmap grid coordinates for every entry of a tiling plan.
+        
+        Returns:
+            (grid_x, grid_y) int64 index arrays
+        """
+        center_x, center_y = plan.centers()
+        return _centers_to_grid(center_x, center_y, image_size, heatmap_resolution)
+
+
+def _centers_to_grid(
+    center_x: np.ndarray,
+    center_y: np.ndarray,
+    image_size: Tuple[int, int],
+    heatmap_resolution: Tuple[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Map patch centers to heatmap cells, clipped to the grid"""
+    img_width, img_height = image_size
+    grid_height, grid_width = heatmap_resolution
+    
+    grid_x = np.trunc(center_x / img_width * grid_width).astype(np.int64)
+    grid_y = np.trunc(center_y / img_height * grid_height).astype(np.int64)
+    
+    # Ensure within bounds
+    grid_x = np.clip(grid_x, 0, grid_width - 1)
+    grid_y = np.clip(grid_y, 0, grid_height - 1)
+    
+    return grid_x, grid_y
 
 
 def calculate_optimal_tiling_for_dashboard(
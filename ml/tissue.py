@@ -0,0 +1,195 @@
+# 🧫 Tissue Detection Module
+# Low-resolution tissue masks for pruning the tiling grid before any patch is read
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+from typing import Tuple, Sequence
+
+
+def otsu_threshold(values: np.ndarray) -> float:
+    """
+    Otsu threshold for uint8 values (maximizes between-class variance).
+    """
+    hist = np.bincount(values.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 0.0
+
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_total = cum_mean[-1]
+
+    # Between-class variance for every candidate threshold
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (mean_total - cum_mean) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    variance = np.nan_to_num(variance)
+
+    return float(np.argmax(variance))
+
+
+def compute_tissue_mask(
+    thumbnail: np.ndarray,
+    min_saturation: int = 20,
+    bright_threshold: int = 200,
+    dilation: int = 1
+) -> np.ndarray:
+    """
+    Detect tissue on a low-resolution RGB thumbnail.
+
+    Stained tissue is saturated while glass background is bright and grey,
+    so pixels are tissue if their saturation exceeds the Otsu threshold
+    (never below min_saturation) or if they are darker than the background
+    intensity cut used by the patch-level tissue check.
+
+    Args:
+        thumbnail: (H, W, 3) uint8 RGB thumbnail
+        min_saturation: Lower bound for the saturation threshold [0, 255]
+        bright_threshold: Grayscale level above which pixels count as background
+        dilation: Pixels to grow the mask by, so borders are not pruned
+
+    Returns:
+        mask: (H, W) boolean tissue mask
+    """
+    saturation = np.asarray(Image.fromarray(thumbnail).convert('HSV'))[:, :, 1]
+    gray = np.mean(thumbnail, axis=2)
+
+    threshold = max(otsu_threshold(saturation), min_saturation)
+    mask = (saturation > threshold) | (gray <= bright_threshold)
+
+    if dilation > 0:
+        mask = ndimage.binary_dilation(mask, iterations=dilation)
+
+    return mask
+
+
+def summed_area_table(values: np.ndarray) -> np.ndarray:
+    """
+    Integral image with a leading row and column of zeros.
+
+    sat[y, x] holds the sum of values[:y, :x]. Indicator images small
+    enough to never overflow use int32 to halve the table's memory.
+    """
+    dtype = np.int32 if values.size < 2 ** 31 and values.dtype == bool else np.int64
+    sat = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=dtype)
+    np.cumsum(values, axis=0, dtype=dtype, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, dtype=dtype, out=sat[1:, 1:])
+    return sat
+
+
+def box_sums(
+    sat: np.ndarray,
+    y0: np.ndarray,
+    x0: np.ndarray,
+    y1: np.ndarray,
+    x1: np.ndarray
+) -> np.ndarray:
+    """
+    Sums of values[y0:y1, x0:x1] for every box, four lookups each.
+
+    The coordinate arrays are broadcast against each other, so passing
+    row vectors for y and column vectors for x yields a full grid.
+    """
+    return sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+
+
+def tissue_grid_from_mask(
+    mask: np.ndarray,
+    image_size: Tuple[int, int],
+    x_positions: Sequence[int],
+    y_positions: Sequence[int],
+    patch_size: int,
+    scale: float = 1.0
+) -> np.ndarray:
+    """
+    Map a thumbnail tissue mask onto the tiling grid.
+
+    Args:
+        mask: (h, w) boolean thumbnail mask
+        image_size: Full-resolution (width, height) the mask covers
+        x_positions, y_positions: Patch origins in scaled coordinates
+        patch_size: Patch size in scaled pixels
+        scale: Scale of the grid relative to full resolution
+
+    Returns:
+        grid: (len(y_positions), len(x_positions)) boolean array, True
+        where the patch footprint touches tissue
+    """
+    mask_height, mask_width = mask.shape
+    ratio_x = mask_width / (image_size[0] * scale)
+    ratio_y = mask_height / (image_size[1] * scale)
+
+    xs = np.asarray(x_positions, dtype=np.float64)
+    ys = np.asarray(y_positions, dtype=np.float64)
+
+    # Patch footprints in thumbnail pixels, rounded outwards
+    x0 = np.clip(np.floor(xs * ratio_x), 0, mask_width - 1).astype(np.int64)
+    x1 = np.clip(np.ceil((xs + patch_size) * ratio_x), x0 + 1, mask_width).astype(np.int64)
+    y0 = np.clip(np.floor(ys * ratio_y), 0, mask_height - 1).astype(np.int64)
+    y1 = np.clip(np.ceil((ys + patch_size) * ratio_y), y0 + 1, mask_height).astype(np.int64)
+
+    sat = summed_area_table(mask)
+    counts = box_sums(sat, y0[:, None], x0[None, :], y1[:, None], x1[None, :])
+
+    return counts > 0
+
+
+def bright_fractions_at(
+    strip: np.ndarray,
+    x_positions: np.ndarray,
+    y_offsets: np.ndarray,
+    patch_size: int,
+    bright_threshold: int = 200
+) -> np.ndarray:
+    """
+    Fraction of bright pixels for patches at arbitrary positions in a strip.
+
+    Builds one integral image of the "bright pixel" indicator and reads
+    each patch with four lookups, matching GigapixelTiler.is_tissue_patch
+    (grayscale mean above bright_threshold) exactly.
+
+    Args:
+        strip: (H, W, C) or (H, W) uint8 pixels
+        x_positions: Patch origins along the strip width
+        y_offsets: Patch origins relative to the top of the strip
+        patch_size: Patch size in pixels
+
+    Returns:
+        float64 array of bright fractions, x and y broadcast against each other
+    """
+    if strip.ndim == 3:
+        # mean over channels > t  <=>  channel sum > channels * t for integer pixels
+        channels = strip.shape[2]
+        bright = strip.sum(axis=2, dtype=np.uint32) > channels * bright_threshold
+    else:
+        bright = strip > bright_threshold
+
+    sat = summed_area_table(bright)
+
+    xs = np.asarray(x_positions, dtype=np.int64)
+    ys = np.asarray(y_offsets, dtype=np.int64)
+    counts = box_sums(sat, ys, xs, ys + patch_size, xs + patch_size)
+
+    return counts / (patch_size * patch_size)
+
+
+def bright_fraction_grid(
+    strip: np.ndarray,
+    x_positions: Sequence[int],
+    y_offsets: Sequence[int],
+    patch_size: int,
+    bright_threshold: int = 200
+) -> np.ndarray:
+    """
+    Fraction of bright pixels for every patch position in a strip.
+
+    Returns:
+        (len(y_offsets), len(x_positions)) float64 array of bright fractions
+    """
+    xs = np.asarray(x_positions, dtype=np.int64)[None, :]
+    ys = np.asarray(y_offsets, dtype=np.int64)[:, None]
+    return bright_fractions_at(strip, xs, ys, patch_size, bright_threshold)